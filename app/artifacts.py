@@ -0,0 +1,219 @@
+"""Versioned bundle of analysis artifacts, so the UI can open without re-running analysis
+
+Each stage's artifacts (state, partition, centroids, per-cluster stats,
+page text, graph layout, figure) live in a directory named by the
+stage's key: a hash of the bundle and stage versions, the stage's
+parameters and content digests of the store columns it reads. A small
+<stage>.json entry points at the current directory, so stages running
+in different workers never rewrite each other's files.
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+import numpy as np
+from PIL import Image
+from dataset import DATASET_PATH, ENGAGEMENT_COLUMNS
+from kmeans import IMAGE_FEATURE_COLUMNS
+from temporal import EVOLUTION_COLUMNS, STEP_DAYS, WINDOW_DAYS
+
+BUNDLE_PATH = os.environ.get("SNA_ARTIFACTS", os.path.splitext(DATASET_PATH)[0] + ".artifacts")
+# Bump when the bundle layout changes; every stage is then rebuilt
+BUNDLE_VERSION = 1
+# Bump a stage's version when its algorithm or artifacts change
+STAGE_VERSIONS = {"users": 3, "images": 2, "prompts": 1, "evolution": 1, "index": 1}
+# Store columns each stage reads
+STAGE_COLUMNS = {
+    "users": ENGAGEMENT_COLUMNS,
+    "images": IMAGE_FEATURE_COLUMNS,
+    "prompts": ("prompt",),
+    "evolution": EVOLUTION_COLUMNS,
+    "index": ("user_id", "platform", "likes", "shares", "comments"),
+}
+# Stages built from other stages' results; the keys of those go into their key
+STAGE_INPUTS = {"index": ("users", "images", "prompts")}
+
+def stage_params(stage, seed=0):
+    """Parameters that change a stage's output, as recorded in its key"""
+    params = {"seed": seed}
+    if stage == "prompts":
+        params["encoder"] = os.environ.get("SNA_PROMPT_ENCODER", "hashing")
+    if stage == "evolution":
+        params.update(window_days=WINDOW_DAYS, step_days=STEP_DAYS)
+    return params
+
+def to_builtin(value):
+    """json.dump fallback for numpy scalars and arrays"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+class Bundle:
+    """The artifact bundle of one dataset"""
+    def __init__(self, path=None):
+        self.path = path or BUNDLE_PATH
+
+    def read_json(self, name):
+        try:
+            with open(os.path.join(self.path, name), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_json(self, name, data, directory=None):
+        directory = directory or self.path
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=to_builtin)
+        os.replace(tmp, path)
+
+    def column_digest(self, store, name):
+        """Content hash of a store column and its categories
+
+        Cached against the files' sizes and mtimes, so unchanged columns
+        are only hashed once.
+        """
+        files = [store.column_path(name)]
+        categories = os.path.join(store.path, f"{name}.categories.json")
+        if os.path.exists(categories):
+            files.append(categories)
+        stamp = [[os.path.getsize(f), os.stat(f).st_mtime_ns] for f in files]
+        cache_name = os.path.join("digests",
+                                  hashlib.sha1(files[0].encode("utf-8")).hexdigest()[:16] + ".json")
+        cached = self.read_json(cache_name)
+        if cached and cached["stamp"] == stamp:
+            return cached["digest"]
+
+        digest = hashlib.blake2b(digest_size=16)
+        for path in files:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(16 << 20), b""):
+                    digest.update(block)
+        self.write_json(os.path.basename(cache_name), {"stamp": stamp, "digest": digest.hexdigest()},
+                        os.path.join(self.path, "digests"))
+        return digest.hexdigest()
+
+    def stage_key(self, stage, store, seed=0):
+        spec = {
+            "bundle": BUNDLE_VERSION,
+            "stage": stage,
+            "version": STAGE_VERSIONS[stage],
+            "params": stage_params(stage, seed),
+            "columns": {name: self.column_digest(store, name) for name in STAGE_COLUMNS[stage]},
+            "inputs": self.input_keys(stage),
+        }
+        encoded = json.dumps(spec, sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(encoded, digest_size=12).hexdigest()
+
+    def input_keys(self, stage):
+        """Current keys of the stages a stage is built from"""
+        return {name: (self.entry(name) or {}).get("key") for name in STAGE_INPUTS.get(stage, ())}
+
+    def entry(self, stage):
+        entry = self.read_json(f"{stage}.json")
+        if entry is None or entry.get("bundle") != BUNDLE_VERSION:
+            return None
+        return entry
+
+    def stage_dir(self, stage, key):
+        return os.path.join(self.path, f"{stage}-{key}")
+
+    def has(self, stage, key):
+        entry = self.entry(stage)
+        return (entry is not None and entry["key"] == key
+                and os.path.isdir(self.stage_dir(stage, key)))
+
+    def current(self, stage, csv_path=None, seed=0):
+        """Cheap startup check: built from this CSV, as it is now, with today's settings
+
+        Only stats the CSV. Stages that fail it are re-checked against
+        column digests by the worker, which rebuilds only what changed.
+        """
+        entry = self.entry(stage)
+        csv_path = os.path.abspath(csv_path or DATASET_PATH)
+        try:
+            stat = os.stat(csv_path)
+        except OSError:
+            return False
+        source = [csv_path, stat.st_size, stat.st_mtime_ns]
+        return (entry is not None and entry["version"] == STAGE_VERSIONS[stage]
+                and entry["params"] == stage_params(stage, seed) and entry["source"] == source
+                and entry.get("inputs", {}) == self.input_keys(stage)
+                and os.path.isdir(self.stage_dir(stage, entry["key"])))
+
+    def write(self, stage, key, artifacts, store, seed=0):
+        """Write a stage's artifacts and make them the current ones
+
+        artifacts maps file names to values: .npy arrays, .json data,
+        .png PIL images, anything else is pickled.
+        """
+        final = self.stage_dir(stage, key)
+        tmp = f"{final}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, value in artifacts.items():
+            path = os.path.join(tmp, name)
+            if name.endswith(".npy"):
+                np.save(path, value)
+            elif name.endswith(".json"):
+                self.write_json(name, value, tmp)
+            elif name.endswith(".png"):
+                value.save(path)
+            else:
+                with open(path, "wb") as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+
+        previous = self.entry(stage)
+        self.write_json(f"{stage}.json", {
+            "bundle": BUNDLE_VERSION,
+            "key": key,
+            "version": STAGE_VERSIONS[stage],
+            "params": stage_params(stage, seed),
+            "source": self.source(store),
+            "inputs": self.input_keys(stage),
+            "files": sorted(artifacts),
+            "created": time.time(),
+        })
+        if previous is not None and previous["key"] != key:
+            shutil.rmtree(self.stage_dir(stage, previous["key"]), ignore_errors=True)
+
+    def source(self, store):
+        """The CSV as the store last converted it"""
+        return [store.schema["source"], store.schema["offset"], store.schema["mtime_ns"]]
+
+    def reuse(self, stage, store):
+        """Record that the current artifacts also match the store as it is now
+
+        Called when the CSV changed but not in columns this stage reads,
+        so the next startup can load the stage without asking a worker.
+        """
+        entry = self.entry(stage)
+        if entry["source"] != self.source(store):
+            entry["source"] = self.source(store)
+            self.write_json(f"{stage}.json", entry)
+
+    def load(self, stage, name):
+        """Read one artifact of the stage's current build"""
+        path = os.path.join(self.stage_dir(stage, self.entry(stage)["key"]), name)
+        if name.endswith(".npy"):
+            return np.load(path)
+        if name.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        if name.endswith(".png"):
+            with Image.open(path) as image:
+                return image.copy()
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def files(self, stage):
+        entry = self.entry(stage)
+        return entry["files"] if entry else []
@@ -0,0 +1,119 @@
+"""Run the whole analysis pipeline headless and write figures and summaries
+
+For display-less servers, e.g. a nightly job. Run from the app/ directory:
+
+    python batch.py --output results/
+    python batch.py --dataset data/ghibli_dataset.csv --output /tmp/sna --workers 3
+
+The independent stages run in parallel worker processes and reuse the
+artifact bundle when their inputs are unchanged (--rebuild forces a
+fresh run). Nothing imported here pulls in tkinter.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from artifacts import BUNDLE_PATH, to_builtin
+from dataset import DATASET_PATH, STORE_PATH
+from jobs import INLINE
+import plots
+import tasks
+
+def timed_stage(stage, store_path, seed=0, bundle_path=None):
+    """Worker entry point: run or load one stage, timing it"""
+    start = time.perf_counter()
+    result = tasks.run_stage(INLINE, stage, store_path, seed, bundle_path)
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+def stage_timings(state):
+    """The step timings a stage's state recorded, if any"""
+    timings = getattr(state, "timings", None)
+    if timings is None and hasattr(state, "result"):
+        timings = state.result.timings
+    return timings or {}
+
+def write_outputs(stage, result, output):
+    """Write a stage's page text, figure and graph picture; returns its summary"""
+    artifacts = tasks.stage_artifacts(stage, result["state"])
+    text = artifacts["text.json"]
+    with open(os.path.join(output, f"{stage}.txt"), "w", encoding="utf-8") as f:
+        f.write(text if isinstance(text, str) else "\n\n".join(text))
+    files = [f"{stage}.txt"]
+    if "figure" in result:
+        name = f"{stage}_timeline.png" if stage == "evolution" else f"{stage}_clusters.png"
+        plots.from_buffer(result["figure"]).save(os.path.join(output, name))
+        files.append(name)
+    if "graph" in result:
+        plots.graph_figure(result["graph"]).save(os.path.join(output, f"{stage}_graph.png"))
+        files.append(f"{stage}_graph.png")
+    return {
+        "elapsed_s": result["elapsed"],
+        "cached": result.get("cached", False),
+        "timings": stage_timings(result["state"]),
+        "stats": artifacts["stats.json"],
+        "files": files,
+    }
+
+def run(dataset, store_path, bundle_path, output, stages, seed=0, workers=None):
+    """Prepare the dataset, run the stages and write their outputs; returns the summary"""
+    os.makedirs(output, exist_ok=True)
+    total_start = time.perf_counter()
+    start = time.perf_counter()
+    store_path = tasks.prepare_dataset(INLINE, dataset, store_path)
+    summary = {"dataset": os.path.abspath(dataset), "seed": seed,
+               "timings": {"dataset": time.perf_counter() - start}, "stages": {}}
+    print(f"{'dataset':<10} {summary['timings']['dataset']:>8.2f}s")
+
+    def finish(stage, result):
+        summary["stages"][stage] = stage_summary = write_outputs(stage, result, output)
+        summary["timings"][stage] = stage_summary["elapsed_s"]
+        steps = ", ".join(f"{k} {v:.2f}s" for k, v in stage_summary["timings"].items())
+        source = "bundle" if stage_summary["cached"] else steps
+        print(f"{stage:<10} {stage_summary['elapsed_s']:>8.2f}s  ({source})")
+
+    workers = min(workers or len(stages), len(stages))
+    if workers <= 1:
+        for stage in stages:
+            finish(stage, timed_stage(stage, store_path, seed, bundle_path))
+    else:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            futures = {pool.submit(timed_stage, stage, store_path, seed, bundle_path): stage
+                       for stage in stages}
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
+
+    summary["timings"]["total"] = time.perf_counter() - total_start
+    print(f"{'total':<10} {summary['timings']['total']:>8.2f}s")
+    with open(os.path.join(output, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, default=to_builtin)
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--store", help="column store directory (default: next to the dataset)")
+    parser.add_argument("--bundle", help="artifact bundle directory (default: next to the dataset)")
+    parser.add_argument("--output", default="sna_output")
+    parser.add_argument("--stages", nargs="+", choices=list(tasks.STAGES), default=list(tasks.STAGES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="parallel stages (default: one per stage)")
+    parser.add_argument("--rebuild", action="store_true", help="ignore saved artifacts")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.dataset):
+        parser.exit(1, f"Dataset not found: {args.dataset}\n")
+    base = os.path.splitext(args.dataset)[0]
+    default_dataset = args.dataset == DATASET_PATH
+    store_path = args.store or (STORE_PATH if default_dataset else base + ".columns")
+    bundle_path = args.bundle or (BUNDLE_PATH if default_dataset else base + ".artifacts")
+    if args.rebuild:
+        shutil.rmtree(bundle_path, ignore_errors=True)
+    run(args.dataset, store_path, bundle_path, args.output, args.stages, args.seed, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+"""Benchmarks for the analysis stages behind the community pages
+
+Run from the app/ directory, for example:
+
+    python bench.py louvain --sizes 10000 100000 1000000
+    python bench.py incremental --sizes 100000 1000000
+    python bench.py prompts --sizes 10000 100000 1000000
+    python bench.py kmeans --sizes 10000 100000 1000000 10000000
+    python bench.py parallel --sizes 1000000 5000000
+    python bench.py ui --xvfb
+    python bench.py ui louvain kmeans prompts --json results.json --baseline previous.json
+
+--json writes every result with the machine and commit it came from;
+--baseline compares times against such a file and exits non-zero when
+anything got slower than --tolerance allows.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+from dataset import Table, synthetic_engagement
+
+# Fields that identify a result row when comparing against a baseline
+ID_FIELDS = ("metric", "rows", "new_rows", "images", "prompts", "workers")
+
+def bench_louvain(sizes, seed=0):
+    """Time engagement graph construction and Louvain as the row count grows"""
+    from engagement import detect_user_communities
+    results = []
+    for n_rows in sizes:
+        table = synthetic_engagement(n_rows, seed=seed)
+        start = time.perf_counter()
+        result = detect_user_communities(table, seed=seed)
+        results.append({
+            "rows": n_rows,
+            "build_s": result.timings["build"],
+            "louvain_s": result.timings["louvain"],
+            "total_s": time.perf_counter() - start,
+            "communities": len(result.clusters),
+            "modularity": result.modularity,
+        })
+    return results
+
+def rows_slice(table, start, stop):
+    return Table({k: v[start:stop] for k, v in table.columns.items()}, table.categories)
+
+def bench_incremental(sizes, seed=0, batch_fraction=0.01):
+    """Compare a warm-started Louvain update with a full rerun after new rows"""
+    from engagement import IncrementalUserCommunities
+    results = []
+    for n_rows in sizes:
+        batch = max(1, int(n_rows * batch_fraction))
+        table = synthetic_engagement(n_rows + batch, seed=seed)
+        communities = IncrementalUserCommunities(rows_slice(table, 0, n_rows), seed=seed)
+        report = communities.update(rows_slice(table, n_rows, n_rows + batch), compare=True)
+        results.append({
+            "rows": n_rows,
+            "new_rows": batch,
+            "update_s": report["update_s"],
+            "full_s": report["full_s"],
+            "speedup": report["speedup"],
+        })
+    return results
+
+def synthetic_prompts(n_prompts, seed=0):
+    """Prompts drawn from a few Ghibli themes plus per-prompt noise words"""
+    rng = np.random.default_rng(seed)
+    themes = [
+        ["floating", "castle", "sky", "clouds"],
+        ["village", "night", "lanterns", "cozy"],
+        ["forest", "spirit", "moss", "ancient"],
+        ["anime", "train", "station", "sunset"],
+        ["traveler", "exploring", "enchanted", "ruins"],
+        ["iceland", "mountain", "cliff", "ocean"],
+    ]
+    theme = rng.integers(0, len(themes), n_prompts)
+    picks = rng.integers(0, 4, (n_prompts, 3))
+    noise = rng.integers(0, 5000, n_prompts)
+    return [f"Ghibli style {' '.join(themes[t][i] for i in p)} w{w}"
+            for t, p, w in zip(theme, picks, noise)]
+
+def bench_prompts(sizes, seed=0):
+    """Time prompt embedding, top-k graph, Leiden and K-Means on prompts
+
+    Prompts are embedded with the SNA_PROMPT_ENCODER encoder into an
+    EmbeddingStore in a fresh temporary directory, so embed_s is the cost
+    of encoding every prompt rather than of reading earlier runs' vectors.
+    """
+    from embeddings import EmbeddingStore, default_encoder
+    from prompts import PromptCommunities
+    results = []
+    for n_prompts in sizes:
+        with tempfile.TemporaryDirectory() as path:
+            store = EmbeddingStore(default_encoder(), path)
+            result = PromptCommunities(synthetic_prompts(n_prompts, seed), store, seed=seed)
+        row = {"prompts": n_prompts}
+        row.update({f"{k}_s": v for k, v in result.timings.items()})
+        row["communities"] = int(result.communities.max()) + 1
+        results.append(row)
+    return results
+
+def bench_parallel(sizes, seed=0):
+    """Sharded Louvain on the engagement graph with 1, 2, 4, ... workers
+
+    speedup is against one worker; same_labels checks that the partition
+    doesn't depend on the number of workers.
+    """
+    from engagement import EngagementGraph
+    from louvain import WORKERS, parallel_louvain, shard_count
+    counts = [1]
+    while counts[-1] * 2 <= WORKERS:
+        counts.append(counts[-1] * 2)
+    results = []
+    for n_rows in sizes:
+        adjacency = EngagementGraph(synthetic_engagement(n_rows, seed=seed), "image_id").adjacency
+        baseline = None
+        for workers in counts:
+            start = time.perf_counter()
+            labels, quality = parallel_louvain(adjacency, seed=seed, workers=workers)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = elapsed, labels
+            results.append({
+                "rows": n_rows,
+                "workers": workers,
+                "shards": shard_count(adjacency),
+                "louvain_s": elapsed,
+                "speedup": baseline[0] / elapsed,
+                "modularity": quality,
+                "same_labels": bool(np.array_equal(labels, baseline[1])),
+            })
+    return results
+
+def synthetic_images(n_images, path, n_groups=5, seed=0, block_rows=1 << 20):
+    """Write image feature columns with planted clusters to memory-mapped files
+
+    Columns are generated a block at a time, so the largest sizes never
+    have to fit in memory; returns a Table of read-only memory maps.
+    """
+    rng = np.random.default_rng(seed)
+    accuracy = rng.uniform(60, 95, n_groups)
+    engagement = rng.uniform(2, 8, n_groups)
+    columns = {name: np.memmap(os.path.join(path, f"{name}.bin"), dtype=np.float64,
+                               mode="w+", shape=(n_images,))
+               for name in ("style_accuracy_score", "likes", "shares", "comments")}
+    for start in range(0, n_images, block_rows):
+        stop = min(start + block_rows, n_images)
+        group = rng.integers(0, n_groups, stop - start)
+        columns["style_accuracy_score"][start:stop] = rng.normal(accuracy[group], 3)
+        for i, metric in enumerate(("likes", "shares", "comments")):
+            level = engagement[group] - i + rng.normal(0, 0.5, stop - start)
+            columns[metric][start:stop] = np.round(np.expm1(np.maximum(level, 0)))
+    for values in columns.values():
+        values.flush()
+    return Table({name: np.memmap(values.filename, dtype=np.float64, mode="r",
+                                  shape=(n_images,))
+                  for name, values in columns.items()})
+
+def bench_kmeans(sizes, seed=0):
+    """Time streamed K-Means and PCA on image features, with peak memory
+
+    Features are memory-mapped from disk; peak_mb is the largest amount
+    allocated by the clustering itself, max_rss_mb the process high-water
+    mark so far.
+    """
+    from kmeans import ImageClusters
+    results = []
+    for n_images in sizes:
+        with tempfile.TemporaryDirectory() as path:
+            table = synthetic_images(n_images, path, seed=seed)
+            tracemalloc.start()
+            start = time.perf_counter()
+            clusters = ImageClusters(table, seed=seed)
+            clusters.projection()
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del table
+        results.append({
+            "images": n_images,
+            "total_s": elapsed,
+            "rows_per_s": n_images / elapsed,
+            "peak_mb": peak / 2 ** 20,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "clusters": len(clusters.summaries()),
+        })
+    return results
+
+def percentile_ms(values, q):
+    return float(np.percentile(values, q) * 1000) if len(values) else 0.0
+
+def photo_image_bytes(app):
+    """Pixel memory held by the Tk images that are alive, at 4 bytes per pixel"""
+    total = 0
+    for name in app.tk.splitlist(app.tk.call("image", "names")):
+        total += 4 * int(app.tk.call("image", "width", name)) * int(app.tk.call("image", "height", name))
+    return total
+
+def measure_ui(switches=20, gif_frames=40):
+    """Start the app, walk its pages and play the GIF; returns a dict of metrics
+
+    Runs in a fresh process (see bench_ui) so import and startup costs
+    and the peak RSS belong to the UI alone.
+    """
+    process_start = time.perf_counter()
+    import sna
+    from widgets import GifAnimator
+    imported = time.perf_counter()
+
+    app = sna.App(prefetch=False, analysis=False)
+    # First paint: the window is mapped and its first idle redraw has run
+    while "first paint" not in app.timings or not app.winfo_ismapped():
+        app.update()
+    painted = time.perf_counter()
+    metrics = {
+        "import_ms": (imported - process_start) * 1000,
+        "app_first_paint_ms": app.timings["first paint"] * 1000,
+        "first_paint_ms": (painted - process_start) * 1000,
+    }
+
+    # Cold switches build each page; warm switches only raise it
+    for page in app.pages:
+        start = time.perf_counter()
+        app.show_frame(page)
+        app.update_idletasks()
+        metrics[f"switch_cold_{page.__name__}_ms"] = (time.perf_counter() - start) * 1000
+        metrics[f"build_{page.__name__}_ms"] = app.timings[f"build {page.__name__}"] * 1000
+    latencies = []
+    for i in range(switches):
+        page = app.pages[i % len(app.pages)]
+        start = time.perf_counter()
+        app.show_frame(page)
+        app.update_idletasks()
+        latencies.append(time.perf_counter() - start)
+    metrics["switch_warm_mean_ms"] = float(np.mean(latencies) * 1000)
+    metrics["switch_warm_p95_ms"] = percentile_ms(latencies, 95)
+    metrics["switch_warm_max_ms"] = percentile_ms(latencies, 100)
+
+    # GIF decoding on a cold animator, one frame at a time
+    second = app.frames[sna.SecondPage]
+    cold = GifAnimator(second.gif_label, second.animator.gif.filename, size=(800, 400))
+    decodes = []
+    for index in range(cold.n_frames):
+        start = time.perf_counter()
+        cold.decode(index)
+        decodes.append(time.perf_counter() - start)
+    metrics["gif_frames"] = cold.n_frames
+    metrics["gif_decode_mean_ms"] = float(np.mean(decodes) * 1000)
+    metrics["gif_decode_total_ms"] = float(np.sum(decodes) * 1000)
+    del cold
+
+    # Animation jitter: each tick's delay against the frame duration it scheduled
+    app.show_frame(sna.SecondPage)
+    animator = second.animator
+    animator.stop()
+    ticks = []
+    tick = animator.tick
+
+    def timed_tick():
+        start = time.perf_counter()
+        tick()
+        shown = (animator.index - 1) % animator.n_frames
+        ticks.append((start, animator.ready[shown][1] / 1000))
+    def check_done():
+        if len(ticks) > gif_frames:
+            app.quit()
+        else:
+            app.after(50, check_done)
+    animator.tick = timed_tick
+    animator.start()
+    # The real event loop, so timers fire as they would for a user
+    check_done()
+    app.mainloop()
+    animator.stop()
+    lateness = np.abs([t1 - t0 - delay for (t0, delay), (t1, _) in zip(ticks, ticks[1:])])
+    metrics["frame_jitter_mean_ms"] = float(np.mean(lateness) * 1000) if len(lateness) else 0.0
+    metrics["frame_jitter_p95_ms"] = percentile_ms(lateness, 95)
+    metrics["frame_jitter_max_ms"] = percentile_ms(lateness, 100)
+
+    metrics["photo_images"] = len(app.tk.splitlist(app.tk.call("image", "names")))
+    metrics["photo_image_mb"] = photo_image_bytes(app) / 2 ** 20
+    metrics["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    app.on_close()
+    return metrics
+
+@contextmanager
+def virtual_display(width=1920, height=1080):
+    """Run an Xvfb server for the duration; yields the DISPLAY value"""
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        raise SystemExit("Xvfb not found; install it or run with a display")
+    number = 99
+    while os.path.exists(f"/tmp/.X11-unix/X{number}") or os.path.exists(f"/tmp/.X{number}-lock"):
+        number += 1
+    server = subprocess.Popen([xvfb, f":{number}", "-screen", "0", f"{width}x{height}x24",
+                               "-nolisten", "tcp"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(f"/tmp/.X11-unix/X{number}"):
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise SystemExit("Xvfb failed to start")
+            time.sleep(0.05)
+        yield f":{number}"
+    finally:
+        server.terminate()
+        server.wait()
+
+def bench_ui(xvfb=False):
+    """Startup, page construction and switching, GIF decoding and jitter, memory
+
+    The app runs in a child process without background analysis, under
+    a fresh Xvfb server when xvfb is set (or when there is no display).
+    """
+    env = dict(os.environ)
+    code = "import json, bench; print(json.dumps(bench.measure_ui()))"
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def run():
+        output = subprocess.run([sys.executable, "-c", code], cwd=app_dir, env=env,
+                                check=True, stdout=subprocess.PIPE, text=True).stdout
+        return json.loads(output.splitlines()[-1])
+
+    if xvfb or not env.get("DISPLAY"):
+        with virtual_display() as display:
+            env["DISPLAY"] = display
+            metrics = run()
+    else:
+        metrics = run()
+    return [{"metric": name, "value": value} for name, value in metrics.items()]
+
+def print_table(results):
+    if not results:
+        return
+    columns = list(results[0])
+    print("  ".join(f"{c:>12}" for c in columns))
+    for row in results:
+        print("  ".join(f"{v:>12.4f}" if isinstance(v, float) else f"{v:>12}" for v in row.values()))
+
+def environment():
+    """Where a result file came from, so regressions can be traced to a version"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+def row_id(row):
+    return tuple((k, row[k]) for k in ID_FIELDS if k in row)
+
+def costs(row):
+    """The lower-is-better numbers of a result row: times, memory"""
+    if "metric" in row:
+        if row["metric"].endswith(("_ms", "_mb")):
+            yield row["metric"], row["value"]
+        return
+    for key, value in row.items():
+        if (key.endswith(("_s", "_ms", "_mb")) and not key.endswith("_per_s")
+                and isinstance(value, (int, float))):
+            yield key, value
+
+def compare(results, baseline, tolerance):
+    """Print the costs that grew by more than tolerance; returns how many did"""
+    regressions = 0
+    for name, rows in results.items():
+        previous = {row_id(row): row for row in baseline["results"].get(name, [])}
+        for row in rows:
+            old = previous.get(row_id(row))
+            if old is None:
+                continue
+            old_costs = dict(costs(old))
+            for key, value in costs(row):
+                before = old_costs.get(key)
+                if before and value > before * (1 + tolerance):
+                    regressions += 1
+                    where = " ".join(f"{k}={v}" for k, v in row_id(row))
+                    print(f"REGRESSION {name} {where} {key}: {before:.4g} -> {value:.4g} "
+                          f"({value / before - 1:+.0%})")
+    return regressions
+
+BENCHMARKS = {
+    "louvain": bench_louvain,
+    "incremental": bench_incremental,
+    "prompts": bench_prompts,
+    "kmeans": bench_kmeans,
+    "parallel": bench_parallel,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmarks", nargs="+", choices=sorted(BENCHMARKS) + ["ui"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--xvfb", action="store_true", help="run the ui benchmark under Xvfb")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file to check for regressions against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown against the baseline (default 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.benchmarks:
+        print(f"== {name}")
+        if name == "ui":
+            results[name] = bench_ui(args.xvfb)
+        else:
+            results[name] = BENCHMARKS[name](args.sizes, seed=args.seed)
+        print_table(results[name])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "sizes": args.sizes, "seed": args.seed,
+                       "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Precomputed index for drilling into communities without rescanning the dataset
+
+Built once per set of clustering results, from one community label per
+post for each community type: user communities (Louvain), image clusters
+(K-Means) and prompt communities (Leiden). For every community it keeps,
+in CSR form, the sorted codes of the users who posted in it, the same
+users ranked by engagement, distinct users per platform, post counts and
+engagement sums, and post counts against the communities of the other
+two types. Users who posted on each platform are packed bitmaps.
+
+A community profile is then a handful of slices and array reads, and
+intersections across community types are merges of sorted arrays.
+"""
+import numpy as np
+
+KINDS = ("users", "images", "prompts")
+METRICS = ("likes", "shares", "comments")
+# Page names of the community types
+KIND_NAMES = {"users": "user community", "images": "image cluster",
+              "prompts": "prompt community"}
+
+def grouped(keys, values, n_groups):
+    """CSR of the distinct values under each key: (starts, values, counts)
+
+    values come out sorted within each key; counts are how many times
+    each (key, value) pair occurred.
+    """
+    pairs, counts = np.unique((keys.astype(np.int64) << 32) | values.astype(np.int64),
+                              return_counts=True)
+    starts = np.searchsorted(pairs >> 32, np.arange(n_groups + 1))
+    return starts, (pairs & 0xFFFFFFFF).astype(np.int32), counts
+
+def pack(mask):
+    return np.packbits(mask)
+
+def contains(bits, ids):
+    """Which of ids are set in a packed bitmap"""
+    return (bits[ids >> 3] >> (7 - (ids & 7))) & 1 == 1
+
+def intersect_sorted(a, b):
+    """Intersection of two sorted arrays of distinct ints, O(small log large)"""
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return a
+    at = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return a[b[at] == a]
+
+class Communities:
+    """Everything precomputed for the communities of one type"""
+    def __init__(self, labels, users, platforms, n_platforms, metrics, engagement):
+        self.n = int(labels.max()) + 1 if len(labels) else 0
+        self.starts, self.members, _ = grouped(labels, users, self.n)
+        # Members again, each community's run ordered by engagement, highest first
+        owner = np.repeat(np.arange(self.n), np.diff(self.starts))
+        self.ranked = self.members[np.lexsort((-engagement[self.members], owner))]
+
+        self.posts = np.bincount(labels, minlength=self.n)
+        self.sums = np.stack([np.bincount(labels, weights=metrics[m], minlength=self.n)
+                              for m in METRICS], axis=1)
+        starts, _, _ = grouped(labels.astype(np.int64) * max(n_platforms, 1) + platforms, users,
+                               self.n * max(n_platforms, 1))
+        self.platform_users = np.diff(starts).reshape(self.n, max(n_platforms, 1))
+        self.crossed = {}  # other kind -> (starts, communities, posts)
+
+    def users(self, c):
+        return self.members[self.starts[c]:self.starts[c + 1]]
+
+class ClusterIndex:
+    """Community membership, platform and engagement lookups across community types
+
+    labels maps each kind in KINDS to a community per post; the other
+    arguments are the posts' columns (user and platform codes, METRICS)
+    and the names behind the codes.
+    """
+    def __init__(self, labels, users, platforms, metrics, user_names=(), platform_names=()):
+        users = np.asarray(users, dtype=np.int64)
+        platforms = np.asarray(platforms, dtype=np.int64)
+        metrics = {m: np.nan_to_num(np.asarray(metrics[m], dtype=np.float64)) for m in METRICS}
+        self.user_names = list(user_names)
+        self.platform_names = list(platform_names)
+        self.n_users = int(users.max()) + 1 if len(users) else 0
+        n_platforms = len(self.platform_names)
+
+        # Total engagement of each user, the influencer ranking
+        self.engagement = np.zeros(self.n_users)
+        for m in METRICS:
+            self.engagement += np.bincount(users, weights=metrics[m], minlength=self.n_users)
+        self.platform_bits = []
+        for p in range(n_platforms):
+            mask = np.zeros(self.n_users, dtype=bool)
+            mask[users[platforms == p]] = True
+            self.platform_bits.append(pack(mask))
+
+        labels = {kind: np.asarray(labels[kind], dtype=np.int64) for kind in KINDS}
+        self.kinds = {kind: Communities(labels[kind], users, platforms, n_platforms, metrics,
+                                        self.engagement)
+                      for kind in KINDS}
+        for kind in KINDS:
+            for other in KINDS:
+                if other != kind:
+                    self.kinds[kind].crossed[other] = grouped(labels[kind], labels[other],
+                                                              self.kinds[kind].n)
+
+    def __len__(self):
+        return self.n_users
+
+    def count(self, kind):
+        return self.kinds[kind].n
+
+    def user_name(self, user):
+        return self.user_names[user] if user < len(self.user_names) else f"user {user}"
+
+    def members(self, kind, community):
+        """Sorted codes of the users who posted in a community"""
+        return self.kinds[kind].users(community)
+
+    def users(self, platform=None, **communities):
+        """Users in every one of the given communities, optionally on a platform
+
+        For example users(users=3, prompts=7) are the members of user
+        community 3 who posted prompts in prompt community 7.
+        """
+        sets = sorted((self.members(kind, c) for kind, c in communities.items()), key=len)
+        found = sets[0] if sets else np.arange(self.n_users, dtype=np.int32)
+        for other in sets[1:]:
+            found = intersect_sorted(found, other)
+        if platform is not None:
+            found = found[contains(self.platform_bits[platform], found)]
+        return found
+
+    def overlap(self, kind, community, other, top=5):
+        """[(other community, posts)] for the posts of a community, most first"""
+        starts, groups, posts = self.kinds[kind].crossed[other]
+        groups = groups[starts[community]:starts[community + 1]]
+        posts = posts[starts[community]:starts[community + 1]]
+        order = np.argsort(-posts, kind="stable")[:top]
+        return [(int(groups[i]), int(posts[i])) for i in order]
+
+    def profile(self, kind, community, top=5):
+        """Size, platform breakdown, averages, top influencers and overlaps of a community"""
+        table = self.kinds[kind]
+        start, stop = table.starts[community], table.starts[community + 1]
+        posts = table.posts[community]
+        by_platform = table.platform_users[community]
+        order = np.argsort(-by_platform, kind="stable")
+        return {
+            "kind": kind,
+            "community": int(community),
+            "users": int(stop - start),
+            "posts": int(posts),
+            "platforms": [(self.platform_names[p], int(by_platform[p]))
+                          for p in order if by_platform[p] > 0],
+            "averages": {m: float(s) / max(posts, 1) for m, s in zip(METRICS, table.sums[community])},
+            "influencers": [(self.user_name(u), float(self.engagement[u]))
+                            for u in table.ranked[start:min(stop, start + top)]],
+            "overlaps": {other: self.overlap(kind, community, other, top=3)
+                         for other in KINDS if other != kind},
+        }
+
+def profile_text(profile):
+    """A profile as the short paragraph shown when a community is clicked"""
+    averages = profile["averages"]
+    lines = [f"{KIND_NAMES[profile['kind']].capitalize()} {profile['community']}: "
+             f"{profile['users']} users, {profile['posts']} posts, averaging "
+             f"{averages['likes']:.1f} likes, {averages['shares']:.1f} shares, "
+             f"{averages['comments']:.1f} comments."]
+    if profile["platforms"]:
+        lines.append("Platforms: " + ", ".join(f"{name} ({count})"
+                                               for name, count in profile["platforms"]))
+    if profile["influencers"]:
+        lines.append("Top influencers: " + ", ".join(f"{name} ({total:,.0f})"
+                                                     for name, total in profile["influencers"]))
+    for other, overlaps in profile["overlaps"].items():
+        if overlaps:
+            lines.append(f"Posts by {KIND_NAMES[other]}: " + ", ".join(
+                f"{community} ({posts})" for community, posts in overlaps))
+    return "\n".join(lines)
@@ -0,0 +1,415 @@
+import csv
+import io
+import json
+import os
+import shutil
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(os.path.dirname(APP_DIR), "data")
+DATASET_PATH = os.environ.get("SNA_DATASET", os.path.join(DATA_DIR, "ghibli_dataset.csv"))
+STORE_PATH = os.environ.get("SNA_COLUMN_STORE", os.path.splitext(DATASET_PATH)[0] + ".columns")
+
+# Columns of the Ghibli-style image dataset and how each one is typed
+NUMERIC_COLUMNS = ("likes", "shares", "comments", "generation_time", "gpu_usage",
+                   "file_size_kb", "style_accuracy_score")
+CATEGORICAL_COLUMNS = ("image_id", "user_id", "platform", "resolution",
+                       "is_hand_edited", "ethical_concerns_flag")
+TEXT_COLUMNS = ("prompt", "top_comment")
+DATE_COLUMNS = ("creation_date",)
+ALL_COLUMNS = NUMERIC_COLUMNS + CATEGORICAL_COLUMNS + TEXT_COLUMNS + DATE_COLUMNS
+
+ENGAGEMENT_COLUMNS = ("image_id", "user_id", "platform", "likes", "shares", "comments")
+
+def dataset_available(path=None):
+    """Return True if the raw dataset exists on disk"""
+    return os.path.exists(path or DATASET_PATH)
+
+class Table:
+    """A column-oriented view of the dataset
+
+    Numeric columns are float arrays and dates are int64 seconds since the
+    epoch. Categorical columns are stored as integer codes with a matching
+    list of category values; text columns are plain lists of strings unless
+    they were dictionary-encoded too.
+
+    Tables read from a ColumnStore remember (store path, start, stop) in
+    source. They pickle as that reference and map the columns again when
+    loaded, so saved analysis state never holds a copy of the dataset.
+    """
+    source = None
+
+    def __init__(self, columns, categories=None):
+        self.columns = columns
+        self.categories = categories or {}
+
+    def __getstate__(self):
+        if self.source is not None:
+            return {"source": self.source, "names": list(self.columns)}
+        return self.__dict__
+
+    def __setstate__(self, state):
+        if "names" in state:
+            path, start, stop = state["source"]
+            table = ColumnStore(path).read(state["names"], start, stop)
+            if len(table) != stop - start:
+                raise ValueError(f"Column store {path} no longer holds rows {start}-{stop}")
+            state = table.__dict__
+        self.__dict__.update(state)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def append(self, other):
+        """Return a new Table with the rows of other added after these"""
+        if (self.source is not None and other.source is not None
+                and self.source[0] == other.source[0] and self.source[2] == other.source[1]
+                and list(self.columns) == list(other.columns)):
+            # Consecutive rows of one store: map them as one range instead of copying
+            return ColumnStore(self.source[0]).read(list(self.columns), self.source[1],
+                                                    other.source[2])
+        columns = {}
+        for name, values in self.columns.items():
+            if isinstance(values, np.ndarray):
+                columns[name] = np.concatenate([values, other[name]])
+            else:
+                columns[name] = list(values) + list(other[name])
+        # Codes are stable, so the newer categories are a superset of ours
+        return Table(columns, other.categories or self.categories)
+
+    def decode(self, name, codes):
+        """Map categorical codes back to their original values"""
+        values = self.categories[name]
+        return [values[c] for c in np.atleast_1d(codes)]
+
+    def values(self, name):
+        """A column as a list of its original values, decoding if needed"""
+        if name in self.categories:
+            return self.decode(name, self.columns[name])
+        return list(self.columns[name])
+
+def to_float(values):
+    """Parse a column of strings as floats, treating blanks as NaN"""
+    out = np.empty(len(values), dtype=np.float64)
+    for i, v in enumerate(values):
+        try:
+            out[i] = float(v)
+        except ValueError:
+            out[i] = np.nan
+    return out
+
+# Marks an unparseable date in int64 date columns
+MISSING_DATE = np.iinfo(np.int64).min
+
+def to_seconds(values):
+    """Parse ISO dates or timestamps into int64 seconds since the epoch"""
+    try:
+        return np.array(values, dtype="datetime64[s]").astype(np.int64)
+    except ValueError:
+        out = np.full(len(values), MISSING_DATE, dtype=np.int64)
+        for i, v in enumerate(values):
+            try:
+                out[i] = np.datetime64(v.strip(), "s").astype(np.int64)
+            except ValueError:
+                pass
+        return out
+
+def record_end(chunk):
+    """Length of the complete CSV records at the start of chunk
+
+    Quoted fields may span lines, so a newline only ends a record when an
+    even number of quote characters precede it (escaped quotes come in
+    pairs). chunk must start at a record boundary.
+    """
+    data = np.frombuffer(chunk, dtype=np.uint8)
+    newlines = np.flatnonzero(data == ord("\n"))
+    quotes = np.flatnonzero(data == ord('"'))
+    closed = newlines[np.searchsorted(quotes, newlines) % 2 == 0]
+    return int(closed[-1]) + 1 if len(closed) else 0
+
+class CsvSource:
+    """Read selected columns of a CSV file that may keep growing
+
+    Each call to read() returns only the rows appended since the previous
+    call. Categorical values keep the same integer codes across reads, so
+    tables from successive reads can be appended to each other.
+    """
+    def __init__(self, path=None, columns=ENGAGEMENT_COLUMNS, encode_text=False,
+                 offset=0, positions=None, categories=None):
+        self.path = path or DATASET_PATH
+        self.columns = tuple(columns)
+        self.offset = offset
+        self.positions = positions
+        encoded = CATEGORICAL_COLUMNS + (TEXT_COLUMNS if encode_text else ())
+        self.categories = {c: list((categories or {}).get(c, ())) for c in self.columns
+                           if c in encoded}
+        self.lookups = {c: {v: i for i, v in enumerate(values)}
+                        for c, values in self.categories.items()}
+
+    def read(self, max_bytes=-1):
+        """Parse the complete records added since the last read into a Table
+
+        max_bytes bounds how much of the file one call consumes, so very
+        large files can be processed in chunks.
+        """
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(self.offset)
+            chunk = f.read(max_bytes)
+            end = record_end(chunk)
+            # A record longer than max_bytes: read on until it is complete
+            while max_bytes > 0 and not end:
+                line = f.readline()
+                if not line:
+                    break
+                chunk += line
+                end = record_end(chunk)
+            # The last record may lack a newline: once the file has stopped
+            # growing, a quote-balanced remainder at its end is complete
+            if (end < len(chunk) and self.offset + len(chunk) == size
+                    and os.fstat(f.fileno()).st_size == size
+                    and record_end(chunk + b"\n") == len(chunk) + 1):
+                end = len(chunk)
+        # Otherwise a trailing partial record is still being written, leave it for next time
+        self.offset += end
+        reader = csv.reader(io.StringIO(chunk[:end].decode("utf-8")))
+
+        if self.positions is None:
+            header = [h.strip() for h in next(reader, [])]
+            missing = [c for c in self.columns if c not in header]
+            if missing:
+                raise ValueError(f"Dataset is missing columns: {', '.join(missing)}")
+            self.positions = [header.index(c) for c in self.columns]
+
+        raw = [[] for _ in self.columns]
+        appenders = [r.append for r in raw]
+        for row in reader:
+            if not row:
+                continue
+            for append, pos in zip(appenders, self.positions):
+                append(row[pos])
+
+        data = {}
+        for name, values in zip(self.columns, raw):
+            if name in NUMERIC_COLUMNS:
+                data[name] = to_float(values)
+            elif name in DATE_COLUMNS:
+                data[name] = to_seconds(values)
+            elif name in self.lookups:
+                data[name] = self.encode(name, values)
+            else:
+                data[name] = values
+        return Table(data, self.categories)
+
+    def encode(self, name, values):
+        """Dictionary-encode values, extending the column's categories"""
+        lookup, categories = self.lookups[name], self.categories[name]
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, v in enumerate(values):
+            code = lookup.get(v)
+            if code is None:
+                code = lookup[v] = len(categories)
+                categories.append(v)
+            codes[i] = code
+        return codes
+
+def load_csv(path=None, columns=ENGAGEMENT_COLUMNS):
+    """Read the selected columns of the raw CSV dataset into a Table"""
+    return CsvSource(path, columns).read()
+
+class LazyCategories(dict):
+    """Category lists loaded from the column store only when first used"""
+    def __init__(self, path, names):
+        super().__init__()
+        self.path = path
+        self.names = set(names)
+
+    def __missing__(self, name):
+        if name not in self.names:
+            raise KeyError(name)
+        with open(os.path.join(self.path, f"{name}.categories.json"), encoding="utf-8") as f:
+            values = self[name] = json.load(f)
+        return values
+
+    def get(self, name, default=None):
+        return self[name] if name in self.names else default
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __bool__(self):
+        return bool(self.names)
+
+class ColumnStore:
+    """Typed, columnar copy of the dataset with one memory-mapped file per column
+
+    Numeric columns are float64, dates int64 seconds, and IDs, platforms
+    and text are dictionary-encoded int32 codes with their categories in a
+    JSON file. schema.json records the row count and how far into the CSV
+    the store has read, so sync() only converts rows appended since.
+    Reading maps just the requested columns, so opening the store costs
+    milliseconds and memory follows the columns touched, not the rows.
+    """
+    def __init__(self, path=None):
+        self.path = path or STORE_PATH
+        self.schema_path = os.path.join(self.path, "schema.json")
+        self.schema = None
+        if os.path.exists(self.schema_path):
+            with open(self.schema_path, encoding="utf-8") as f:
+                self.schema = json.load(f)
+
+    @property
+    def rows(self):
+        return self.schema["rows"] if self.schema else 0
+
+    @property
+    def columns(self):
+        return tuple(self.schema["columns"]) if self.schema else ()
+
+    def column_path(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def stale(self, csv_path=None):
+        """True if the CSV has rows the store has not converted yet"""
+        csv_path = os.path.abspath(csv_path or DATASET_PATH)
+        if self.schema is None or self.schema["source"] != csv_path:
+            return True
+        stat = os.stat(csv_path)
+        return (stat.st_size != self.schema["offset"]
+                or stat.st_mtime_ns != self.schema.get("mtime_ns", stat.st_mtime_ns))
+
+    def sync(self, csv_path=None, chunk_bytes=64 << 20):
+        """Convert the CSV once, then append only rows added since the last sync
+
+        Returns the number of rows added.
+        """
+        csv_path = os.path.abspath(csv_path or DATASET_PATH)
+        schema = self.schema
+        stat = os.stat(csv_path)
+        if (schema is None or schema["source"] != csv_path or stat.st_size < schema["offset"]
+                or (stat.st_size == schema["offset"]
+                    and stat.st_mtime_ns != schema.get("mtime_ns", stat.st_mtime_ns))):
+            # New or rewritten source (shorter, or edited in place): start again from scratch
+            shutil.rmtree(self.path, ignore_errors=True)
+            with open(csv_path, newline="", encoding="utf-8") as f:
+                header = [h.strip() for h in next(csv.reader(f), [])]
+            schema = {"source": csv_path, "offset": 0, "rows": 0, "positions": None,
+                      "columns": [c for c in ALL_COLUMNS if c in header],
+                      "dtypes": {}, "categorical": []}
+        os.makedirs(self.path, exist_ok=True)
+
+        categorical = CATEGORICAL_COLUMNS + TEXT_COLUMNS
+        known = {c: self.categories(c) for c in schema["categorical"]} if schema["rows"] else {}
+        source = CsvSource(csv_path, schema["columns"], encode_text=True,
+                           offset=schema["offset"], positions=schema["positions"],
+                           categories=known)
+        # An interrupted sync may have appended rows the schema never committed
+        for name in schema["columns"]:
+            path = self.column_path(name)
+            if os.path.exists(path):
+                itemsize = (np.dtype(schema["dtypes"][name]).itemsize
+                            if name in schema["dtypes"] else 0)
+                os.truncate(path, schema["rows"] * itemsize)
+        added = 0
+        while True:
+            table = source.read(chunk_bytes)
+            if not len(table):
+                break
+            for name in schema["columns"]:
+                values = np.ascontiguousarray(table[name])
+                schema["dtypes"][name] = values.dtype.str
+                with open(self.column_path(name), "ab") as f:
+                    f.write(values.tobytes())
+            added += len(table)
+
+        for name, values in source.categories.items():
+            if name in categorical and len(values) != len(known.get(name, ())):
+                self.write_json(f"{name}.categories.json", values)
+        schema["categorical"] = sorted(source.categories)
+        schema["offset"] = source.offset
+        schema["mtime_ns"] = os.stat(csv_path).st_mtime_ns
+        schema["positions"] = source.positions
+        schema["rows"] += added
+        # The schema is written last, so readers never see rows it doesn't cover
+        self.write_json("schema.json", schema)
+        self.schema = schema
+        return added
+
+    def write_json(self, name, data):
+        path = os.path.join(self.path, name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def categories(self, name):
+        with open(os.path.join(self.path, f"{name}.categories.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def read(self, columns, start=0, stop=None):
+        """Memory-mapped Table of the given columns for rows [start, stop)"""
+        missing = [c for c in columns if c not in self.columns]
+        if missing:
+            raise ValueError(f"Column store is missing columns: {', '.join(missing)}")
+        stop = self.rows if stop is None else min(stop, self.rows)
+        data = {}
+        for name in columns:
+            dtype = np.dtype(self.schema["dtypes"][name]) if name in self.schema["dtypes"] \
+                else np.dtype(np.float64)
+            if self.rows:
+                mapped = np.memmap(self.column_path(name), dtype=dtype, mode="r",
+                                   shape=(self.rows,))
+                data[name] = mapped[start:stop]
+            else:
+                data[name] = np.empty(0, dtype=dtype)
+        table = Table(data, LazyCategories(self.path, [c for c in columns
+                                                       if c in self.schema["categorical"]]))
+        table.source = (os.path.abspath(self.path), start, start + len(table))
+        return table
+
+def open_dataset(csv_path=None, store_path=None):
+    """The dataset's column store, converting or extending it if the CSV changed"""
+    store = ColumnStore(store_path)
+    if store.stale(csv_path):
+        store.sync(csv_path)
+    return store
+
+def synthetic_engagement(n_rows, n_users=None, n_images=None, n_groups=8, seed=0):
+    """Generate an engagement Table with planted user communities for benchmarks"""
+    rng = np.random.default_rng(seed)
+    n_users = n_users or max(n_groups, n_rows // 20)
+    n_images = n_images or max(n_groups, n_rows // 5)
+    user_group = rng.integers(0, n_groups, n_users)
+    image_group = rng.integers(0, n_groups, n_images)
+    images_by_group = [np.flatnonzero(image_group == g) for g in range(n_groups)]
+
+    users = rng.integers(0, n_users, n_rows)
+    images = rng.integers(0, n_images, n_rows)
+    # Most interactions stay inside the user's own group
+    local = rng.random(n_rows) < 0.9
+    for g, pool in enumerate(images_by_group):
+        rows = np.flatnonzero(local & (user_group[users] == g))
+        if len(pool) and len(rows):
+            images[rows] = pool[rng.integers(0, len(pool), len(rows))]
+
+    platforms = ["Reddit", "Instagram", "TikTok", "Twitter"]
+    columns = {
+        "image_id": images.astype(np.int32),
+        "user_id": users.astype(np.int32),
+        "platform": rng.integers(0, len(platforms), n_rows).astype(np.int32),
+        "likes": rng.gamma(2.0, 1300.0, n_rows).round(),
+        "shares": rng.gamma(2.0, 500.0, n_rows).round(),
+        "comments": rng.gamma(2.0, 260.0, n_rows).round(),
+    }
+    categories = {
+        "image_id": [f"img_{i}" for i in range(n_images)],
+        "user_id": [f"user_{i}" for i in range(n_users)],
+        "platform": platforms,
+    }
+    return Table(columns, categories)
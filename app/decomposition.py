@@ -0,0 +1,81 @@
+import numpy as np
+
+def randomized_svd(X, n_components, n_oversamples=10, n_iter=4, seed=0, mean=None):
+    """Truncated SVD by randomized range finding (Halko et al.)
+
+    Works on dense arrays, memory maps and scipy sparse matrices alike and
+    only ever multiplies X by thin matrices, so X is never densified or
+    copied. With mean given, decomposes X - mean without forming it.
+    Returns (U, S, Vt) with n_components singular triplets.
+    """
+    rng = np.random.default_rng(seed)
+
+    def times(M):
+        out = np.asarray(X @ M)
+        return out - mean @ M if mean is not None else out
+
+    def transposed_times(M):
+        out = np.asarray(X.T @ M)
+        return out - np.outer(mean, M.sum(axis=0)) if mean is not None else out
+
+    n_random = min(n_components + n_oversamples, min(X.shape))
+    Q = times(rng.standard_normal((X.shape[1], n_random)).astype(X.dtype))
+    for _ in range(n_iter):
+        # Power iterations sharpen the spectrum; QR keeps them stable
+        Q, _ = np.linalg.qr(Q)
+        Q, _ = np.linalg.qr(transposed_times(Q))
+        Q = times(Q)
+    Q, _ = np.linalg.qr(Q)
+    B = transposed_times(Q).T
+    U_small, S, Vt = np.linalg.svd(B, full_matrices=False)
+    U = Q @ U_small
+    return U[:, :n_components], S[:n_components], Vt[:n_components]
+
+def pca(X, n_components, seed=0):
+    """Randomized PCA; returns (projected rows, components, mean)"""
+    mean = np.asarray(X.mean(axis=0)).ravel().astype(X.dtype)
+    n_components = max(1, min(n_components, min(X.shape)))
+    _, _, Vt = randomized_svd(X, n_components, n_iter=2, seed=seed, mean=mean)
+    return np.asarray(X @ Vt.T) - mean @ Vt.T, Vt, mean
+
+class IncrementalPCA:
+    """PCA accumulated block by block from running first and second moments
+
+    Only the mean and the d x d scatter matrix are kept, so the rows can be
+    streamed from a memory map far larger than RAM in a single pass. Exact
+    for the narrow feature matrices it is used on; for wide sparse ones use
+    pca() instead.
+    """
+    def __init__(self, n_components):
+        self.n_components = n_components
+        self.count = 0
+        self.total = None
+        self.scatter = None
+        self.mean = None
+        self.components = None
+
+    def partial_fit(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.total is None:
+            self.total = np.zeros(X.shape[1])
+            self.scatter = np.zeros((X.shape[1], X.shape[1]))
+        self.count += len(X)
+        self.total += X.sum(axis=0)
+        self.scatter += X.T @ X
+        self.components = None
+        return self
+
+    def fit_components(self):
+        """Leading eigenvectors of the covariance, with a deterministic sign"""
+        self.mean = self.total / max(self.count, 1)
+        covariance = self.scatter / max(self.count, 1) - np.outer(self.mean, self.mean)
+        _, vectors = np.linalg.eigh(covariance)
+        components = vectors[:, ::-1][:, :self.n_components].T
+        signs = np.sign(components[np.arange(len(components)), np.abs(components).argmax(axis=1)])
+        self.components = components * signs[:, None]
+        return self
+
+    def transform(self, X):
+        if self.components is None:
+            self.fit_components()
+        return (np.asarray(X, dtype=np.float64) - self.mean) @ self.components.T
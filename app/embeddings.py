@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+import numpy as np
+import scipy.sparse as sp
+from imagecache import CACHE_DIR
+from prompts import normalize, tokenize
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialized
+    fcntl = None
+
+EMBEDDING_DIR = os.path.join(CACHE_DIR, "embeddings")
+
+def prompt_keys(prompts, version):
+    """64-bit content hash of each normalized prompt under an encoder version"""
+    prefix = version.encode("utf-8") + b"\0"
+    return np.array([int.from_bytes(hashlib.blake2b(prefix + normalize(p).encode("utf-8"),
+                                                    digest_size=8).digest(), "little")
+                     for p in prompts], dtype=np.uint64)
+
+class HashingEncoder:
+    """Corpus-independent prompt encoder: random indexing of hashed tokens
+
+    Each token maps to a fixed pseudo-random Gaussian vector derived from
+    its hash, and a prompt is the normalized sum of its tokens' vectors.
+    Because nothing is fitted to the corpus, a prompt's vector never
+    changes and can be cached indefinitely.
+    """
+    def __init__(self, dim=128, seed=0):
+        self.dim = dim
+        self.seed = seed
+        self.version = f"hashing-v1-d{dim}-s{seed}"
+        self.token_vectors = {}
+
+    def token_vector(self, token):
+        vector = self.token_vectors.get(token)
+        if vector is None:
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8,
+                                     key=str(self.seed).encode("utf-8")).digest()
+            rng = np.random.default_rng(int.from_bytes(digest, "little"))
+            vector = self.token_vectors[token] = rng.standard_normal(self.dim).astype(np.float32)
+        return vector
+
+    def encode(self, prompts):
+        tokens = [tokenize(normalize(p)) for p in prompts]
+        vocabulary = {}
+        indptr, indices = [0], []
+        for doc in tokens:
+            indices.extend(vocabulary.setdefault(t, len(vocabulary)) for t in doc)
+            indptr.append(len(indices))
+        counts = sp.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                               shape=(len(prompts), len(vocabulary)))
+        counts.sum_duplicates()
+        counts.data = 1 + np.log(counts.data)  # sublinear term frequency
+        basis = np.array([self.token_vector(t) for t in vocabulary], dtype=np.float32)
+        vectors = np.asarray(counts @ basis.reshape(len(vocabulary), self.dim))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return (vectors / norms).astype(np.float32)
+
+class SentenceEncoder:
+    """BERT-style sentence embeddings through the optional sentence-transformers package"""
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.version = f"st-{model_name}"
+
+    def encode(self, prompts):
+        vectors = self.model.encode([normalize(p) for p in prompts], batch_size=256,
+                                    normalize_embeddings=True, convert_to_numpy=True)
+        return vectors.astype(np.float32)
+
+def default_encoder():
+    """Encoder named by SNA_PROMPT_ENCODER: 'hashing' or a sentence-transformers model"""
+    name = os.environ.get("SNA_PROMPT_ENCODER", "hashing")
+    if name == "hashing":
+        return HashingEncoder()
+    return SentenceEncoder(name)
+
+class EmbeddingStore:
+    """Append-only, memory-mapped prompt embedding store for one encoder
+
+    Vectors live in a raw float32 file mapped with np.memmap; a small
+    sorted index of (key, row) pairs maps content hashes to rows. Prompts
+    already in the store are never re-encoded. Writers in other processes
+    (the GUI and a batch run share the cache) take turns through a lock
+    file.
+    """
+    def __init__(self, encoder, root=None):
+        self.encoder = encoder
+        self.dim = encoder.dim
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", encoder.version)
+        self.path = os.path.join(root or EMBEDDING_DIR, name)
+        os.makedirs(self.path, exist_ok=True)
+        self.vector_path = os.path.join(self.path, "vectors.f32")
+        self.index_path = os.path.join(self.path, "index.npy")
+        self.lock_path = os.path.join(self.path, "lock")
+        self.stats = {"hits": 0, "encoded": 0}
+        self.load()
+
+    def load(self):
+        self.load_index()
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.exists(meta_path):
+            with open(meta_path, "w") as f:
+                json.dump({"version": self.encoder.version, "dim": self.dim}, f)
+
+    def load_index(self):
+        """Read the published index, including rows other processes added"""
+        if os.path.exists(self.index_path):
+            index = np.load(self.index_path)
+            self.keys, self.rows = index[:, 0], index[:, 1].astype(np.int64)
+        else:
+            self.keys = np.empty(0, dtype=np.uint64)
+            self.rows = np.empty(0, dtype=np.int64)
+        self.map()
+
+    @contextmanager
+    def locked(self):
+        """Exclusive use of the vector file and index across processes"""
+        with open(self.lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def map(self):
+        """(Re)map the vector file after it has grown"""
+        size = os.path.getsize(self.vector_path) if os.path.exists(self.vector_path) else 0
+        n = size // (4 * self.dim)
+        self.vectors = (np.memmap(self.vector_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+                        if n else np.empty((0, self.dim), dtype=np.float32))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, keys):
+        """Row of each key in the vector file, -1 where missing"""
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if len(self.keys):
+            positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+            found = self.keys[positions] == keys
+            rows[found] = self.rows[positions[found]]
+        return rows
+
+    def append(self, vectors):
+        """Write vectors to the end of the file; returns their rows
+
+        Call with the store locked, so the rows are not taken concurrently.
+        """
+        first = os.path.getsize(self.vector_path) // (4 * self.dim) \
+            if os.path.exists(self.vector_path) else 0
+        with open(self.vector_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        return first + np.arange(len(vectors))
+
+    def publish(self, keys, rows):
+        """Add (key, row) pairs to the sorted index and write it atomically
+
+        Call with the store locked, after load_index(), so no other
+        writer's pairs are dropped.
+        """
+        all_keys = np.concatenate([self.keys, keys])
+        all_rows = np.concatenate([self.rows, rows])
+        order = np.argsort(all_keys, kind="stable")
+        self.keys, self.rows = all_keys[order], all_rows[order]
+        tmp = self.index_path + f".{os.getpid()}.tmp.npy"
+        np.save(tmp, np.column_stack([self.keys, self.rows.astype(np.uint64)]))
+        os.replace(tmp, self.index_path)
+        self.map()
+
+    def rows_for(self, prompts, batch_size=8192):
+        """Rows for every prompt, encoding only the ones not stored yet"""
+        keys = prompt_keys(prompts, self.encoder.version)
+        rows = self.lookup(keys)
+        missing = np.flatnonzero(rows < 0)
+        if len(missing):
+            with self.locked():
+                # Another process may have stored some of them meanwhile
+                self.load_index()
+                rows = self.lookup(keys)
+                missing = np.flatnonzero(rows < 0)
+                if len(missing):
+                    self.store_missing(prompts, keys, missing, batch_size)
+                    rows = self.lookup(keys)
+        self.stats["hits"] += len(prompts) - len(missing)
+        return rows
+
+    def store_missing(self, prompts, keys, missing, batch_size):
+        """Encode, append and index the prompts at missing; the store must be locked"""
+        # Duplicate prompts in one call are encoded once, in first-seen order
+        new_keys, first = np.unique(keys[missing], return_index=True)
+        order = np.argsort(first)
+        new_keys, first = new_keys[order], missing[first[order]]
+        new_rows = np.concatenate([
+            self.append(self.encoder.encode([prompts[i] for i in first[start:start + batch_size]]))
+            for start in range(0, len(first), batch_size)])
+        # Vectors are written before the index, so a crash never indexes missing rows
+        self.publish(new_keys, new_rows)
+        self.stats["encoded"] += len(new_keys)
+
+    def embed(self, prompts):
+        """Vectors for prompts, as a zero-copy view of the memory map when possible
+
+        If the prompts occupy one contiguous ascending run of rows, as they
+        do when the store was filled from the same corpus, the result is a
+        slice of the mapped file; otherwise the rows are gathered.
+        """
+        rows = self.rows_for(prompts)
+        if len(rows) and rows[-1] - rows[0] == len(rows) - 1 and np.all(np.diff(rows) == 1):
+            return self.vectors[rows[0]:rows[-1] + 1]
+        return self.vectors[rows]
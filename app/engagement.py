@@ -0,0 +1,218 @@
+import time
+import numpy as np
+import scipy.sparse as sp
+from louvain import local_moving, louvain, parallel_louvain
+
+def engagement_weights(table):
+    """Edge weight per engagement row, damped so viral posts don't dominate"""
+    total = table["likes"] + table["shares"] + table["comments"]
+    return 1.0 + np.log1p(np.nan_to_num(total))
+
+class EngagementGraph:
+    """User-content bipartite engagement graph
+
+    Users are nodes 0..n_users-1 and content items follow them, so the
+    adjacency matrix is [[0, B], [B.T, 0]] for the weighted biadjacency
+    matrix B (users x content).
+    """
+    def __init__(self, table, content_column="image_id"):
+        self.content_column = content_column
+        self.n_users = 0
+        self.n_content = 0
+        self.biadjacency = sp.csr_matrix((0, 0))
+        self.add(table)
+
+    def add(self, table):
+        """Add engagement rows in place, growing the node sets as needed
+
+        Returns the node indices (in the grown graph) touched by the rows.
+        """
+        users = np.asarray(table["user_id"])
+        content = np.asarray(table[self.content_column])
+        if len(users):
+            self.n_users = max(self.n_users, int(users.max()) + 1)
+            self.n_content = max(self.n_content, int(content.max()) + 1)
+        shape = (self.n_users, self.n_content)
+        self.biadjacency.resize(shape)
+        self.biadjacency = (self.biadjacency + sp.csr_matrix(
+            (engagement_weights(table), (users, content)), shape=shape)).tocsr()
+        return np.unique(np.concatenate([users, self.n_users + content]))
+
+    @property
+    def adjacency(self):
+        return sp.bmat([[None, self.biadjacency], [self.biadjacency.T, None]], format="csr")
+
+class UserCommunities:
+    """Result of clustering users on the engagement graph"""
+    def __init__(self, table, labels, modularity, timings):
+        self.table = table
+        self.labels = labels  # community of each user code
+        self.modularity = modularity
+        self.timings = timings
+        self.clusters = cluster_stats(table, labels)
+
+def cluster_stats(table, user_labels):
+    """Per-community user counts, platform breakdown and average engagement
+
+    Averages are taken over each community's posts. Returns a list of
+    dicts ordered by community size, largest first.
+    """
+    users = np.asarray(table["user_id"])
+    row_labels = user_labels[users]
+    n_clusters = int(user_labels.max()) + 1 if len(user_labels) else 0
+    # Users that appear in the table, per community
+    active = np.zeros(len(user_labels), dtype=bool)
+    active[users] = True
+    sizes = np.bincount(user_labels[active], minlength=n_clusters)
+
+    posts = np.bincount(row_labels, minlength=n_clusters)
+    averages = {}
+    for metric in ("likes", "shares", "comments"):
+        sums = np.bincount(row_labels, weights=np.nan_to_num(table[metric]), minlength=n_clusters)
+        averages[metric] = sums / np.maximum(posts, 1)
+
+    # Distinct users per (community, platform)
+    platform_names = table.categories.get("platform", [])
+    n_platforms = len(platform_names)
+    platform_users = np.zeros((n_clusters, n_platforms), dtype=np.int64)
+    if n_platforms:
+        pairs = np.unique(users.astype(np.int64) * n_platforms + table["platform"])
+        np.add.at(platform_users, (user_labels[pairs // n_platforms], pairs % n_platforms), 1)
+
+    stats = []
+    for c in np.argsort(-sizes, kind="stable"):
+        if sizes[c] == 0:
+            continue
+        top = np.argsort(-platform_users[c], kind="stable")
+        stats.append({
+            "users": int(sizes[c]),
+            "posts": int(posts[c]),
+            "platforms": [(platform_names[p], int(platform_users[c, p]))
+                          for p in top if platform_users[c, p] > 0],
+            "likes": float(averages["likes"][c]),
+            "shares": float(averages["shares"][c]),
+            "comments": float(averages["comments"][c]),
+        })
+    return stats
+
+class IncrementalUserCommunities:
+    """User communities kept up to date as new engagement rows arrive
+
+    The first run is a full Louvain pass. Each update adds the new rows to
+    the graph in place, lets only the nodes they touch change community,
+    then warm-starts Louvain from the resulting partition.
+    """
+    def __init__(self, table, content_column="image_id", resolution=1.0, seed=0, callback=None):
+        self.resolution = resolution
+        self.seed = seed
+        # Called regularly during clustering, e.g. to check for cancellation
+        self.callback = callback
+        self.table = table
+        start = time.perf_counter()
+        self.graph = EngagementGraph(table, content_column)
+        adjacency = self.graph.adjacency
+        built = time.perf_counter()
+        self.labels, quality = parallel_louvain(adjacency, resolution=resolution, seed=seed,
+                                                callback=callback)
+        done = time.perf_counter()
+        self.result = self.make_result(quality, {"build": built - start, "louvain": done - built})
+
+    def __getstate__(self):
+        # Callbacks close over worker-side state and don't survive pickling
+        state = self.__dict__.copy()
+        state["callback"] = None
+        return state
+
+    def network(self):
+        """(adjacency, labels) of the user-content graph for drawing
+
+        Labels follow the user cluster numbering of the summaries, with
+        communities that hold only content numbered after them.
+        """
+        mapping = np.full(int(self.labels.max()) + 1, -1, dtype=np.int64)
+        mapping[self.labels[:self.graph.n_users]] = self.result.labels
+        others = np.flatnonzero(mapping < 0)
+        mapping[others] = int(self.result.labels.max()) + 1 + np.arange(len(others))
+        return self.graph.adjacency, mapping[self.labels]
+
+    def make_result(self, quality, timings):
+        # Keep user nodes only, renumbered by size so community 0 is the largest
+        # and the numbers match the order of the page text
+        user_labels = np.unique(self.labels[:self.graph.n_users], return_inverse=True)[1]
+        rank = np.argsort(-np.bincount(user_labels), kind="stable")
+        renumber = np.empty_like(rank)
+        renumber[rank] = np.arange(len(rank))
+        return UserCommunities(self.table, renumber[user_labels], quality, timings)
+
+    def update(self, rows, compare=False):
+        """Add engagement rows and refresh the partition
+
+        Returns a report of the work done; with compare=True it also times
+        a full Louvain rerun on the grown graph for reference.
+        """
+        start = time.perf_counter()
+        old_users, old_content = self.graph.n_users, self.graph.n_content
+        touched = self.graph.add(rows)
+        self.table = self.table.append(rows)
+        n_users, n_content = self.graph.n_users, self.graph.n_content
+        adjacency = self.graph.adjacency
+        built = time.perf_counter()
+
+        # Carry the previous partition over; new users and content start alone
+        initial = np.full(n_users + n_content, -1, dtype=np.int64)
+        initial[:old_users] = self.labels[:old_users]
+        initial[n_users:n_users + old_content] = self.labels[old_users:]
+        new = np.flatnonzero(initial < 0)
+        initial[new] = initial.max() + 1 + np.arange(len(new))
+
+        active = np.zeros(len(initial), dtype=bool)
+        active[touched] = True
+        rng = np.random.default_rng(self.seed)
+        moved, _, moves = local_moving(adjacency, initial, self.resolution, rng, active=active,
+                                       callback=self.callback)
+        self.labels, quality = louvain(adjacency, resolution=self.resolution, seed=self.seed,
+                                       initial=moved, callback=self.callback)
+        done = time.perf_counter()
+        self.result = self.make_result(quality, {"build": built - start, "louvain": done - built})
+
+        report = {
+            "rows": len(rows),
+            "new_users": n_users - old_users,
+            "new_content": n_content - old_content,
+            "nodes": len(initial),
+            "touched_nodes": len(touched),
+            "moved_nodes": moves,
+            # Louvain's first level runs on communities, not on every node
+            "warm_start_nodes": len(np.unique(moved)),
+            "update_s": done - start,
+        }
+        if compare:
+            full_start = time.perf_counter()
+            parallel_louvain(adjacency, resolution=self.resolution, seed=self.seed)
+            report["full_s"] = time.perf_counter() - full_start + (built - start)
+            report["speedup"] = report["full_s"] / max(report["update_s"], 1e-9)
+        return report
+
+def detect_user_communities(table, content_column="image_id", resolution=1.0, seed=0):
+    """Build the engagement graph and run Louvain on it"""
+    return IncrementalUserCommunities(table, content_column, resolution, seed).result
+
+def summary_text(result, max_clusters=8):
+    """Describe the user communities in the style of the ImagePage1 text"""
+    clusters = result.clusters
+    shown = clusters[:max_clusters]
+    lines = ["User Community Detection and Characterization", ""]
+    lines.append(f"Louvain modularity optimization on the user-content engagement graph found "
+                 f"{len(clusters)} communities (modularity {result.modularity:.3f}). "
+                 f"The {len(shown)} largest are summarised below with their platform usage "
+                 f"and average engagement metrics (likes, shares, and comments).")
+    lines.append("")
+    for i, c in enumerate(shown):
+        platforms = " and ".join(f"{name} ({count})" for name, count in c["platforms"][:2])
+        where = f", mostly on {platforms}" if platforms else ""
+        lines.append(f"Cluster {i}: {c['users']} users{where}, averaging {c['likes']:.1f} likes, "
+                     f"{c['shares']:.1f} shares, {c['comments']:.1f} comments.")
+    if len(clusters) > len(shown):
+        rest = sum(c["users"] for c in clusters[len(shown):])
+        lines.append(f"The remaining {len(clusters) - len(shown)} smaller communities hold {rest} users.")
+    return "\n".join(lines)
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image
+from instrument import tracer
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.join(os.path.dirname(APP_DIR), "images")
+CACHE_DIR = os.environ.get(
+    "SNA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ghibli_sna"))
+
+def resolve_image(name):
+    """Resolve an image name against the images/ directory"""
+    if os.path.isabs(name):
+        return name
+    return os.path.join(IMAGE_DIR, name)
+
+class ImageCache:
+    """Load images resized to a target size, caching them in memory and on disk
+
+    Entries are keyed by (path, mtime, target size), so editing a source
+    image invalidates its resized copies automatically.
+    """
+    def __init__(self, cache_dir=None, max_items=32):
+        self.cache_dir = os.path.join(cache_dir or CACHE_DIR, "thumbs")
+        self.max_items = max_items
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def key(self, path, size):
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size, tuple(size) if size else None)
+
+    def disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".png")
+
+    def load(self, name, size=None):
+        """Return a PIL image for name, resized to size (width, height) if given"""
+        path = resolve_image(name)
+        key = self.key(path, size)
+
+        with self.lock:
+            img = self.memory.get(key)
+            if img is not None:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return img
+
+        img = None
+        cached = self.disk_path(key) if size else None
+        if cached and os.path.exists(cached):
+            try:
+                with tracer.span("image cache read", "image"):
+                    img = Image.open(cached)
+                    img.load()
+                self.stats["disk_hits"] += 1
+            except OSError:
+                img = None
+
+        if img is None:
+            self.stats["misses"] += 1
+            with tracer.span("image decode", "image"):
+                img = Image.open(path)
+                if size:
+                    img = img.resize(tuple(size))
+                    self.store(cached, img)
+                else:
+                    img.load()
+
+        with self.lock:
+            self.memory[key] = img
+            while len(self.memory) > self.max_items:
+                self.memory.popitem(last=False)
+        return img
+
+    def size(self, name):
+        """(width, height) of an image, read from its header without decoding it"""
+        with Image.open(resolve_image(name)) as img:
+            return img.size
+
+    def store(self, cached, img):
+        """Write a resized image to the disk cache atomically"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{cached}.{os.getpid()}.tmp"
+            img.save(tmp, format="PNG", compress_level=1)
+            os.replace(tmp, cached)
+        except OSError:
+            # A read-only or full cache directory only costs us the speed-up
+            pass
+
+    def clear(self):
+        """Drop all in-memory entries"""
+        with self.lock:
+            self.memory.clear()
+
+# Shared instance used by every page
+image_cache = ImageCache()
@@ -0,0 +1,230 @@
+"""Lightweight instrumentation of the Tk event loop, with Chrome trace export
+
+Off by default and close to free when off. install(), called before
+any widgets exist, wraps every Tk callback (bindings, after and
+after_idle timers, button commands) as it is registered; the wrapper
+only checks tracer.enabled until enable() is called. When on, those
+callbacks are timed, code can add its own spans, a heartbeat timer
+measures how late the event loop runs, and <Expose> and <Configure>
+events are counted per widget.
+
+Exported traces open in chrome://tracing or https://ui.perfetto.dev.
+tkinter is only imported by enable(), so analysis code can add spans
+without pulling in the GUI toolkit.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Trace events kept for export, oldest dropped first
+MAX_EVENTS = 200_000
+# Interval of the event-loop heartbeat (milliseconds)
+HEARTBEAT_MS = 50
+# Heartbeats kept for the recent lag figures (5 s at the default interval)
+RECENT_BEATS = 100
+# When set, tracing starts with the app and the trace is written here on exit
+TRACE_PATH = os.environ.get("SNA_TRACE")
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    def __init__(self, tracer, name, category):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.category, self.start, time.perf_counter())
+        return False
+
+def unwrap(func):
+    """The function behind a Tk callback, looking through after()'s wrapper"""
+    code = getattr(func, "__code__", None)
+    if code is not None and code.co_name == "callit" and func.__closure__:
+        cells = dict(zip(code.co_freevars, func.__closure__))
+        if "func" in cells:
+            return cells["func"].cell_contents
+    return func
+
+def callback_name(func):
+    return getattr(func, "__qualname__", None) or type(func).__name__
+
+class Tracer:
+    """Collects callback timings, event-loop lag and redraw counts"""
+    def __init__(self, max_events=MAX_EVENTS):
+        self.enabled = False
+        self.events = deque(maxlen=max_events)
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.root = None
+        self.installed = False
+        self.bindings = {}  # sequence -> (previous script, our funcid)
+        self.heartbeat_job = None
+        self.expected = None
+        self.reset()
+
+    def reset(self):
+        self.stats = {}  # name -> [calls, total seconds, longest seconds]
+        self.redraws = {}  # widget path -> [expose events, configure events]
+        self.lags = deque(maxlen=RECENT_BEATS)
+        self.max_lag = 0.0
+        self.blocked = 0.0  # seconds spent inside callbacks
+        self.longest_block = 0.0
+        self.started = time.perf_counter()
+
+    def span(self, name, category="code"):
+        """Context manager timing a block; a shared no-op when disabled"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, category)
+
+    def record(self, name, category, start, end):
+        elapsed = end - start
+        with self.lock:
+            self.events.append({
+                "name": name, "cat": category, "ph": "X",
+                "ts": (start - self.origin) * 1e6, "dur": elapsed * 1e6,
+                "pid": os.getpid(), "tid": threading.get_ident(),
+            })
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = [0, 0.0, 0.0]
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] = max(stat[2], elapsed)
+            if category == "callback":
+                self.blocked += elapsed
+                self.longest_block = max(self.longest_block, elapsed)
+
+    def install(self):
+        """Wrap Tk callbacks as they are registered, so enable() can time all of them"""
+        if self.installed:
+            return
+        import tkinter
+        self.installed = True
+        original = tkinter.Misc._register
+        tracer = self
+
+        def register(widget, func, subst=None, needcleanup=1):
+            return original(widget, tracer.wrap(func), subst, needcleanup)
+        tkinter.Misc._register = tkinter.Misc.register = register
+
+    def wrap(self, func):
+        """func timed while tracing is on; the tracer's own callbacks are left alone"""
+        target = unwrap(func)
+        if getattr(target, "__self__", None) is self:
+            return func
+        tracer = self
+
+        @functools.wraps(target)
+        def timed_call(*args):
+            if not tracer.enabled:
+                return func(*args)
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                tracer.record(callback_name(target), "callback", start, time.perf_counter())
+        return timed_call
+
+    def enable(self, root):
+        """Start timing the callbacks of root's Tcl interpreter"""
+        if self.enabled:
+            return
+        # Callbacks registered before this are only timed if install() ran first
+        self.install()
+        self.root = root
+        self.reset()
+        self.enabled = True
+
+        for sequence in ("<Expose>", "<Configure>"):
+            previous = root.tk.call("bind", "all", sequence)
+            funcid = root.bind_all(sequence, self.count_event, add="+")
+            self.bindings[sequence] = (previous, funcid)
+        self.expected = None
+        self.heartbeat()
+
+    def disable(self):
+        """Stop timing and unbind; collected data stays available for export"""
+        if not self.enabled:
+            return
+        self.enabled = False
+        for sequence, (previous, funcid) in self.bindings.items():
+            self.root.tk.call("bind", "all", sequence, previous)
+            self.root.deletecommand(funcid)
+        self.bindings = {}
+        if self.heartbeat_job is not None:
+            self.root.after_cancel(self.heartbeat_job)
+            self.heartbeat_job = None
+
+    def count_event(self, event):
+        counts = self.redraws.get(str(event.widget))
+        if counts is None:
+            counts = self.redraws[str(event.widget)] = [0, 0]
+        counts[0 if str(event.type) == "Expose" else 1] += 1
+
+    def heartbeat(self):
+        """Measure how late the event loop ran this timer, then re-arm it"""
+        now = time.perf_counter()
+        if self.expected is not None:
+            lag = max(0.0, now - self.expected)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            with self.lock:
+                self.events.append({
+                    "name": "event loop lag", "ph": "C", "ts": (now - self.origin) * 1e6,
+                    "pid": os.getpid(), "tid": threading.get_ident(),
+                    "args": {"ms": lag * 1000},
+                })
+        self.expected = now + HEARTBEAT_MS / 1000
+        self.heartbeat_job = self.root.after(HEARTBEAT_MS, self.heartbeat)
+
+    def summary(self, top=8):
+        """Text for the overlay: loop lag, busiest callbacks and widgets"""
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        with self.lock:
+            stats = sorted(self.stats.items(), key=lambda item: -item[1][1])
+        recent = max(self.lags, default=0.0)
+        lines = [
+            f"loop lag {recent * 1000:6.1f} ms recent, {self.max_lag * 1000:6.1f} ms max",
+            f"blocked  {self.blocked / elapsed:6.1%} of {elapsed:.0f} s, "
+            f"longest {self.longest_block * 1000:.1f} ms",
+            "",
+            f"{'callback':<34} {'calls':>6} {'mean':>7} {'max':>7}",
+        ]
+        for name, (calls, total, longest) in stats[:top]:
+            lines.append(f"{name[-34:]:<34} {calls:>6} {total / calls * 1000:6.1f}ms "
+                         f"{longest * 1000:6.1f}ms")
+        redraws = sorted(self.redraws.items(), key=lambda item: -sum(item[1]))
+        lines += ["", f"{'widget':<34} {'expose':>6} {'config':>7}"]
+        for path, (expose, configure) in redraws[:top]:
+            lines.append(f"{path[-34:]:<34} {expose:>6} {configure:>7}")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Write the collected events as a Chrome trace JSON file"""
+        with self.lock:
+            events = list(self.events)
+        metadata = [{"name": "process_name", "ph": "M", "pid": os.getpid(),
+                     "args": {"name": "sna"}}]
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+        return path
+
+tracer = Tracer()
@@ -0,0 +1,135 @@
+import itertools
+import multiprocessing
+import queue
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job has been cancelled"""
+
+class JobContext:
+    """Handed to every job function so it can report progress and notice cancellation"""
+    def __init__(self, job_id, events=None, cancelled=None):
+        self.job_id = job_id
+        self.events = events
+        self.cancelled = cancelled
+        self.last_check = 0.0
+
+    def progress(self, fraction, message=""):
+        """Report progress (0..1) to the UI; also a cancellation point"""
+        self.check()
+        if self.events is not None:
+            self.events.put((self.job_id, fraction, message))
+
+    def check(self):
+        """Raise JobCancelled if the UI asked for this job to stop"""
+        # The cancel flags live in a manager process, so don't ask too often
+        now = time.monotonic()
+        if self.cancelled is None or now - self.last_check < 0.2:
+            return
+        self.last_check = now
+        if self.cancelled.get(self.job_id):
+            raise JobCancelled(self.job_id)
+
+# Context for running job functions directly, outside the pool
+INLINE = JobContext(None)
+
+def run_job(job_id, fn, args, events, cancelled):
+    """Worker-side entry point wrapping a job function"""
+    return fn(JobContext(job_id, events, cancelled), *args)
+
+class Job:
+    def __init__(self, job_id, name, on_done=None, on_error=None):
+        self.id = job_id
+        self.name = name
+        self.on_done = on_done
+        self.on_error = on_error
+        self.future = None
+        self.progress = 0.0
+        self.message = ""
+        self.started = time.perf_counter()
+
+class JobScheduler:
+    """Runs job functions in a process pool and relays their results to the UI thread
+
+    Workers report progress through a manager queue and finished futures
+    are collected in a thread-safe queue; poll() drains both and runs the
+    callbacks, so it must be called from the Tk thread (App does this
+    with after). Nothing is started until the first submit.
+    """
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.executor = None
+        self.manager = None
+        self.events = None
+        self.cancelled = None
+        self.finished = queue.Queue()
+        self.jobs = {}
+        self.ids = itertools.count(1)
+
+    def start(self):
+        # Spawned workers never inherit the Tk process's X connection
+        context = multiprocessing.get_context("spawn")
+        self.manager = context.Manager()
+        self.events = self.manager.Queue()
+        self.cancelled = self.manager.dict()
+        self.executor = ProcessPoolExecutor(self.max_workers, mp_context=context)
+
+    def submit(self, name, fn, *args, on_done=None, on_error=None):
+        """Queue fn(context, *args) in the pool; returns the Job"""
+        if self.executor is None:
+            self.start()
+        job = Job(next(self.ids), name, on_done, on_error)
+        self.jobs[job.id] = job
+        job.future = self.executor.submit(run_job, job.id, fn, args, self.events, self.cancelled)
+        job.future.add_done_callback(lambda future, job=job: self.finished.put(job))
+        return job
+
+    def cancel(self, job_id=None):
+        """Cancel one job, or every job when job_id is None"""
+        for job in ([self.jobs[job_id]] if job_id in self.jobs else list(self.jobs.values())):
+            self.cancelled[job.id] = True
+            job.future.cancel()
+
+    @property
+    def active(self):
+        return list(self.jobs.values())
+
+    def poll(self):
+        """Apply queued progress updates and run callbacks of finished jobs"""
+        while self.events is not None:
+            try:
+                job_id, fraction, message = self.events.get_nowait()
+            except (queue.Empty, OSError, EOFError):
+                break
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.progress, job.message = fraction, message
+
+        while True:
+            try:
+                job = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            self.jobs.pop(job.id, None)
+            try:
+                result = job.future.result()
+            except (CancelledError, JobCancelled):
+                continue
+            except Exception as e:
+                if job.on_error is not None:
+                    job.on_error(e)
+                continue
+            finally:
+                if self.cancelled is not None:
+                    self.cancelled.pop(job.id, None)
+            if job.on_done is not None:
+                job.on_done(result)
+
+    def shutdown(self):
+        """Cancel outstanding work and stop the worker processes"""
+        if self.executor is not None:
+            self.cancel()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.manager.shutdown()
+            self.executor = None
@@ -0,0 +1,301 @@
+import time
+import numpy as np
+from decomposition import IncrementalPCA
+from plots import sample
+
+# Columns used to group images by style accuracy and engagement
+IMAGE_FEATURE_COLUMNS = ("style_accuracy_score", "likes", "shares", "comments")
+# Rows per block when streaming image features from the column store
+BLOCK_ROWS = 1 << 18
+
+def image_features(table, start=0, stop=None):
+    """Raw feature matrix: style accuracy plus log-damped engagement counts"""
+    columns = [np.nan_to_num(table["style_accuracy_score"][start:stop])]
+    for metric in ("likes", "shares", "comments"):
+        columns.append(np.log1p(np.nan_to_num(table[metric][start:stop])))
+    return np.column_stack(columns)
+
+class Scaler:
+    """Standardize features with statistics fixed once fitting is done
+
+    partial_fit merges per-block means and variances (Chan et al.), so the
+    statistics can be gathered from a stream of blocks. Keeping the scale
+    fixed afterwards means centroids learnt earlier stay valid when later
+    batches are transformed.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self.squares = None
+
+    def fit(self, X):
+        self.__init__()
+        return self.partial_fit(X)
+
+    def partial_fit(self, X):
+        if not len(X):
+            return self
+        mean = X.mean(axis=0)
+        squares = ((X - mean) ** 2).sum(axis=0)
+        if self.count == 0:
+            self.count, self.mean, self.squares = len(X), mean, squares
+        else:
+            total = self.count + len(X)
+            delta = mean - self.mean
+            self.mean = self.mean + delta * len(X) / total
+            self.squares = self.squares + squares + delta ** 2 * self.count * len(X) / total
+            self.count = total
+        self.scale = np.sqrt(self.squares / self.count)
+        self.scale[self.scale == 0] = 1.0
+        return self
+
+    def transform(self, X):
+        return (X - self.mean) / self.scale
+
+    def inverse_transform(self, X):
+        return X * self.scale + self.mean
+
+class Reservoir:
+    """Uniform random sample of at most size rows from a stream of blocks
+
+    Every row gets a random key and the rows with the smallest keys are
+    kept, which is a uniform sample whatever the block sizes.
+    """
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.empty(0)
+        self.rows = None
+
+    def add(self, rows):
+        keys = self.rng.random(len(rows))
+        if len(self.keys) >= self.size:
+            # Only rows that beat the current worst key can get in
+            better = keys < self.keys.max()
+            keys, rows = keys[better], rows[better]
+        keys = np.concatenate([self.keys, keys])
+        rows = rows if self.rows is None else np.vstack([self.rows, rows])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size)[:self.size]
+            keys, rows = keys[keep], rows[keep]
+        self.keys, self.rows = keys, rows
+
+def nearest(X, centroids):
+    """Index of the closest centroid for each row, and the squared distance"""
+    # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, computed as one matrix product
+    distances = (X ** 2).sum(axis=1)[:, None] - 2 * X @ centroids.T + (centroids ** 2).sum(axis=1)
+    labels = distances.argmin(axis=1)
+    return labels, np.maximum(distances[np.arange(len(X)), labels], 0)
+
+def kmeans_plus_plus(X, k, rng):
+    """Pick k well-spread initial centroids"""
+    centroids = [X[rng.integers(len(X))]]
+    closest = ((X - centroids[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(X), p=closest / total) if total > 0 else rng.integers(len(X))
+        centroids.append(X[index])
+        closest = np.minimum(closest, ((X - X[index]) ** 2).sum(axis=1))
+    return np.array(centroids)
+
+class MiniBatchKMeans:
+    """K-Means trained with mini-batch updates
+
+    Every centroid moves towards the mean of its batch members with a step
+    of 1 / (points seen so far), so partial_fit can keep refining the same
+    centroids as new rows arrive without revisiting old ones.
+    """
+    def __init__(self, n_clusters=5, batch_size=4096, max_iter=100, seed=0, init="k-means++"):
+        self.n_clusters = n_clusters
+        self.init_method = init
+        self.batch_size = batch_size
+        self.max_iter = max_iter
+        self.rng = np.random.default_rng(seed)
+        self.centroids = None
+        self.counts = None
+
+    def init(self, X):
+        sample = X[self.rng.choice(len(X), min(len(X), 10 * self.batch_size), replace=False)]
+        k = min(self.n_clusters, len(sample))
+        if self.init_method == "random":
+            # Cheap enough for the hundreds of centroids of a coarse quantizer
+            self.centroids = sample[self.rng.choice(len(sample), k, replace=False)].copy()
+        else:
+            self.centroids = kmeans_plus_plus(sample, k, self.rng)
+        self.counts = np.zeros(len(self.centroids))
+
+    def step(self, batch):
+        """One mini-batch update; returns how far the centroids moved"""
+        labels, _ = nearest(batch, self.centroids)
+        sizes = np.bincount(labels, minlength=len(self.centroids))
+        sums = np.column_stack([np.bincount(labels, weights=batch[:, j], minlength=len(sizes))
+                                for j in range(batch.shape[1])])
+        seen = sizes > 0
+        self.counts[seen] += sizes[seen]
+        rate = sizes[seen] / self.counts[seen]
+        previous = self.centroids[seen].copy()
+        self.centroids[seen] += rate[:, None] * (sums[seen] / sizes[seen, None] - previous)
+        return float(np.abs(self.centroids[seen] - previous).max())
+
+    def fit(self, X, tol=1e-4):
+        """Train from scratch on X"""
+        self.init(X)
+        for _ in range(self.max_iter):
+            batch = X[self.rng.integers(0, len(X), min(len(X), self.batch_size))]
+            if self.step(batch) < tol:
+                break
+        return self
+
+    def fit_blocks(self, blocks, n_rows, sample, tol=1e-4):
+        """Train on a stream of (offset, X) blocks read once, in order
+
+        Centroids start from sample, and each block gets a share of the
+        max_iter mini-batches proportional to its size, so every part of a
+        dataset too large for memory contributes to the fit.
+        """
+        self.init(sample)
+        for _, X in blocks:
+            steps = max(1, round(self.max_iter * len(X) / max(n_rows, 1)))
+            for _ in range(steps):
+                batch = X[self.rng.integers(0, len(X), min(len(X), self.batch_size))]
+                if self.step(batch) < tol:
+                    break
+        return self
+
+    def partial_fit(self, X):
+        """Refine the centroids with new rows only"""
+        if self.centroids is None:
+            self.init(X)
+        for start in range(0, len(X), self.batch_size):
+            self.step(X[start:start + self.batch_size])
+        return self
+
+    def predict(self, X):
+        return nearest(X, self.centroids)[0]
+
+class ImageClusters:
+    """Style accuracy x engagement clusters, updatable as rows arrive
+
+    Features are streamed from the table in blocks of block_rows, so a
+    table of memory-mapped store columns may be larger than RAM. One pass
+    fits the scaler and draws a uniform sample, a second trains the
+    mini-batch K-Means, and a third labels every row while accumulating
+    the per-cluster sums and the PCA moments. Only the labels and those
+    aggregates are kept.
+    """
+    def __init__(self, table, n_clusters=5, seed=0, block_rows=BLOCK_ROWS,
+                 sample_rows=40_960, callback=None):
+        start = time.perf_counter()
+        self.seed = seed
+        self.block_rows = block_rows
+        self.callback = callback
+        self.scaler = Scaler()
+        self.sample = Reservoir(sample_rows, seed)
+        for _, raw in self.blocks(table):
+            self.scaler.partial_fit(raw)
+            self.sample.add(raw)
+
+        self.model = MiniBatchKMeans(n_clusters, seed=seed)
+        scaled = ((offset, self.scaler.transform(raw)) for offset, raw in self.blocks(table))
+        self.model.fit_blocks(scaled, len(table), self.scaler.transform(self.sample.rows))
+
+        k = len(self.model.centroids)
+        self.labels = np.empty(len(table), dtype=np.int32)
+        self.sizes = np.zeros(k, dtype=np.int64)
+        self.sums = np.zeros((k, len(IMAGE_FEATURE_COLUMNS)))
+        self.pca = IncrementalPCA(2)
+        for offset, raw in self.blocks(table):
+            self.label_block(offset, raw)
+        self.timings = {"kmeans": time.perf_counter() - start}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["callback"] = None
+        return state
+
+    def blocks(self, table):
+        """Yield (offset, raw features) for consecutive row blocks"""
+        for offset in range(0, len(table), self.block_rows):
+            if self.callback is not None:
+                self.callback()
+            yield offset, image_features(table, offset, offset + self.block_rows)
+
+    def label_block(self, offset, raw):
+        """Assign rows to clusters and fold them into the summaries"""
+        features = self.scaler.transform(raw)
+        labels = self.model.predict(features)
+        self.labels[offset:offset + len(labels)] = labels
+        k = len(self.sizes)
+        self.sizes += np.bincount(labels, minlength=k)
+        # Summaries average the engagement counts themselves, not their logs
+        values = np.column_stack([raw[:, 0], np.expm1(raw[:, 1:])])
+        for j in range(values.shape[1]):
+            self.sums[:, j] += np.bincount(labels, weights=values[:, j], minlength=k)
+        self.pca.partial_fit(features)
+
+    @property
+    def centroids(self):
+        """Cluster centres in raw feature units (engagement as log1p counts)"""
+        return self.scaler.inverse_transform(self.model.centroids)
+
+    def update(self, rows, compare=False, table=None):
+        """Move the centroids with mini-batch steps over the new rows only
+
+        Earlier rows keep the labels they were given, so nothing already
+        streamed is read again. With compare=True, table (every row,
+        including the new ones) is clustered from scratch as well, timing
+        the full rerun the update saved.
+        """
+        start = time.perf_counter()
+        offset = len(self.labels)
+        self.labels = np.concatenate([self.labels, np.empty(len(rows), dtype=np.int32)])
+        for _, raw in self.blocks(rows):
+            self.model.partial_fit(self.scaler.transform(raw))
+            self.sample.add(raw)
+        for block_offset, raw in self.blocks(rows):
+            self.label_block(offset + block_offset, raw)
+        elapsed = time.perf_counter() - start
+        self.timings = {"kmeans": elapsed}
+        report = {"rows": len(rows), "total_rows": len(self.labels), "update_s": elapsed}
+        if compare and table is not None:
+            full_start = time.perf_counter()
+            ImageClusters(table, len(self.model.centroids), self.seed, self.block_rows,
+                          self.sample.size)
+            report["full_s"] = time.perf_counter() - full_start
+            report["speedup"] = report["full_s"] / max(elapsed, 1e-9)
+        return report
+
+    def projection(self, max_points=20_000):
+        """2-D PCA projection of the sampled images, with their labels"""
+        features = self.scaler.transform(self.sample.rows)
+        return sample(self.pca.transform(features), self.model.predict(features), max_points)
+
+    def summaries(self):
+        """Per-cluster size and mean of each raw feature, largest cluster first"""
+        stats = []
+        for c in np.argsort(-self.sizes, kind="stable"):
+            if self.sizes[c] == 0:
+                continue
+            means = self.sums[c] / self.sizes[c]
+            stats.append({
+                "cluster": int(c),
+                "images": int(self.sizes[c]),
+                "style_accuracy": float(means[0]),
+                "likes": float(means[1]),
+                "shares": float(means[2]),
+                "comments": float(means[3]),
+            })
+        return stats
+
+def summary_text(clusters):
+    """Describe the image clusters in the style of the ImagePage3 text"""
+    stats = clusters.summaries()
+    overall_accuracy = clusters.sums[:, 0].sum() / max(clusters.sizes.sum(), 1)
+    lines = [f"K-Means clustering of {len(clusters.labels)} images on style accuracy and "
+             f"engagement features identified {len(stats)} clusters.", ""]
+    for s in stats:
+        level = "High" if s["style_accuracy"] >= overall_accuracy else "Low"
+        lines.append(f"Cluster {s['cluster']}: {s['images']} images, {level} Style Accuracy "
+                     f"({s['style_accuracy']:.1f}), averaging {s['likes']:.1f} likes, "
+                     f"{s['shares']:.1f} shares, {s['comments']:.1f} comments.")
+    return "\n".join(lines)
@@ -0,0 +1,212 @@
+"""Force-directed layouts of community graphs, cached on disk
+
+Communities are laid out as super-nodes with a vectorized
+Fruchterman-Reingold pass, each sized to hold its members. Members are
+then spread over their community's disc and pulled towards their
+neighbours with a few sparse averaging steps, so the cost stays linear
+in the edges for graphs of hundreds of thousands of nodes.
+"""
+import hashlib
+import os
+import numpy as np
+import scipy.sparse as sp
+from imagecache import CACHE_DIR
+from louvain import aggregate, as_graph
+
+LAYOUT_DIR = os.path.join(CACHE_DIR, "layouts")
+# Bump when the layout algorithm changes, so old cached positions are ignored
+LAYOUT_VERSION = 1
+# Largest communities placed by the force simulation; the rest go on a spiral
+MAX_FORCE_NODES = 500
+# Edges kept for drawing, heaviest first
+MAX_COMMUNITY_EDGES = 2_000
+MAX_NODE_EDGES = 200_000
+# Grid cells per side of the spatial index used for viewport culling
+GRID_CELLS = 128
+
+def force_layout(weights, radii, iterations=150, gravity=0.05, seed=0):
+    """Fruchterman-Reingold on a small dense weight matrix
+
+    Each pair's ideal distance is the sum of the two radii, so discs end
+    up about touching when linked and apart when not; a weak pull towards
+    the origin keeps separate components together. O(k^2) per step.
+    """
+    k = len(radii)
+    rng = np.random.default_rng(seed)
+    span = np.sqrt((radii ** 2).sum()) * 2
+    positions = rng.uniform(-span, span, (k, 2))
+    if k < 2:
+        return positions * 0
+    ideal = radii[:, None] + radii[None, :]
+    weights = weights / max(weights.max(), 1e-12)
+    np.fill_diagonal(weights, 0)
+    temperature = span / 4
+    for step in range(iterations):
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance = np.maximum(np.sqrt((delta ** 2).sum(axis=2)), 1e-9)
+        np.fill_diagonal(distance, np.inf)
+        # Repulsion ideal^2 / d between all pairs, attraction w d^2 / ideal along edges
+        attraction = weights * np.where(np.isfinite(distance), distance, 0) ** 2 / ideal
+        force = ideal ** 2 / distance - attraction
+        displacement = (delta / distance[:, :, None] * force[:, :, None]).sum(axis=1)
+        displacement -= gravity * k * positions
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-9)
+        cooled = temperature * (1 - step / iterations)
+        positions += displacement / length[:, None] * np.minimum(length, cooled)[:, None]
+    return positions - positions.mean(axis=0)
+
+def spiral(radii, start_radius):
+    """Pack discs along a golden-angle spiral outside start_radius"""
+    angle = np.arange(len(radii)) * np.pi * (3 - np.sqrt(5))
+    # Area-preserving spacing, so each disc gets room in proportion to its area
+    distance = np.sqrt(start_radius ** 2 + 1.5 * np.cumsum((2 * radii) ** 2))
+    return np.column_stack([distance * np.cos(angle), distance * np.sin(angle)])
+
+def community_layout(graph, labels, seed=0, smoothing=10):
+    """Node positions, community centres and community radii for a partition"""
+    rng = np.random.default_rng(seed)
+    n = graph.shape[0]
+    sizes = np.bincount(labels)
+    radii = np.sqrt(sizes).astype(np.float64)
+    k = len(sizes)
+
+    centres = np.zeros((k, 2))
+    # Communities linked to others go through the force simulation, largest
+    # first; isolated and overflow ones are packed around the outside
+    between = aggregate(graph, labels).tolil()
+    between.setdiag(0)
+    between = between.tocsr()
+    linked = np.diff(between.indptr) > 0
+    order = np.argsort(-sizes, kind="stable")
+    placed = order[linked[order]][:MAX_FORCE_NODES]
+    weights = between[placed][:, placed].toarray()
+    centres[placed] = force_layout(np.log1p(weights), radii[placed], seed=seed)
+    rest = np.setdiff1d(order, placed, assume_unique=True)
+    rest = rest[sizes[rest] > 0]
+    if len(rest):
+        extent = np.sqrt((centres[placed] ** 2).sum(axis=1)) + radii[placed]
+        centres[rest] = spiral(radii[rest], extent.max() if len(placed) else 0.0)
+
+    # Members start uniformly over their community's disc
+    angle = rng.uniform(0, 2 * np.pi, n)
+    distance = np.sqrt(rng.random(n)) * radii[labels] * 0.9
+    anchors = centres[labels] + np.column_stack([distance * np.cos(angle),
+                                                 distance * np.sin(angle)])
+
+    # Then move halfway to the mean of their neighbours in the same community;
+    # averages of points in a disc stay in the disc
+    coo = graph.tocoo()
+    inside = (labels[coo.row] == labels[coo.col]) & (coo.row != coo.col)
+    within = sp.csr_matrix((coo.data[inside], (coo.row[inside], coo.col[inside])),
+                           shape=(n, n))
+    degree = np.asarray(within.sum(axis=1)).ravel()
+    linked = degree > 0
+    mean_of_neighbours = sp.diags(1 / np.where(linked, degree, 1)) @ within
+    positions = anchors.copy()
+    for _ in range(smoothing):
+        neighbour_mean = mean_of_neighbours @ positions
+        positions[linked] = 0.5 * anchors[linked] + 0.5 * neighbour_mean[linked]
+    return positions, centres, radii
+
+def layout_key(graph, labels, seed):
+    digest = hashlib.blake2b(digest_size=16)
+    for array in (graph.indptr, graph.indices, graph.data, labels):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(f"v{LAYOUT_VERSION}-s{seed}".encode("ascii"))
+    return digest.hexdigest()
+
+def cached_layout(graph, labels, seed=0, cache_dir=None):
+    """community_layout, loaded from disk when the same graph was laid out before"""
+    path = os.path.join(cache_dir or LAYOUT_DIR, layout_key(graph, labels, seed) + ".npz")
+    if os.path.exists(path):
+        with np.load(path) as saved:
+            return saved["positions"], saved["centres"], saved["radii"]
+    positions, centres, radii = community_layout(graph, labels, seed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, positions=positions, centres=centres, radii=radii)
+    os.replace(tmp, path)
+    return positions, centres, radii
+
+def heaviest(rows, cols, weights, limit):
+    """Upper-triangle edges, at most limit of them, heaviest first"""
+    upper = rows < cols
+    rows, cols, weights = rows[upper], cols[upper], weights[upper]
+    if len(weights) > limit:
+        keep = np.argpartition(-weights, limit)[:limit]
+        rows, cols, weights = rows[keep], cols[keep], weights[keep]
+    order = np.argsort(-weights, kind="stable")
+    return rows[order].astype(np.int32), cols[order].astype(np.int32), weights[order]
+
+class GraphView:
+    """Positions, communities and edges of a graph, ready to draw at any zoom
+
+    Nodes are also sorted into a GRID_CELLS x GRID_CELLS grid so the nodes
+    inside a viewport can be found without scanning them all.
+    """
+    def __init__(self, positions, labels, centres, radii, community_edges, edges):
+        self.positions = positions.astype(np.float32)
+        self.labels = labels.astype(np.int32)
+        self.centres = centres
+        self.radii = radii
+        self.sizes = np.bincount(labels, minlength=len(radii))
+        self.community_edges = community_edges
+        self.edges = edges
+
+        self.low = np.minimum(self.positions.min(axis=0), (centres - radii[:, None]).min(axis=0))
+        self.high = np.maximum(self.positions.max(axis=0), (centres + radii[:, None]).max(axis=0))
+        self.cell_size = np.maximum((self.high - self.low) / GRID_CELLS, 1e-9)
+        cells = self.cell(self.positions)
+        cell_ids = cells[:, 1] * GRID_CELLS + cells[:, 0]
+        self.order = np.argsort(cell_ids, kind="stable").astype(np.int32)
+        self.cell_starts = np.searchsorted(cell_ids[self.order], np.arange(GRID_CELLS ** 2 + 1))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def cell(self, points):
+        return np.clip(((points - self.low) / self.cell_size).astype(np.int64), 0, GRID_CELLS - 1)
+
+    def nodes_in(self, x0, y0, x1, y1):
+        """Indices of the nodes inside a world-space rectangle"""
+        (cx0, cy0), (cx1, cy1) = self.cell(np.array([[x0, y0], [x1, y1]]))
+        rows = np.arange(cy0, cy1 + 1) * GRID_CELLS
+        pieces = [self.order[self.cell_starts[r + cx0]:self.cell_starts[r + cx1 + 1]]
+                  for r in rows]
+        nodes = np.concatenate(pieces) if pieces else np.empty(0, dtype=np.int32)
+        # Cells on the border may hold nodes just outside the rectangle
+        xy = self.positions[nodes]
+        inside = (xy[:, 0] >= x0) & (xy[:, 0] <= x1) & (xy[:, 1] >= y0) & (xy[:, 1] <= y1)
+        return nodes[inside]
+
+    def community_at(self, x, y):
+        """The community whose disc holds a world-space point, or None"""
+        distance = np.hypot(self.centres[:, 0] - x, self.centres[:, 1] - y)
+        inside = (distance <= self.radii) & (self.sizes > 0)
+        if not inside.any():
+            return None
+        # Nested discs can't happen, but overlapping edges can; prefer the nearest centre
+        return int(np.flatnonzero(inside)[np.argmin((distance / self.radii)[inside])])
+
+    def count_in(self, x0, y0, x1, y1):
+        """Upper bound on the nodes inside a rectangle, from whole grid cells"""
+        (cx0, cy0), (cx1, cy1) = self.cell(np.array([[x0, y0], [x1, y1]]))
+        rows = np.arange(cy0, cy1 + 1) * GRID_CELLS
+        return int((self.cell_starts[rows + cx1 + 1] - self.cell_starts[rows + cx0]).sum())
+
+def graph_view(adjacency, labels, seed=0, cache_dir=None):
+    """Lay out a clustered graph (cached) and package it as a GraphView
+
+    labels must be numbered 0..k-1; they are drawn as C0, C1, ... so pass
+    the numbering the page text uses.
+    """
+    graph = as_graph(adjacency)
+    labels = np.asarray(labels, dtype=np.int64)
+    positions, centres, radii = cached_layout(graph, labels, seed, cache_dir)
+
+    coo = graph.tocoo()
+    edges = heaviest(coo.row, coo.col, coo.data, MAX_NODE_EDGES)
+    communities = aggregate(graph, labels).tocoo()
+    community_edges = heaviest(communities.row, communities.col, communities.data,
+                               MAX_COMMUNITY_EDGES)
+    return GraphView(positions, labels, centres, radii, community_edges, edges)
@@ -0,0 +1,150 @@
+import numpy as np
+from clusterindex import KINDS, profile_text
+from dataset import ColumnStore, open_dataset
+from jobs import INLINE
+import engagement
+import kmeans
+import prompts
+import tasks
+import temporal
+
+class MemberRows:
+    """Community members as rows for a VirtualList, formatted only when shown
+
+    Members are sorted by community; describe(member) gives the text
+    after the community number.
+    """
+    def __init__(self, labels, describe):
+        self.labels = np.asarray(labels)
+        self.order = np.argsort(self.labels, kind="stable")
+        self.describe = describe
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        member = self.order[i]
+        return f"C{self.labels[member]:<5} {self.describe(member)}"
+
+    def community(self, i):
+        return int(self.labels[self.order[i]])
+
+class LiveAnalysis:
+    """Analysis results behind the community pages, kept in step with the dataset
+
+    Stage results arrive through set_stage(), either from worker-pool jobs
+    running the functions in tasks.py or inline from run(). Each stage
+    maps only the columns it uses from the dataset's column store.
+    """
+    def __init__(self, path=None, store_path=None, seed=0, sync=True):
+        self.path = path
+        # Pass sync=False when a worker has already brought the store up to date
+        self.store = open_dataset(path, store_path) if sync else ColumnStore(store_path)
+        self.seed = seed
+        self.users = None
+        self.images = None
+        self.prompts = None
+        self.evolution = None
+        # clusterindex.ClusterIndex over all three stages, once they agree
+        self.index = None
+
+    def set_stage(self, stage, result):
+        """Store the state produced by a stage job"""
+        setattr(self, stage, result["state"])
+        if stage in KINDS:
+            self.index = None
+
+    def index_inputs(self):
+        """Arguments for tasks.index_stage, or None until every stage covers the same rows"""
+        if not (self.users and self.images and self.prompts):
+            return None
+        rows = {len(self.users.table), len(self.images.labels), len(self.prompts.inverse)}
+        if len(rows) != 1:
+            return None
+        return (self.users.result.labels, self.images.labels,
+                self.prompts.communities[self.prompts.inverse])
+
+    def build_index(self):
+        inputs = self.index_inputs()
+        if inputs is not None:
+            self.index = tasks.index_stage(INLINE, self.store.path, *inputs)
+        return self.index
+
+    def run(self):
+        """Compute every stage in this process"""
+        for stage, task in tasks.STAGES.items():
+            self.set_stage(stage, task(INLINE, self.store.path, self.seed))
+        self.build_index()
+        return self
+
+    def has_new_rows(self):
+        """Cheap check for data appended since the last sync"""
+        try:
+            return self.store.stale(self.path)
+        except OSError:
+            return False
+
+    def refresh(self, compare=False):
+        """Update every stage in this process; returns per-stage work reports"""
+        start = self.store.rows
+        if not self.store.sync(self.path):
+            return None
+        reports = {}
+        for stage in tasks.UPDATE_COLUMNS:
+            result = tasks.update_stage(INLINE, stage, getattr(self, stage), self.store.path,
+                                        start, compare, self.seed)
+            self.set_stage(stage, result)
+            reports[stage] = result["report"]
+        # Prompt communities are rebuilt; the embedding store keeps that cheap
+        self.set_stage("prompts", tasks.prompt_stage(INLINE, self.store.path, self.seed))
+        # New rows carry new dates, so the time windows are replayed too
+        self.set_stage("evolution", tasks.evolution_stage(INLINE, self.store.path, self.seed))
+        self.build_index()
+        return reports
+
+    def community_text(self, kind, community):
+        """Profile of one community from the index, for when it is clicked"""
+        if self.index is None:
+            return None
+        if community >= self.index.count(kind):
+            # Graph communities past the user ones hold only content
+            return f"Community {community} holds content but no users."
+        return profile_text(self.index.profile(kind, community))
+
+    def user_text(self):
+        return engagement.summary_text(self.users.result) if self.users else None
+
+    def image_text(self):
+        return kmeans.summary_text(self.images) if self.images else None
+
+    def user_members(self):
+        """Every user with their community, for the ImagePage1 list"""
+        if not self.users:
+            return None
+        result = self.users.result
+        names = result.table.categories.get("user_id")
+        return MemberRows(result.labels, lambda u: names[u] if names else f"user {u}")
+
+    def prompt_members(self):
+        """Every distinct prompt with its Leiden community, for the ImagePage2 list"""
+        if not self.prompts:
+            return None
+        state = self.prompts
+        return MemberRows(state.communities,
+                          lambda p: f"{state.prompts[p]}  ({state.counts[p]} posts)")
+
+    def evolution_text(self):
+        return temporal.summary_text(self.evolution) if self.evolution else None
+
+    def prompt_texts(self):
+        """(Leiden text, K-Means text) for the two ImagePage2 panels"""
+        return prompts.summary_text(self.prompts) if self.prompts else None
+
+def format_report(report):
+    """One line per stage describing the work an incremental update did"""
+    lines = []
+    for stage, stats in report.items():
+        detail = ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}"
+                           for k, v in stats.items())
+        lines.append(f"{stage}: {detail}")
+    return "\n".join(lines)
@@ -0,0 +1,339 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components, reverse_cuthill_mckee
+
+# Worker processes for parallel community detection (SNA_WORKERS overrides)
+WORKERS = int(os.environ.get("SNA_WORKERS", 0)) or os.cpu_count() or 1
+# Stored edges per shard below which splitting a graph isn't worth it
+SHARD_EDGES = 500_000
+MAX_SHARDS = 16
+
+def as_graph(adjacency):
+    """Return a symmetric CSR matrix with float weights"""
+    graph = sp.csr_matrix(adjacency, dtype=np.float64)
+    graph.sum_duplicates()
+    return graph
+
+def compact(labels):
+    """Renumber labels to 0..k-1 in order of first appearance"""
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    order = np.argsort(np.argsort(first))
+    return order[inverse].astype(np.int64)
+
+def membership(labels, n_communities=None):
+    """One-hot (node x community) sparse matrix for a label vector"""
+    n = len(labels)
+    k = n_communities or (int(labels.max()) + 1 if n else 0)
+    return sp.csr_matrix((np.ones(n), (np.arange(n), labels)), shape=(n, k))
+
+def modularity(graph, labels, resolution=1.0):
+    """Newman modularity of a partition of a weighted undirected graph"""
+    coo = graph.tocoo()
+    degree = np.asarray(graph.sum(axis=1)).ravel()
+    return edge_modularity(coo.row, coo.col, coo.data, np.asarray(labels), degree,
+                           degree.sum(), resolution)
+
+def edge_modularity(rows, cols, weights, labels, degree, total, resolution):
+    """Modularity from a graph's edge arrays, avoiding any matrix products"""
+    if total == 0:
+        return 0.0
+    internal = weights[labels[rows] == labels[cols]].sum()
+    community_degree = np.bincount(labels, weights=degree)
+    return float(internal / total - resolution * ((community_degree / total) ** 2).sum())
+
+def best_moves(edges, labels, degree, total, resolution):
+    """For every node, the neighbouring community with the largest modularity gain
+
+    edges are the (rows, cols, weights) arrays of the graph without its
+    diagonal. Returns (target, gain, stay_gain) arrays. All nodes are
+    evaluated at once with sparse operations instead of a loop per node.
+    """
+    n = len(degree)
+    rows, cols, weights = edges
+    links = sp.csr_matrix((weights, (rows, labels[cols])), shape=(n, n))
+    links.sum_duplicates()
+
+    community_degree = np.bincount(labels, weights=degree, minlength=n)
+    rows = np.repeat(np.arange(n), np.diff(links.indptr))
+    cols = links.indices
+    # Degree of each candidate community without the moving node itself
+    without_self = community_degree[cols] - np.where(cols == labels[rows], degree[rows], 0.0)
+    gain = links.data - resolution * degree[rows] * without_self / total
+
+    # Gain of staying put, for nodes with no link into their own community
+    stay = -resolution * degree * (community_degree[labels] - degree) / total
+    own = cols == labels[rows]
+    stay[rows[own]] = gain[own]
+
+    target = labels.copy()
+    best = stay.copy()
+    if len(gain):
+        # Highest gain per row; columns are sorted, so the first maximum wins
+        # ties towards the smaller community label
+        starts = links.indptr[:-1][np.diff(links.indptr) > 0]
+        row_max = np.repeat(np.maximum.reduceat(gain, starts), np.diff(np.r_[starts, len(gain)]))
+        is_max = np.flatnonzero(gain == row_max)
+        first = is_max[np.r_[True, rows[is_max][1:] != rows[is_max][:-1]]]
+        target[rows[first]] = cols[first]
+        best[rows[first]] = gain[first]
+    return target, best, stay
+
+def local_moving(graph, labels, resolution=1.0, rng=None, max_sweeps=32, tol=1e-6,
+                 active=None, callback=None):
+    """Move nodes between communities until modularity stops improving
+
+    Moves are applied in synchronous rounds to a random subset of the
+    improving nodes; a round that lowers modularity is rolled back and the
+    subset shrinks, which avoids the oscillation of fully parallel moves.
+    callback, if given, is called once per round (e.g. to check for
+    cancellation). Returns (labels, modularity, number of node moves).
+    """
+    rng = rng or np.random.default_rng(0)
+    coo = graph.tocoo()
+    degree = np.asarray(graph.sum(axis=1)).ravel()
+    total = degree.sum()
+    off_diagonal = coo.row != coo.col
+    edges = (coo.row[off_diagonal], coo.col[off_diagonal], coo.data[off_diagonal])
+    # Community ids must index node-sized arrays
+    labels = compact(np.asarray(labels))
+    quality = edge_modularity(coo.row, coo.col, coo.data, labels, degree, total, resolution)
+    if total == 0:
+        return labels, quality, 0
+
+    fraction = 1.0
+    moves = 0
+    idle = 0
+    for sweep in range(max_sweeps):
+        if callback is not None:
+            callback()
+        target, best, stay = best_moves(edges, labels, degree, total, resolution)
+        improving = (target != labels) & (best > stay + 1e-12)
+        # Alternate between moves towards smaller and larger labels so that
+        # two nodes never swap communities with each other in one round
+        improving &= (target < labels) if sweep % 2 == 0 else (target > labels)
+        if active is not None:
+            improving &= active
+        candidates = np.flatnonzero(improving)
+        if not len(candidates):
+            # Stop once neither direction has anything left to move
+            idle += 1
+            if idle == 2:
+                break
+            continue
+        idle = 0
+        chosen = candidates[rng.random(len(candidates)) < fraction]
+        if not len(chosen):
+            chosen = candidates[:1]
+
+        trial = labels.copy()
+        trial[chosen] = target[chosen]
+        trial_quality = edge_modularity(coo.row, coo.col, coo.data, trial, degree, total,
+                                        resolution)
+        if trial_quality <= quality:
+            fraction /= 2
+            if fraction < 1e-3:
+                break
+            continue
+
+        moves += len(chosen)
+        fraction = min(1.0, fraction * 2)
+        gained = trial_quality - quality
+        labels, quality = trial, trial_quality
+        if gained < tol:
+            break
+    return labels, quality, moves
+
+def aggregate(graph, labels):
+    """Collapse each community into a single node of a coarser graph"""
+    member = membership(labels)
+    return (member.T @ graph @ member).tocsr()
+
+def louvain(adjacency, resolution=1.0, seed=0, max_levels=16, initial=None, callback=None):
+    """Louvain community detection on a sparse weighted undirected graph
+
+    Alternates vectorized local moving with graph aggregation until no
+    level merges any further. An optional initial partition warm-starts
+    the first level. Returns (labels, modularity) with labels compacted to
+    0..k-1 in order of first appearance.
+    """
+    graph = as_graph(adjacency)
+    n = graph.shape[0]
+    rng = np.random.default_rng(seed)
+    labels = compact(np.asarray(initial)) if initial is not None else np.arange(n)
+
+    level_graph = aggregate(graph, labels)
+    level_labels = labels
+    for _ in range(max_levels):
+        moved, _, moves = local_moving(level_graph, np.arange(level_graph.shape[0]),
+                                       resolution, rng, callback=callback)
+        if moves == 0:
+            break
+        moved = compact(moved)
+        level_labels = moved[level_labels]
+        level_graph = aggregate(level_graph, moved)
+    labels = compact(level_labels)
+    quality = modularity(graph, labels, resolution)
+    return labels, quality
+
+def refine(graph, labels):
+    """Split every community into its connected pieces
+
+    This is the guarantee Leiden's refinement phase adds over Louvain: no
+    community is ever internally disconnected.
+    """
+    coo = graph.tocoo()
+    inside = labels[coo.row] == labels[coo.col]
+    within = sp.csr_matrix((coo.data[inside], (coo.row[inside], coo.col[inside])),
+                           shape=graph.shape)
+    _, pieces = connected_components(within, directed=False)
+    return pieces
+
+def leiden(adjacency, resolution=1.0, seed=0, max_levels=16, callback=None):
+    """Leiden-style community detection on a sparse weighted undirected graph
+
+    Each level runs the vectorized local moving phase, refines the
+    communities into connected sub-communities and aggregates on the
+    refined partition while starting the next level from the unrefined
+    one. The refinement is a simplified form of Leiden's: communities are
+    split into connected components rather than re-merged node by node.
+    Returns (labels, modularity).
+    """
+    graph = as_graph(adjacency)
+    rng = np.random.default_rng(seed)
+    level_graph = graph
+    level_labels = np.arange(graph.shape[0])
+    partition = np.arange(graph.shape[0])
+    for _ in range(max_levels):
+        moved, _, moves = local_moving(level_graph, partition, resolution, rng,
+                                       callback=callback)
+        refined = compact(refine(level_graph, moved))
+        n_refined = int(refined.max()) + 1 if len(refined) else 0
+        if moves == 0 and n_refined == level_graph.shape[0]:
+            partition = moved
+            break
+        # Each refined piece lies in one community; start from those communities
+        partition = np.zeros(n_refined, dtype=np.int64)
+        partition[refined] = moved
+        level_labels = refined[level_labels]
+        level_graph = aggregate(level_graph, refined)
+    labels = compact(partition[level_labels])
+    return labels, modularity(graph, labels, resolution)
+
+def shard_count(graph, max_shards=MAX_SHARDS):
+    """Number of shards for a graph; depends on the graph only, never on the cores"""
+    return int(max(1, min(max_shards, graph.nnz // SHARD_EDGES)))
+
+def shard_nodes(graph, n_shards):
+    """Split the nodes into n_shards groups with about equal edge counts
+
+    Reverse Cuthill-McKee numbers each connected component contiguously and
+    keeps neighbours close together, so cutting that order into pieces
+    leaves few edges between shards.
+    """
+    order = reverse_cuthill_mckee(graph, symmetric_mode=True).astype(np.int64)
+    edges = np.cumsum(np.diff(graph.indptr)[order])
+    bounds = np.searchsorted(edges, np.arange(1, n_shards) * edges[-1] / n_shards)
+    return np.split(order, bounds)
+
+def detect_shard(args):
+    """Worker entry point: communities of one shard's induced subgraph"""
+    subgraph, method, resolution, seed = args
+    detect = leiden if method == "leiden" else louvain
+    return detect(subgraph, resolution, seed)[0]
+
+def run_shards(tasks, workers, callback=None):
+    """Run detect_shard over tasks, in a process pool when workers > 1"""
+    if workers <= 1 or len(tasks) == 1:
+        results = []
+        for task in tasks:
+            if callback is not None:
+                callback()
+            results.append(detect_shard(task))
+        return results
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(min(workers, len(tasks)), mp_context=context) as pool:
+        futures = [pool.submit(detect_shard, task) for task in tasks]
+        try:
+            pending = futures
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_EXCEPTION)
+                if any(f.exception() is not None for f in done):
+                    break
+                if callback is not None:
+                    callback()
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+        # Results stay in shard order whichever worker finished first
+        return [f.result() for f in futures]
+
+def parallel_communities(adjacency, method="louvain", resolution=1.0, seed=0, workers=None,
+                         max_shards=MAX_SHARDS, callback=None):
+    """Louvain or Leiden with the first local-moving levels split across cores
+
+    The nodes are cut into shards (see shard_nodes) and each shard's
+    induced subgraph is clustered in its own process, with edges to other
+    shards kept as self-loops and the resolution scaled so gains are the
+    same as on the whole graph.
+    The merge step lets nodes with edges to other shards move, then runs
+    Louvain on the stitched partition so communities can join across
+    shards; Leiden results are finally split into connected pieces.
+
+    Shards and their seeds depend only on the graph and seed, so the
+    result and its cluster numbering are the same for any number of
+    workers. Small graphs get one shard and are clustered directly.
+    Returns (labels, modularity).
+    """
+    graph = as_graph(adjacency)
+    n_shards = shard_count(graph, max_shards)
+    if n_shards == 1:
+        detect = leiden if method == "leiden" else louvain
+        return detect(graph, resolution, seed, callback=callback)
+
+    shards = shard_nodes(graph, n_shards)
+    degree = np.asarray(graph.sum(axis=1)).ravel()
+    total = degree.sum()
+    seeds = np.random.SeedSequence(seed).spawn(n_shards)
+    tasks = []
+    for nodes, shard_seed in zip(shards, seeds):
+        subgraph = graph[nodes][:, nodes]
+        # Edges leaving the shard become self-loops, so every node keeps its
+        # full degree and the gains match those on the whole graph
+        cut = degree[nodes] - np.asarray(subgraph.sum(axis=1)).ravel()
+        subgraph = (subgraph + sp.diags(cut)).tocsr()
+        tasks.append((subgraph, method, resolution * degree[nodes].sum() / total,
+                      int(shard_seed.generate_state(1)[0])))
+    results = run_shards(tasks, workers or WORKERS, callback)
+
+    n = graph.shape[0]
+    labels = np.empty(n, dtype=np.int64)
+    shard_of = np.empty(n, dtype=np.int64)
+    offset = 0
+    for i, (nodes, shard_labels) in enumerate(zip(shards, results)):
+        labels[nodes] = shard_labels + offset
+        shard_of[nodes] = i
+        offset += int(shard_labels.max()) + 1 if len(shard_labels) else 0
+
+    # Nodes on shard boundaries may change sides before communities merge
+    coo = graph.tocoo()
+    boundary = np.zeros(n, dtype=bool)
+    boundary[coo.row[shard_of[coo.row] != shard_of[coo.col]]] = True
+    rng = np.random.default_rng(seed)
+    moved, _, _ = local_moving(graph, labels, resolution, rng, active=boundary,
+                               callback=callback)
+    labels, quality = louvain(graph, resolution, seed, initial=moved, callback=callback)
+    if method == "leiden":
+        labels = compact(refine(graph, labels))
+        quality = modularity(graph, labels, resolution)
+    return labels, quality
+
+def parallel_louvain(adjacency, resolution=1.0, seed=0, workers=None, callback=None):
+    return parallel_communities(adjacency, "louvain", resolution, seed, workers,
+                                callback=callback)
+
+def parallel_leiden(adjacency, resolution=1.0, seed=0, workers=None, callback=None):
+    return parallel_communities(adjacency, "leiden", resolution, seed, workers,
+                                callback=callback)
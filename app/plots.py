@@ -0,0 +1,159 @@
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Cluster colours, in the order the original figures used them
+PALETTE = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+           "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
+
+# Community events on the evolution timeline
+EVENT_COLOURS = {"birth": "#2ca02c", "death": "#7f7f7f", "merge": "#ff7f0e", "split": "#d62728"}
+
+def colour(label):
+    return PALETTE[int(label) % len(PALETTE)]
+
+def day(seconds):
+    """Date of a timestamp in seconds, as YYYY-MM-DD"""
+    return str(np.datetime64(int(seconds), "s").astype("datetime64[D]"))
+
+def sample(points, labels, max_points, seed=0):
+    """At most max_points rows, chosen uniformly at random"""
+    if len(points) <= max_points:
+        return points, labels
+    keep = np.random.default_rng(seed).choice(len(points), max_points, replace=False)
+    return points[keep], labels[keep]
+
+def scatter(points, labels, size=(1200, 900), title="", radius=3, margin=60):
+    """Scatter plot of 2-D points coloured by label, drawn with PIL"""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    if title:
+        draw.text((margin, margin // 3), title, fill="#3e3e3e")
+    if not len(points):
+        return image
+
+    points = np.asarray(points, dtype=np.float64)
+    low, high = points.min(axis=0), points.max(axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    width, height = size[0] - 2 * margin, size[1] - 2 * margin
+    xy = np.empty_like(points)
+    xy[:, 0] = margin + (points[:, 0] - low[0]) / span[0] * width
+    xy[:, 1] = margin + (1 - (points[:, 1] - low[1]) / span[1]) * height
+
+    draw.rectangle([margin, margin, margin + width, margin + height], outline="#3e3e3e")
+    for (x, y), label in zip(xy, labels):
+        draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=colour(label))
+
+    # Legend, one entry per cluster
+    for i, label in enumerate(np.unique(labels)[:len(PALETTE)]):
+        y = margin + 10 + 18 * i
+        x = margin + width - 110
+        draw.ellipse([x, y, x + 10, y + 10], fill=colour(label))
+        draw.text((x + 16, y - 2), f"Cluster {label}", fill="#3e3e3e")
+    return image
+
+def graph_figure(view, size=(1600, 1200), title="", max_nodes=50_000, margin=60, seed=0):
+    """Static picture of a layout.GraphView: community links, a node sample, labels"""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    if title:
+        draw.text((margin, margin // 3), title, fill="#3e3e3e")
+    if not len(view):
+        return image
+
+    span = np.maximum(view.high - view.low, 1e-9)
+    scale = min((size[0] - 2 * margin) / span[0], (size[1] - 2 * margin) / span[1])
+    offset = (np.array(size) - span * scale) / 2
+
+    def to_image(points):
+        return (np.asarray(points) - view.low) * scale + offset
+
+    rows, cols, weights = view.community_edges
+    if len(weights):
+        widths = 1 + 4 * weights / weights.max()
+        for a, b, w in zip(to_image(view.centres[rows]), to_image(view.centres[cols]), widths):
+            draw.line([tuple(a), tuple(b)], fill="#d0d0d0", width=int(w))
+
+    nodes = np.arange(len(view))
+    if len(nodes) > max_nodes:
+        nodes = np.random.default_rng(seed).choice(len(nodes), max_nodes, replace=False)
+    radius = 1 if len(nodes) > 5_000 else 2
+    for (x, y), label in zip(to_image(view.positions[nodes]), view.labels[nodes]):
+        draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=colour(label))
+
+    # Name the largest communities at their centres
+    for c in np.argsort(-view.sizes, kind="stable")[:len(PALETTE)]:
+        if view.sizes[c]:
+            x, y = to_image(view.centres[c])
+            draw.text((x, y), f"C{c}", fill="#3e3e3e")
+    return image
+
+def panel(draw, box, lines, label):
+    """Line chart of equal-length series in box; lines is [(values, colour)]"""
+    x0, y0, x1, y1 = box
+    draw.rectangle(box, outline="#3e3e3e")
+    draw.text((x0 + 6, y0 + 4), label, fill="#3e3e3e")
+    finite = np.concatenate([v[np.isfinite(v)] for v, _ in lines])
+    if not len(finite):
+        return
+    low, high = finite.min(), finite.max()
+    span = high - low if high > low else 1.0
+    draw.text((x1 + 6, y0), f"{high:.3g}", fill="#3e3e3e")
+    draw.text((x1 + 6, y1 - 12), f"{low:.3g}", fill="#3e3e3e")
+    for values, fill in lines:
+        n = len(values)
+        xs = x0 + (np.arange(n) + 0.5) / max(n, 1) * (x1 - x0)
+        ys = y1 - 8 - (values - low) / span * (y1 - y0 - 24)
+        points = [(x, y) for x, y in zip(xs, ys) if np.isfinite(y)]
+        if len(points) > 1:
+            draw.line(points, fill=fill, width=2)
+        elif points:
+            x, y = points[0]
+            draw.ellipse([x - 2, y - 2, x + 2, y + 2], fill=fill)
+
+def timeline(series, size=(1200, 900), title="", margin=60):
+    """Tracked communities with their events, modularity and power-law exponents per window"""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    if title:
+        draw.text((margin, margin // 3), title, fill="#3e3e3e")
+    n = len(series["start"])
+    if not n:
+        return image
+
+    right = size[0] - margin
+    height = (size[1] - 2 * margin) // 3
+    boxes = [(margin, margin + i * height, right - 40, margin + (i + 1) * height - 16)
+             for i in range(3)]
+    panel(draw, boxes[0], [(series["communities"].astype(np.float64), PALETTE[0])],
+          "Tracked communities, with births, deaths, merges and splits")
+    panel(draw, boxes[1], [(series["modularity"], PALETTE[2])], "Modularity")
+    panel(draw, boxes[2], [(series["degree_alpha"], PALETTE[1]), (series["size_alpha"], PALETTE[4])],
+          "Power-law exponent: node degree (orange), community size (purple)")
+
+    # Event counts as stacked ticks along the bottom of the first panel
+    x0, _, x1, y1 = boxes[0]
+    most = max(max(int(series[kind].max()), 1) for kind in EVENT_COLOURS)
+    for w in range(n):
+        x = x0 + (w + 0.5) / n * (x1 - x0)
+        y = y1 - 1
+        for kind, fill in EVENT_COLOURS.items():
+            length = 30 * series[kind][w] / most
+            if length:
+                draw.line([(x, y), (x, y - length)], fill=fill, width=2)
+                y -= length
+
+    draw.text((margin, size[1] - margin + 4), day(series["start"][0]), fill="#3e3e3e")
+    draw.text((right - 120, size[1] - margin + 4), day(series["start"][-1]), fill="#3e3e3e")
+    for i, (kind, fill) in enumerate(EVENT_COLOURS.items()):
+        x = margin + 200 + 90 * i
+        draw.rectangle([x, size[1] - margin + 6, x + 10, size[1] - margin + 16], fill=fill)
+        draw.text((x + 14, size[1] - margin + 4), kind, fill="#3e3e3e")
+    return image
+
+def to_buffer(image):
+    """(mode, size, raw bytes): cheap to send between processes, ready for display"""
+    return image.mode, image.size, image.tobytes()
+
+def from_buffer(buffer):
+    mode, size, data = buffer
+    return Image.frombytes(mode, size, data)
@@ -0,0 +1,216 @@
+import re
+import time
+from collections import Counter
+import numpy as np
+import scipy.sparse as sp
+from decomposition import pca
+from kmeans import MiniBatchKMeans, nearest
+from louvain import parallel_leiden
+from plots import sample
+
+TOKEN = re.compile(r"[a-z][a-z'-]+")
+STOP_WORDS = frozenset("""a an and at by for from in into of on or the to with style
+    image art ai generated ghibli studio""".split())
+
+def normalize(prompt):
+    """Canonical form of a prompt used for de-duplication and hashing"""
+    return " ".join(prompt.lower().split())
+
+def tokenize(prompt):
+    return [t for t in TOKEN.findall(prompt) if t not in STOP_WORDS]
+
+def tfidf(prompts, min_df=1):
+    """Sparse L2-normalized TF-IDF matrix (prompts x vocabulary) and vocabulary"""
+    tokens = [tokenize(p) for p in prompts]
+    df = Counter(t for doc in tokens for t in set(doc))
+    vocabulary = sorted(t for t, n in df.items() if n >= min_df)
+    index = {t: i for i, t in enumerate(vocabulary)}
+
+    indptr, indices = [0], []
+    for doc in tokens:
+        indices.extend(index[t] for t in doc if t in index)
+        indptr.append(len(indices))
+    counts = sp.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                           shape=(len(prompts), len(vocabulary)))
+    counts.sum_duplicates()
+
+    idf = np.log((1 + len(prompts)) / (1 + np.array([df[t] for t in vocabulary]))) + 1
+    matrix = counts @ sp.diags(idf.astype(np.float32))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sp.csr_matrix(sp.diags(1 / norms) @ matrix, dtype=np.float32), vocabulary
+
+def top_k(similarities, k, exclude=None):
+    """Column indices and values of the k largest entries in every row"""
+    if exclude is not None:
+        similarities[np.arange(len(exclude)), exclude] = -np.inf
+    k = min(k, similarities.shape[1] - (exclude is not None))
+    if k <= 0:
+        empty = np.empty((len(similarities), 0))
+        return empty.astype(np.int64), empty
+    part = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    return part, np.take_along_axis(similarities, part, axis=1)
+
+def exact_neighbours(vectors, k, batch_size=2048):
+    """Exact top-k cosine neighbours with batched matrix products"""
+    n = len(vectors)
+    cols = np.empty((n, min(k, max(n - 1, 0))), dtype=np.int64)
+    vals = np.empty(cols.shape, dtype=np.float32)
+    for start in range(0, n, batch_size):
+        stop = min(n, start + batch_size)
+        sims = vectors[start:stop] @ vectors.T
+        cols[start:stop], vals[start:stop] = top_k(sims, k, np.arange(start, stop))
+    return cols, vals
+
+class IVFIndex:
+    """Inverted-file approximate nearest neighbour index for unit vectors
+
+    Vectors are bucketed by their nearest coarse K-Means centroid; a query
+    only scans the buckets of its n_probe closest centroids, so the cost
+    grows with N * N / n_lists instead of N squared.
+    """
+    def __init__(self, vectors, n_lists=None, n_probe=8, seed=0):
+        self.vectors = vectors
+        self.n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        self.n_probe = min(n_probe, self.n_lists)
+        quantizer = MiniBatchKMeans(self.n_lists, batch_size=8192, max_iter=50, seed=seed,
+                                    init="random")
+        quantizer.fit(vectors)
+        self.centroids = quantizer.centroids.astype(np.float32)
+        self.assignment = nearest(vectors, self.centroids)[0]
+        order = np.argsort(self.assignment, kind="stable")
+        bounds = np.searchsorted(self.assignment[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))]
+
+    def neighbours(self, k):
+        """Approximate top-k neighbours of every indexed vector"""
+        n = len(self.vectors)
+        cols = np.full((n, k), -1, dtype=np.int64)
+        vals = np.full((n, k), -np.inf, dtype=np.float32)
+        centroid_sims = self.centroids @ self.centroids.T
+        probes = np.argsort(-centroid_sims, axis=1)[:, :self.n_probe]
+        # Queries sharing a bucket share their candidate set: one product per bucket
+        for c, members in enumerate(self.lists):
+            if not len(members):
+                continue
+            candidates = np.concatenate([self.lists[p] for p in probes[c]])
+            sims = self.vectors[members] @ self.vectors[candidates].T
+            sims[members[:, None] == candidates[None, :]] = -np.inf
+            part, best = top_k(sims, k)
+            cols[members, :part.shape[1]] = candidates[part]
+            vals[members, :part.shape[1]] = best
+        return cols, vals
+
+def similarity_graph(vectors, k=10, exact_below=20_000, seed=0):
+    """Symmetric sparse top-k cosine similarity graph
+
+    Small corpora use exact batched products; larger ones go through the
+    IVF index. Only positive similarities become edges.
+    """
+    if len(vectors) <= exact_below:
+        cols, vals = exact_neighbours(vectors, k)
+    else:
+        cols, vals = IVFIndex(vectors, seed=seed).neighbours(k)
+    rows = np.repeat(np.arange(len(vectors)), cols.shape[1])
+    cols, vals = cols.ravel(), vals.ravel()
+    keep = (cols >= 0) & (vals > 0)
+    graph = sp.csr_matrix((vals[keep], (rows[keep], cols[keep])),
+                          shape=(len(vectors), len(vectors)))
+    return graph.maximum(graph.T).tocsr()
+
+def top_terms(matrix, vocabulary, labels, groups, n_terms=5):
+    """Highest-weighted TF-IDF terms of each of the given groups
+
+    Only the rows of those groups are summed, so the dense result is
+    len(groups) x vocabulary however many groups the labels hold.
+    """
+    groups = np.asarray(groups)
+    slot = np.full(int(labels.max()) + 1 if len(labels) else 0, -1)
+    slot[groups] = np.arange(len(groups))
+    rows = np.flatnonzero(slot[labels] >= 0)
+    member = sp.csr_matrix((np.ones(len(rows)), (slot[labels[rows]], rows)),
+                           shape=(len(groups), len(labels)))
+    weights = (member @ matrix).toarray()
+    return [[vocabulary[t] for t in np.argsort(-row)[:n_terms] if row[t] > 0] for row in weights]
+
+class PromptCommunities:
+    """Prompt similarity communities (Leiden) and PCA + K-Means clusters
+
+    Prompt vectors come from an EmbeddingStore, so only prompts never seen
+    before are encoded. Work is done once per distinct normalized prompt;
+    counts carry the number of posts that used each one.
+    """
+    def __init__(self, prompts, store=None, k=10, n_components=32, n_clusters=5, seed=0,
+                 callback=None):
+        if store is None:
+            # Imported here because the embedding store itself tokenizes with this module
+            from embeddings import EmbeddingStore, default_encoder
+            store = EmbeddingStore(default_encoder())
+        timings = {}
+        start = time.perf_counter()
+        unique, inverse, counts = np.unique([normalize(p) for p in prompts],
+                                            return_inverse=True, return_counts=True)
+        self.prompts = list(unique)
+        self.inverse = inverse
+        self.counts = counts
+        # TF-IDF is only used to name groups by their keywords
+        self.matrix, self.vocabulary = tfidf(self.prompts)
+        self.vectors = store.embed(self.prompts)
+        timings["embed"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.graph = similarity_graph(self.vectors, k, seed=seed)
+        timings["graph"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.communities, self.modularity = parallel_leiden(self.graph, seed=seed,
+                                                            callback=callback)
+        timings["leiden"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reduced, _, _ = pca(self.vectors, n_components, seed=seed)
+        model = MiniBatchKMeans(min(n_clusters, len(self.prompts)), seed=seed).fit(reduced)
+        self.clusters = model.predict(reduced)
+        timings["kmeans"] = time.perf_counter() - start
+        self.timings = timings
+
+    def __getstate__(self):
+        # Vectors can be large and are always available from the store again
+        state = self.__dict__.copy()
+        state["vectors"] = None
+        return state
+
+    def network(self):
+        """(adjacency, labels) of the prompt similarity graph for drawing"""
+        return self.graph, self.communities
+
+    def projection(self, max_points=20_000):
+        """2-D PCA projection of a sample of the prompts, with their K-Means clusters"""
+        points, _, _ = pca(self.vectors, 2)
+        return sample(points, self.clusters, max_points)
+
+    def describe(self, labels, max_groups=6):
+        """(posts, distinct prompts, top terms) per group, largest first"""
+        posts = np.bincount(labels, weights=self.counts).astype(int)
+        distinct = np.bincount(labels)
+        order = np.argsort(-posts, kind="stable")[:max_groups]
+        terms = top_terms(self.matrix, self.vocabulary, labels, order)
+        return [(int(g), posts[g], distinct[g], t) for g, t in zip(order, terms)]
+
+def summary_text(result):
+    """Descriptions for the two ImagePage2 panels: (Leiden text, K-Means text)"""
+    leiden_lines = ["Prompt Similarity Graph:", "",
+                    f"Leiden clustering of the top-k prompt similarity graph "
+                    f"({len(result.prompts)} distinct prompts) found "
+                    f"{int(result.communities.max()) + 1} communities "
+                    f"(modularity {result.modularity:.3f})."]
+    for g, posts, distinct, terms in result.describe(result.communities):
+        leiden_lines += ["", f"Community C{g}: {posts} posts, {distinct} prompts, "
+                             f"keywords: {', '.join(terms)}."]
+
+    kmeans_lines = ["K-Means Clustering:", "",
+                    "Prompt embeddings reduced with PCA and grouped with K-Means."]
+    for g, posts, distinct, terms in result.describe(result.clusters):
+        kmeans_lines += ["", f"Cluster {g}: {posts} posts, {distinct} prompts, "
+                             f"keywords: {', '.join(terms)}."]
+    return "\n".join(leiden_lines), "\n".join(kmeans_lines)
@@ -1,12 +1,44 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import scrolledtext
-from PIL import Image, ImageTk
 import os
+import time
+from clusterindex import KINDS
+from dataset import DATASET_PATH, STORE_PATH, dataset_available
+from imagecache import image_cache, resolve_image
+from instrument import TRACE_PATH, tracer
+from jobs import JobScheduler
+from plots import from_buffer
+from widgets import (EvolutionCanvas, GifAnimator, GraphCanvas, StatsOverlay, VirtualList,
+                     ZoomCanvas)
+
+# Delay before idle-time prefetching of the next likely page (milliseconds)
+PREFETCH_DELAY_MS = 300
+# How often to check the dataset for newly appended rows (milliseconds)
+DATA_POLL_MS = 60_000
+# Delay after startup before background analysis begins (milliseconds)
+ANALYSIS_DELAY_MS = 500
+# How often the UI collects progress and results from the workers (milliseconds)
+JOB_POLL_MS = 100
+
+# Time each window stays on screen while the evolution timeline plays (milliseconds)
+TIMELINE_FRAME_MS = 400
+
+# Status-bar names of the analysis stages
+STAGE_NAMES = {
+    "users": "User communities (Louvain)",
+    "images": "Image clusters (K-Means)",
+    "prompts": "Prompt communities (Leiden)",
+    "evolution": "Community evolution (time windows)",
+}
 
 class App(tk.Tk):
-    def __init__(self):
+    def __init__(self, prefetch=True, analysis=True):
+        # Before any widget registers a callback, so F12 can time them all
+        tracer.install()
         super().__init__()
+        self.startup_start = time.perf_counter()
+        self.timings = {}
         self.title("AI Art Networks on Ghibli Style Content")
         
         # Get screen width and height
@@ -15,7 +47,11 @@ class App(tk.Tk):
         
         # Set window size to full screen dimensions
         self.geometry(f"{screen_width}x{screen_height}")
-        self.state('zoomed')  # Windows maximized state
+        try:
+            self.state('zoomed')  # Windows maximized state
+        except tk.TclError:
+            # X11 (including the Xvfb benchmark display) has no zoomed state
+            self.attributes('-zoomed', True)
         
         # Ghibli-inspired color palette
         self.ghibli_colors = {
@@ -32,24 +68,61 @@ class App(tk.Tk):
         # Configure styles with Ghibli colors
         self.setup_styles()
 
+        # Progress of background analysis, along the bottom edge
+        self.status = StatusBar(self, self.cancel_jobs)
+        self.status.pack(side="bottom", fill="x")
+
         # Main container with background color
-        container = ttk.Frame(self)
-        container.pack(fill="both", expand=True)
-        container.columnconfigure(0, weight=1)
-        container.rowconfigure(0, weight=1)
+        self.container = ttk.Frame(self)
+        self.container.pack(fill="both", expand=True)
+        self.container.columnconfigure(0, weight=1)
+        self.container.rowconfigure(0, weight=1)
 
+        # Page registry: frames are only constructed the first time they are needed
+        self.pages = (StartPage, SecondPage, ImagePage1, ImagePage2, ImagePage3, TimelinePage)
         self.frames = {}
 
-        for F in (StartPage, SecondPage, ImagePage1, ImagePage2, ImagePage3):
-            frame = F(container, self)
-            self.frames[F] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
+        # Pages likely to be visited next, prefetched while the UI is idle
+        self.prefetch = prefetch
+        self.next_pages = {
+            StartPage: (SecondPage,),
+            SecondPage: (ImagePage1, ImagePage2, ImagePage3, TimelinePage),
+        }
+        self.prefetch_queue = []
+        self.prefetch_job = None
 
+        # Analysis runs in a worker pool; results arrive through poll_jobs
+        self.scheduler = JobScheduler()
+        self.poll_job = None
+        self.analysis = None
+        self.analysis_error = None
+        self.figures = {}  # stage -> PIL image rendered by a worker
+        self.graphs = {}  # stage -> layout.GraphView laid out by a worker
+        self.index_generation = 0  # newest query index job; older results are dropped
+        self.index_building = False  # a query index job is running
+        self.index_loading = False  # a saved index is on its way from the bundle
+        self.saved_index = None  # loaded index, held until its stages are shown
+
+        self.current_page = None
         self.show_frame(StartPage)
+        self.after_idle(self.record_first_paint)
         
         # Add keyboard shortcut for full screen toggle (F11)
         self.bind("<F11>", self.toggle_fullscreen)
         self.bind("<Escape>", self.end_fullscreen)
+        # F12 shows live event-loop statistics, Shift+F12 saves them as a Chrome trace
+        self.bind("<F12>", self.toggle_instrumentation)
+        self.bind("<Shift-F12>", self.export_trace)
+        self.overlay = None
+        if TRACE_PATH:
+            tracer.enable(self)
+        # F5 folds rows appended to the dataset into the communities shown
+        self.bind("<F5>", self.refresh_data)
+        # Benchmarks turn analysis off so workers don't skew UI timings
+        if analysis:
+            self.after(DATA_POLL_MS, self.poll_dataset)
+            self.after(ANALYSIS_DELAY_MS, self.start_analysis)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Fullscreen flag
         self.fullscreen = False
@@ -90,11 +163,287 @@ class App(tk.Tk):
                       background=self.ghibli_colors["pastel_pink"],
                       padding=10)
 
+    def get_frame(self, page):
+        """Return the frame for a page, building it on first request"""
+        frame = self.frames.get(page)
+        if frame is None:
+            start = time.perf_counter()
+            frame = page(self.container, self)
+            frame.grid(row=0, column=0, sticky="nsew")
+            # New widgets stack on top, keep prefetched pages behind the visible one
+            frame.lower()
+            self.frames[page] = frame
+            self.timings[f"build {page.__name__}"] = time.perf_counter() - start
+        return frame
+
     def show_frame(self, page):
         """Raise the frame to the top"""
-        frame = self.frames[page]
+        frame = self.get_frame(page)
+        if self.current_page is not None and self.current_page != page:
+            previous = self.frames[self.current_page]
+            if hasattr(previous, "on_hide"):
+                previous.on_hide()
         frame.tkraise()
+        self.current_page = page
+        if hasattr(frame, "on_show"):
+            frame.on_show()
+        self.schedule_prefetch(page)
+
+    def schedule_prefetch(self, page):
+        """Queue the pages likely to follow this one for idle-time construction"""
+        if not self.prefetch:
+            return
+        self.prefetch_queue = [p for p in self.next_pages.get(page, ()) if p not in self.frames]
+        if self.prefetch_job is None and self.prefetch_queue:
+            self.prefetch_job = self.after(PREFETCH_DELAY_MS, self.prefetch_next)
+
+    def prefetch_next(self):
+        """Build one queued page, then yield back to the event loop"""
+        self.prefetch_job = None
+        while self.prefetch_queue:
+            page = self.prefetch_queue.pop(0)
+            if page not in self.frames:
+                self.get_frame(page)
+                break
+        if self.prefetch_queue:
+            self.prefetch_job = self.after(PREFETCH_DELAY_MS, self.prefetch_next)
+
+    def record_first_paint(self):
+        """Record the time from App construction to the first drawn window"""
+        self.update_idletasks()
+        self.timings["first paint"] = time.perf_counter() - self.startup_start
+        if os.environ.get("SNA_TIMING"):
+            self.report_timings()
+
+    def report_timings(self):
+        """Print the collected startup and page construction timings"""
+        print("Startup timings:")
+        for name, seconds in self.timings.items():
+            print(f"  {name:<24} {seconds * 1000:8.1f} ms")
+        stats = image_cache.stats
+        print(f"Image cache: {stats['memory_hits']} memory hits, "
+              f"{stats['disk_hits']} disk hits, {stats['misses']} misses")
         
+
+    def submit_job(self, name, fn, *args, on_done=None):
+        """Run fn in the worker pool and start polling for its result"""
+        self.scheduler.submit(name, fn, *args, on_done=on_done,
+                              on_error=lambda e: self.on_job_error(name, e))
+        self.schedule_poll()
+
+    def schedule_poll(self):
+        if self.poll_job is None:
+            self.poll_job = self.after(JOB_POLL_MS, self.poll_jobs)
+
+    def poll_jobs(self):
+        """Deliver worker progress and results on the Tk thread"""
+        self.poll_job = None
+        self.scheduler.poll()
+        self.status.show_jobs(self.scheduler.active)
+        if self.scheduler.active:
+            self.schedule_poll()
+
+    def cancel_jobs(self):
+        self.scheduler.cancel()
+
+    def on_job_error(self, name, error):
+        self.analysis_error = f"{name}: {error}"
+        print(f"Analysis failed: {self.analysis_error}")
+        self.notify_pages()
+
+    def start_analysis(self):
+        """Load saved results if they are current, else analyse in the background"""
+        if not dataset_available():
+            return
+        # Imported here so scipy is only loaded once analysis actually starts
+        import tasks
+        from artifacts import Bundle
+        from dataset import ColumnStore
+        bundle = Bundle()
+        store = ColumnStore(STORE_PATH)
+        if (store.rows and not store.stale(DATASET_PATH)
+                and all(bundle.current(stage, DATASET_PATH) for stage in tasks.STAGES)):
+            self.load_bundle(bundle)
+            return
+        self.submit_job("Dataset", tasks.prepare_dataset, DATASET_PATH, STORE_PATH,
+                        on_done=self.on_dataset_ready)
+
+    def load_bundle(self, bundle):
+        """Show every stage straight from the artifact bundle, running no analysis
+
+        Workers read and unpickle the artifacts, so the first paint never
+        waits on them.
+        """
+        import tasks
+        from live import LiveAnalysis
+        self.analysis = LiveAnalysis(DATASET_PATH, STORE_PATH, sync=False)
+        for stage in tasks.STAGES:
+            self.submit_job(STAGE_NAMES[stage], tasks.load_stage, stage, bundle.path,
+                            on_done=lambda result, stage=stage: self.on_stage_done(stage, result))
+        # The query index is saved too, keyed on the stages above; only rebuild it if stale
+        if bundle.current("index", DATASET_PATH):
+            self.index_loading = True
+            self.scheduler.submit("Community index", tasks.load_index, bundle.path,
+                                  on_done=self.on_index_loaded,
+                                  on_error=lambda e: self.on_index_loaded(None))
+            self.schedule_poll()
+
+    def on_dataset_ready(self, store_path):
+        import tasks
+        from artifacts import BUNDLE_PATH
+        from live import LiveAnalysis
+        self.analysis = LiveAnalysis(DATASET_PATH, store_path, sync=False)
+        for stage in tasks.STAGES:
+            self.submit_job(STAGE_NAMES[stage], tasks.run_stage, stage, store_path,
+                            self.analysis.seed, BUNDLE_PATH,
+                            on_done=lambda result, stage=stage: self.on_stage_done(stage, result))
+
+    def on_stage_done(self, stage, result):
+        """Show a finished stage's summaries, graph and figure"""
+        self.analysis.set_stage(stage, result)
+        self.notify_pages()
+        if "graph" in result:
+            view = self.graphs[stage] = result["graph"]
+            for frame in self.frames.values():
+                if hasattr(frame, "show_graph"):
+                    frame.show_graph(stage, view)
+        if "figure" in result:
+            self.on_figure_done(stage, result["figure"])
+        if stage in KINDS:
+            if not result.get("cached"):
+                self.saved_index = None
+            if self.index_building:
+                # The running build covers the old results; drop it when it lands
+                self.index_generation += 1
+        self.update_index()
+
+    def update_index(self):
+        """Show the saved index once its stages are in, else build one if none is on the way"""
+        if self.analysis.index is not None or self.index_loading or self.index_building:
+            return
+        if self.saved_index is not None:
+            if all(getattr(self.analysis, kind) is not None for kind in KINDS):
+                self.analysis.index, self.saved_index = self.saved_index, None
+            return
+        self.schedule_index()
+
+    def schedule_index(self):
+        """Rebuild the community query index once every stage covers the same rows"""
+        inputs = self.analysis.index_inputs()
+        if inputs is None:
+            return
+        import tasks
+        from artifacts import BUNDLE_PATH
+        self.index_generation += 1
+        generation = self.index_generation
+        self.index_building = True
+        self.scheduler.submit("Community index", tasks.index_stage, self.analysis.store.path,
+                              *inputs, BUNDLE_PATH,
+                              on_done=lambda index: self.on_index_done(generation, index),
+                              on_error=self.on_index_failed)
+        self.schedule_poll()
+
+    def on_index_done(self, generation, index):
+        self.index_building = False
+        if generation == self.index_generation:
+            self.analysis.index = index
+        else:
+            self.update_index()
+
+    def on_index_failed(self, error):
+        self.index_building = False
+        self.on_job_error("Community index", error)
+
+    def on_index_loaded(self, index):
+        """Hold the saved index for update_index; None means build it after all"""
+        self.index_loading = False
+        self.saved_index = index
+        self.update_index()
+
+    def on_figure_done(self, stage, buffer):
+        image = self.figures[stage] = from_buffer(buffer)
+        for frame in self.frames.values():
+            if hasattr(frame, "show_figure"):
+                frame.show_figure(stage, image)
+
+    def notify_pages(self):
+        for frame in self.frames.values():
+            if hasattr(frame, "refresh_analysis"):
+                frame.refresh_analysis(self.analysis)
+
+    def refresh_data(self, event=None):
+        """Update the communities with new dataset rows and redraw their summaries"""
+        if self.analysis is None or self.scheduler.active:
+            return "break"
+        import tasks
+        self.submit_job("Dataset", tasks.sync_dataset, DATASET_PATH, self.analysis.store.path,
+                        on_done=self.on_dataset_synced)
+        return "break"
+
+    def on_dataset_synced(self, result):
+        """Fold the newly synced rows into each stage in the worker pool"""
+        import tasks
+        from artifacts import BUNDLE_PATH
+        from dataset import ColumnStore
+        start, added = result
+        if not added:
+            return
+        store_path = self.analysis.store.path
+        self.analysis.store = ColumnStore(store_path)
+        compare = bool(os.environ.get("SNA_TIMING"))
+        seed = self.analysis.seed
+        for stage in tasks.UPDATE_COLUMNS:
+            state = getattr(self.analysis, stage)
+            if state is not None:
+                self.submit_job(STAGE_NAMES[stage], tasks.update_stage, stage, state, store_path,
+                                start, compare, seed, BUNDLE_PATH,
+                                on_done=lambda result, stage=stage: self.on_update_done(stage, result))
+        # Prompt communities are rebuilt; the embedding store keeps that cheap
+        self.submit_job(STAGE_NAMES["prompts"], tasks.run_stage, "prompts", store_path, seed,
+                        BUNDLE_PATH, on_done=lambda result: self.on_stage_done("prompts", result))
+        self.submit_job(STAGE_NAMES["evolution"], tasks.run_stage, "evolution", store_path, seed,
+                        BUNDLE_PATH, on_done=lambda result: self.on_stage_done("evolution", result))
+
+    def on_update_done(self, stage, result):
+        from live import format_report
+        print("Incremental update:")
+        print(format_report({stage: result["report"]}))
+        self.on_stage_done(stage, result)
+
+    def poll_dataset(self):
+        """Periodically pick up rows appended to the dataset"""
+        if self.analysis is not None and self.analysis.has_new_rows():
+            self.refresh_data()
+        self.after(DATA_POLL_MS, self.poll_dataset)
+
+    def on_close(self):
+        """Stop the worker processes before closing the window"""
+        self.scheduler.shutdown()
+        if TRACE_PATH:
+            tracer.export(TRACE_PATH)
+        tracer.disable()
+        self.destroy()
+
+    def toggle_instrumentation(self, event=None):
+        """Show or hide the instrumentation overlay, tracing only while it is up"""
+        if self.overlay is None:
+            self.overlay = StatsOverlay(self, tracer)
+        if self.overlay.visible:
+            self.overlay.hide()
+            if not TRACE_PATH:
+                tracer.disable()
+        else:
+            tracer.enable(self)
+            self.overlay.show()
+        return "break"
+
+    def export_trace(self, event=None):
+        """Write what the tracer collected as Chrome trace JSON"""
+        path = TRACE_PATH or os.path.abspath(time.strftime("sna-trace-%Y%m%d-%H%M%S.json"))
+        tracer.export(path)
+        print(f"Trace written to {path}")
+        return "break"
+
     def toggle_fullscreen(self, event=None):
         """Toggle between fullscreen and windowed mode"""
         self.fullscreen = not self.fullscreen
@@ -107,6 +456,24 @@ class App(tk.Tk):
         self.attributes("-fullscreen", False)
         return "break"
 
+class StatusBar(ttk.Frame):
+    """Progress of background analysis jobs, with a button to cancel them"""
+    def __init__(self, parent, on_cancel):
+        super().__init__(parent)
+        self.label = ttk.Label(self, text="", font=("Helvetica", 10, "italic"))
+        self.label.pack(side="left", padx=10, pady=2)
+        self.cancel_button = ttk.Button(self, text="Cancel", command=on_cancel)
+        
+    def show_jobs(self, jobs):
+        """List running jobs with their progress, or clear the bar when idle"""
+        if jobs:
+            self.label.configure(text="   ".join(
+                f"{job.name}: {job.message or 'waiting'} ({job.progress:.0%})" for job in jobs))
+            self.cancel_button.pack(side="right", padx=10, pady=2)
+        else:
+            self.label.configure(text="")
+            self.cancel_button.pack_forget()
+
 class ScrollableFrame(ttk.Frame):
     """A scrollable frame for content that might exceed the window size"""
     def __init__(self, container, *args, **kwargs):
@@ -131,9 +498,10 @@ class ScrollableFrame(ttk.Frame):
         self.canvas_frame = self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
         
         # Configure scrollable area to expand with frame
+        self.region_job = None
         self.scrollable_frame.bind(
             "<Configure>",
-            lambda e: self.configure_scroll_region()
+            lambda e: self.schedule_scroll_region()
         )
         
         # Configure canvas to expand with window
@@ -142,14 +510,30 @@ class ScrollableFrame(ttk.Frame):
         # Bind mousewheel to scroll
         self.bind_mousewheel()
     
+    def schedule_scroll_region(self):
+        """Coalesce bursts of <Configure> events into one update per idle cycle"""
+        if self.region_job is None:
+            self.region_job = self.after_idle(self.configure_scroll_region)
+
     def configure_scroll_region(self):
         """Update scroll region to include all content"""
+        self.region_job = None
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
         
     def on_canvas_configure(self, event):
         """Resize the inner frame to match the canvas width"""
         width = event.width
         self.canvas.itemconfig(self.canvas_frame, width=width)
+
+    def follow_height(self, widget, fraction):
+        """Keep widget's height a fraction of the visible area as the window resizes
+
+        Meant for a frame with pack_propagate(False), so whatever canvas
+        fills it follows too.
+        """
+        self.canvas.bind("<Configure>",
+                         lambda e: widget.configure(height=max(1, int(e.height * fraction))),
+                         add="+")
         
     def bind_mousewheel(self):
         """Bind mousewheel to scrolling"""
@@ -214,10 +598,6 @@ class StartPage(ttk.Frame):
                                font=("Helvetica", 10, "italic"))
         instructions.pack(pady=30)
 
-import tkinter as tk
-from tkinter import ttk
-from PIL import Image, ImageTk, ImageSequence
-
 class SecondPage(ttk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent)
@@ -265,6 +645,11 @@ class SecondPage(ttk.Frame):
                           command=lambda: controller.show_frame(ImagePage3))
         btn3.grid(row=0, column=2, padx=20, pady=10, sticky="nsew")
         
+        btn4 = ttk.Button(button_frame, 
+                          text="Communities Through Time\n(Sliding Windows)", 
+                          command=lambda: controller.show_frame(TimelinePage))
+        btn4.grid(row=1, column=1, padx=20, pady=10, sticky="nsew")
+        
         # Add visual separator
         separator = ttk.Separator(content_frame, orient="horizontal")
         separator.pack(fill="x", padx=100, pady=30)
@@ -280,28 +665,70 @@ class SecondPage(ttk.Frame):
         self.gif_label = tk.Label(content_frame)
         self.gif_label.pack(pady=20)
 
-        self.frames = []  # to store all frames of the gif
-        gif_path = "bunny.gif"  # <<< put your gif path here
+        gif_path = resolve_image("bunny.gif")
 
-        gif = Image.open(gif_path)
-        for frame in ImageSequence.Iterator(gif):
-            frame = frame.resize((800, 400))  # Resize if you want
-            frame_image = ImageTk.PhotoImage(frame)
-            self.frames.append(frame_image)
+        # Frames are decoded on demand; playback only runs while the page is raised
+        self.animator = GifAnimator(self.gif_label, gif_path, size=(800, 400))
 
-        self.frame_index = 0
+    def on_show(self):
         self.animate_gif()
 
+    def on_hide(self):
+        self.animator.stop()
+
     def animate_gif(self):
-        frame = self.frames[self.frame_index]
-        self.gif_label.configure(image=frame)
-        self.frame_index = (self.frame_index + 1) % len(self.frames)
-        self.after(100, self.animate_gif)  # Adjust speed (milliseconds)
+        """Start playing the GIF at its own per-frame durations"""
+        self.animator.start()
+
+def graph_canvas(canvas, view, on_select=None):
+    """Show a graph view in place of canvas; returns the canvas now on screen"""
+    if isinstance(canvas, GraphCanvas):
+        canvas.set_view(view)
+        return canvas
+    graph = GraphCanvas(canvas.master, view, on_select=on_select, width=canvas.cget("width"),
+                        height=canvas.cget("height"),
+                        highlightbackground=canvas.cget("highlightbackground"),
+                        highlightthickness=canvas.cget("highlightthickness"),
+                        bg=canvas.cget("bg"))
+    canvas.destroy()
+    graph.pack(fill="both", expand=True)
+    return graph
+
+def member_list(parent, title, on_select=None):
+    """A titled VirtualList for the members of every community"""
+    frame = ttk.Frame(parent)
+    frame.pack(padx=50, pady=10, fill="x")
+    ttk.Label(frame, text=title, font=("Georgia", 12, "bold")).pack(anchor="w")
+    members = VirtualList(frame, height=300, font=("Georgia", 11), on_select=on_select)
+    members.pack(fill="x")
+    return members
+
+def community_details(parent):
+    """Label that shows the profile of the community last clicked"""
+    label = ttk.Label(parent, text="Click a community in the graph or the list below for details.",
+                      justify="left", font=("Georgia", 11), wraplength=900)
+    label.pack(padx=50, pady=10, anchor="w")
+    return label
+
+def describe_community(controller, label, kind, community):
+    analysis = controller.analysis
+    text = analysis.community_text(kind, community) if analysis else None
+    label.configure(text=text or "Community details are still being indexed.")
 
 class ImagePageTemplate(ttk.Frame):
-    def __init__(self, parent, controller, image_path, description_text, bg_color="light_cream"):
+    # Analysis stage whose rendered figure replaces the static image, if any
+    figure_stage = None
+    # Analysis stage whose community graph replaces the static image, if any
+    graph_stage = None
+    # Community type profiled when a community is clicked, if any
+    community_kind = None
+
+    def __init__(self, parent, controller, image_path, description_text, bg_color="light_cream",
+                 members=None):
         super().__init__(parent)
         self.controller = controller
+        # analysis -> rows for the community member list, if the page has one
+        self.describe_members = members
         
         # Create a scrollable frame for content with themed background
         scroll_frame = ScrollableFrame(self, background=controller.ghibli_colors[bg_color])
@@ -313,26 +740,21 @@ class ImagePageTemplate(ttk.Frame):
         label = ttk.Label(content_frame, text="Community Visualization", style="Title.TLabel")
         label.pack(pady=20)
         
-        # Image frame with border
-        img_frame = ttk.Frame(content_frame, style="TFrame")
-        img_frame.pack(pady=20)
+        # Image frame as wide as the page and 60% of its visible height
+        img_frame = ttk.Frame(content_frame, style="TFrame",
+                              height=int(controller.winfo_screenheight() * 0.6))
+        img_frame.pack_propagate(False)
+        img_frame.pack(padx=50, pady=20, fill="x")
+        scroll_frame.follow_height(img_frame, 0.6)
         
         # Load and display image
         try:
-            # Create directory for images if it doesn't exist
-            if not os.path.exists(image_path) and not os.path.exists("images"):
-                os.makedirs("images")
-                
-            img = Image.open(image_path)
-            img = img.resize((700, 500))  # Larger size for fullscreen
-            self.photo = ImageTk.PhotoImage(img)
-            
-            # Canvas for image with border
-            img_canvas = tk.Canvas(img_frame, width=710, height=510, 
-                                 highlightbackground="#3e3e3e", highlightthickness=2,
-                                 bg="white")
-            img_canvas.pack()
-            img_canvas.create_image(355, 255, image=self.photo)
+            # Zoomable canvas filling the frame, with border; it loads
+            # only the pyramid levels it draws, through the image cache
+            self.img_canvas = ZoomCanvas(img_frame, image_path, width=1, height=1,
+                                         highlightbackground="#3e3e3e", highlightthickness=2,
+                                         bg="white")
+            self.img_canvas.pack(fill="both", expand=True)
             
         except Exception as e:
             error_label = ttk.Label(img_frame, text=f"Error loading image: {e}")
@@ -349,8 +771,15 @@ class ImagePageTemplate(ttk.Frame):
                                                bg="#ffffff",
                                                fg="#3e3e3e")
         scrolled_txt.pack(fill="both", expand=True)
-        scrolled_txt.insert(tk.END, description_text)
-        scrolled_txt.configure(state='disabled')
+        self.description = scrolled_txt
+        self.set_description(description_text)
+
+        if self.community_kind is not None:
+            self.details = community_details(content_frame)
+        if members is not None:
+            self.member_rows = None
+            self.members = member_list(content_frame, "Community members", self.on_member_click)
+            self.show_members(controller.analysis)
         
         # Navigation buttons in a row
         button_frame = ttk.Frame(content_frame)
@@ -365,10 +794,45 @@ class ImagePageTemplate(ttk.Frame):
                                style="Home.TButton",
                                command=lambda: controller.show_frame(StartPage))
         home_button.pack(side="left", padx=10)
+        
+        if self.figure_stage in controller.figures:
+            self.show_figure(self.figure_stage, controller.figures[self.figure_stage])
+        if self.graph_stage in controller.graphs:
+            self.show_graph(self.graph_stage, controller.graphs[self.graph_stage])
 
-class ImagePage1(ImagePageTemplate):
-    def __init__(self, parent, controller):
-        super().__init__(parent, controller, "ubc.png", """User Community Detection and Characterization
+    def show_figure(self, stage, image):
+        """Swap the static image for the figure rendered from the dataset"""
+        if stage == self.figure_stage and hasattr(self, "img_canvas"):
+            self.img_canvas.set_image(image)
+
+    def show_graph(self, stage, view):
+        """Swap the static image for the interactive community graph"""
+        if stage == self.graph_stage and hasattr(self, "img_canvas"):
+            self.img_canvas = graph_canvas(self.img_canvas, view, self.show_community)
+
+    def show_members(self, analysis):
+        rows = self.describe_members(analysis) if analysis else None
+        if rows is not None:
+            self.member_rows = rows
+            self.members.set_rows(rows)
+
+    def on_member_click(self, index):
+        if self.member_rows is not None:
+            self.show_community(self.member_rows.community(index))
+
+    def show_community(self, community):
+        if self.community_kind is not None:
+            describe_community(self.controller, self.details, self.community_kind, community)
+
+    def set_description(self, text):
+        """Replace the text shown under the visualization"""
+        self.description.configure(state='normal')
+        self.description.delete("1.0", tk.END)
+        self.description.insert(tk.END, text)
+        self.description.configure(state='disabled')
+
+# Shown when the raw dataset is not available to cluster
+USER_COMMUNITY_TEXT = """User Community Detection and Characterization
 
 The user clustering process resulted in eight distinct communities based on platform usage patterns and average engagement metrics (likes, shares, and comments).
 
@@ -381,7 +845,32 @@ Cluster 5: 37 users, Reddit and Twitter, lowest likes but high shares.
 Cluster 6: 32 users, mainly Twitter and TikTok, highest likes (2862.2).
 Cluster 7: 30 users, mostly Reddit and Twitter, with strong share counts.
 
-Overall, the clustering reveals distinct behaviors and cross-platform dynamics across the AI-generated Ghibli content community.""", "nature_green")
+Overall, the clustering reveals distinct behaviors and cross-platform dynamics across the AI-generated Ghibli content community."""
+
+def analysis_text(controller, fallback, describe):
+    """Generated page text once the analysis has produced it, else the fallback"""
+    analysis = controller.analysis
+    text = describe(analysis) if analysis is not None else None
+    if text:
+        return text
+    if controller.analysis_error:
+        return f"{fallback}\n\n(Could not analyse the dataset: {controller.analysis_error})"
+    return fallback
+
+class ImagePage1(ImagePageTemplate):
+    graph_stage = "users"
+    community_kind = "users"
+
+    def __init__(self, parent, controller):
+        text = analysis_text(controller, USER_COMMUNITY_TEXT, lambda a: a.user_text())
+        super().__init__(parent, controller, "ubc.png", text, "nature_green",
+                         members=lambda a: a.user_members())
+
+    def refresh_analysis(self, analysis):
+        text = analysis.user_text() if analysis else None
+        if text:
+            self.set_description(text)
+        self.show_members(analysis)
 
 class ImagePage2(ttk.Frame):
     def __init__(self, parent, controller):
@@ -400,34 +889,33 @@ class ImagePage2(ttk.Frame):
         
         # Main content container
         main_frame = ttk.Frame(content_frame)
-        main_frame.pack(padx=40, pady=20)
+        main_frame.pack(padx=40, pady=20, fill="both", expand=True)
+        main_frame.columnconfigure((0, 1), weight=1, uniform="column")
         
         # Left column - first visualization
         left_frame = ttk.Frame(main_frame)
-        left_frame.grid(row=0, column=0, padx=20)
+        left_frame.grid(row=0, column=0, padx=20, sticky="nsew")
         
-        # Image frame with border
-        left_img_frame = ttk.Frame(left_frame)
-        left_img_frame.pack(pady=10)
+        # Image frame as wide as its column and 45% of the visible height
+        left_img_frame = ttk.Frame(left_frame,
+                                    height=int(controller.winfo_screenheight() * 0.45))
+        left_img_frame.pack_propagate(False)
+        left_img_frame.pack(pady=10, fill="x")
+        scroll_frame.follow_height(left_img_frame, 0.45)
         
         try:
-            img1 = Image.open("pbs2.png")
-            img1 = img1.resize((500, 350))
-            self.photo1 = ImageTk.PhotoImage(img1)
-            
-            # Canvas for image with border
-            img_canvas1 = tk.Canvas(left_img_frame, width=510, height=360, 
-                                  highlightbackground="#3e3e3e", highlightthickness=2,
-                                  bg="white")
-            img_canvas1.pack()
-            img_canvas1.create_image(255, 180, image=self.photo1)
+            # Zoomable canvas filling the frame, with border
+            self.img_canvas1 = ZoomCanvas(left_img_frame, "pbs2.png", width=1, height=1,
+                                          highlightbackground="#3e3e3e", highlightthickness=2,
+                                          bg="white")
+            self.img_canvas1.pack(fill="both", expand=True)
             
         except Exception as e:
             error_label = ttk.Label(left_img_frame, text=f"Error loading image: {e}")
             error_label.pack()
         
         # Description text
-        desc1 = ttk.Label(left_frame, text="""Prompt Similarity Graph:
+        self.desc1 = ttk.Label(left_frame, text="""Prompt Similarity Graph:
         
 We observe distinct cluster-wise themes emerging within the prompt-based communities. 
 
@@ -437,34 +925,32 @@ Cluster C1 (Orange) is characterized by terms like Floating, Ghibli, Iceland, Mo
 
 Meanwhile, Cluster C6 (Red) emphasizes words such as Enchanted, Exploring, tipper, ruin, and Traveler, reflecting a strong interest in fantasy exploration and narrative-rich world-building.""",
                           wraplength=500, justify="center", font=("Georgia", 11))
-        desc1.pack(pady=10)
+        self.desc1.pack(pady=10)
         
         # Right column - second visualization  
         right_frame = ttk.Frame(main_frame)
-        right_frame.grid(row=0, column=1, padx=20)
+        right_frame.grid(row=0, column=1, padx=20, sticky="nsew")
         
-        # Image frame with border
-        right_img_frame = ttk.Frame(right_frame)
-        right_img_frame.pack(pady=10)
+        # Image frame as wide as its column and 45% of the visible height
+        right_img_frame = ttk.Frame(right_frame,
+                                    height=int(controller.winfo_screenheight() * 0.45))
+        right_img_frame.pack_propagate(False)
+        right_img_frame.pack(pady=10, fill="x")
+        scroll_frame.follow_height(right_img_frame, 0.45)
         
         try:
-            img2 = Image.open("kmeans1.png") 
-            img2 = img2.resize((500, 350))
-            self.photo2 = ImageTk.PhotoImage(img2)
-            
-            # Canvas for image with border
-            img_canvas2 = tk.Canvas(right_img_frame, width=510, height=360, 
-                                  highlightbackground="#3e3e3e", highlightthickness=2,
-                                  bg="white")
-            img_canvas2.pack()
-            img_canvas2.create_image(255, 180, image=self.photo2)
+            # Zoomable canvas filling the frame, with border
+            self.img_canvas2 = ZoomCanvas(right_img_frame, "kmeans1.png", width=1, height=1,
+                                          highlightbackground="#3e3e3e", highlightthickness=2,
+                                          bg="white")
+            self.img_canvas2.pack(fill="both", expand=True)
             
         except Exception as e:
             error_label = ttk.Label(right_img_frame, text=f"Error loading image: {e}")
             error_label.pack()
             
         # Description text
-        desc2 = ttk.Label(right_frame, text="""K-Means Clustering:
+        self.desc2 = ttk.Label(right_frame, text="""K-Means Clustering:
         
 The K-Means clustering analysis of Studio Ghibli-inspired prompts revealed distinct thematic groupings, as illustrated. 
 
@@ -474,7 +960,19 @@ Cluster 1 (orange) captures cozy and mystical settings, while Cluster 3 (purple)
 
 Additionally, the "Anime-style train" prompt (dark blue) appears distanced from core Ghibli elements, demonstrating a clear semantic separation. These clustering results underscore the nuanced variations within Ghibli-inspired generative art prompts, revealing how different stylistic and thematic elements naturally organize within semantic space.""",
                           wraplength=500, justify="center", font=("Georgia", 11))
-        desc2.pack(pady=10)
+        self.desc2.pack(pady=10)
+
+        self.details = community_details(content_frame)
+        self.member_rows = None
+        self.members = member_list(content_frame, "Prompts by Leiden community",
+                                   self.on_member_click)
+        
+        # Replace the written descriptions and figure with ones computed from the dataset
+        self.refresh_analysis(controller.analysis)
+        if "prompts" in controller.figures:
+            self.show_figure("prompts", controller.figures["prompts"])
+        if "prompts" in controller.graphs:
+            self.show_graph("prompts", controller.graphs["prompts"])
         
         # Navigation buttons
         button_frame = ttk.Frame(content_frame)
@@ -490,9 +988,35 @@ Additionally, the "Anime-style train" prompt (dark blue) appears distanced from
                                command=lambda: controller.show_frame(StartPage))
         home_button.pack(side="left", padx=10)
 
-class ImagePage3(ImagePageTemplate):
-    def __init__(self, parent, controller):
-        super().__init__(parent, controller, "kmeans2.png", """The application of K-Means clustering to image and engagement features revealed distinct community groupings, as visualized. Using Principal Component Analysis (PCA) for dimensionality reduction, we identified five primary clusters with varying engagement and style accuracy characteristics. 
+    def refresh_analysis(self, analysis):
+        texts = analysis.prompt_texts() if analysis else None
+        if texts:
+            self.desc1.configure(text=texts[0])
+            self.desc2.configure(text=texts[1])
+        rows = analysis.prompt_members() if analysis else None
+        if rows is not None:
+            self.member_rows = rows
+            self.members.set_rows(rows)
+
+    def on_member_click(self, index):
+        if self.member_rows is not None:
+            self.show_community(self.member_rows.community(index))
+
+    def show_community(self, community):
+        describe_community(self.controller, self.details, "prompts", community)
+
+    def show_figure(self, stage, image):
+        """Swap the K-Means panel for the figure rendered from the dataset"""
+        if stage == "prompts" and hasattr(self, "img_canvas2"):
+            self.img_canvas2.set_image(image)
+
+    def show_graph(self, stage, view):
+        """Swap the similarity graph image for the interactive prompt graph"""
+        if stage == "prompts" and hasattr(self, "img_canvas1"):
+            self.img_canvas1 = graph_canvas(self.img_canvas1, view, self.show_community)
+
+# Shown when the raw dataset is not available to cluster
+IMAGE_CLUSTER_TEXT = """The application of K-Means clustering to image and engagement features revealed distinct community groupings, as visualized. Using Principal Component Analysis (PCA) for dimensionality reduction, we identified five primary clusters with varying engagement and style accuracy characteristics. 
 
 The analysis demonstrates notable differentiation across the embedding space, with several key regions highlighted in the visualization. The upper-center region contains prompts with "High Engagement, High Style Accuracy," indicating optimal combinations of artistic style adherence and audience response. 
 
@@ -500,7 +1024,147 @@ Multiple regions of "Moderate Engagement and Accuracy" appear throughout the fea
 
 Cluster 0 (blue) points are concentrated in the lower left quadrant, showing a consistent pattern of moderate to lower engagement metrics. Cluster 2 (green) points exhibit the highest vertical distribution, suggesting greater variance in the second principal component. 
 
-These clustering results emphasize the complex relationship between style accuracy and audience engagement metrics in Ghibli-inspired generative art. The multidimensional nature of the data reveals that while certain prompt characteristics consistently drive higher engagement, there is significant variance in community response patterns across the feature space.""", "dusty_lavender")
+These clustering results emphasize the complex relationship between style accuracy and audience engagement metrics in Ghibli-inspired generative art. The multidimensional nature of the data reveals that while certain prompt characteristics consistently drive higher engagement, there is significant variance in community response patterns across the feature space."""
+
+class ImagePage3(ImagePageTemplate):
+    figure_stage = "images"
+
+    def __init__(self, parent, controller):
+        text = analysis_text(controller, IMAGE_CLUSTER_TEXT, lambda a: a.image_text())
+        super().__init__(parent, controller, "kmeans2.png", text, "dusty_lavender")
+
+    def refresh_analysis(self, analysis):
+        text = analysis.image_text() if analysis else None
+        if text:
+            self.set_description(text)
+
+# Shown until the evolution timeline has been computed
+EVOLUTION_TEXT = """This page follows the user and content communities through time. Posts are replayed in order of their creation date through a sliding window, and the communities are updated as posts enter and leave it, showing when communities are born, merge, split and fade away.
+
+The timeline appears here once the dataset has been analysed."""
+
+class TimelinePage(ttk.Frame):
+    """Animated evolution of the engagement communities through sliding time windows"""
+    def __init__(self, parent, controller):
+        super().__init__(parent)
+        self.controller = controller
+        self.evolution = None
+        self.play_job = None
+        self.visible = False
+        
+        scroll_frame = ScrollableFrame(self, background=controller.ghibli_colors["sky_blue"])
+        scroll_frame.pack(fill="both", expand=True)
+        
+        content_frame = scroll_frame.scrollable_frame
+        
+        # Page title
+        label = ttk.Label(content_frame, text="Communities Through Time", style="Title.TLabel")
+        label.pack(pady=20)
+        
+        # Animated view of one window at a time, with the whole timeline along the bottom
+        canvas_frame = ttk.Frame(content_frame)
+        canvas_frame.pack(pady=10)
+        self.canvas = EvolutionCanvas(canvas_frame, on_seek=self.seek,
+                                      width=int(controller.winfo_screenwidth() * 0.75),
+                                      height=int(controller.winfo_screenheight() * 0.6),
+                                      highlightbackground="#3e3e3e", highlightthickness=2,
+                                      bg="white")
+        self.canvas.pack()
+        
+        # Playback controls
+        controls = ttk.Frame(content_frame)
+        controls.pack(pady=10, fill="x", padx=50)
+        self.play_button = ttk.Button(controls, text="Play", command=self.toggle_play)
+        self.play_button.pack(side="left", padx=10)
+        self.slider = ttk.Scale(controls, from_=0, to=0, orient="horizontal",
+                                command=lambda value: self.seek(int(float(value))))
+        self.slider.pack(side="left", fill="x", expand=True, padx=10)
+        
+        # Text description in scrolled text widget
+        text_frame = ttk.Frame(content_frame)
+        text_frame.pack(padx=50, pady=20, fill="both")
+        self.description = scrolledtext.ScrolledText(text_frame, wrap=tk.WORD, 
+                                                     width=100, height=10, 
+                                                     font=("Georgia", 12),
+                                                     bg="#ffffff",
+                                                     fg="#3e3e3e")
+        self.description.pack(fill="both", expand=True)
+        self.set_description(analysis_text(controller, EVOLUTION_TEXT, lambda a: a.evolution_text()))
+        
+        # Navigation buttons in a row
+        button_frame = ttk.Frame(content_frame)
+        button_frame.pack(pady=20)
+        
+        back_button = ttk.Button(button_frame, text="Back to Selection", 
+                               style="Home.TButton",
+                               command=lambda: controller.show_frame(SecondPage))
+        back_button.pack(side="left", padx=10)
+        
+        home_button = ttk.Button(button_frame, text="Return Home", 
+                               style="Home.TButton",
+                               command=lambda: controller.show_frame(StartPage))
+        home_button.pack(side="left", padx=10)
+        
+        self.refresh_analysis(controller.analysis)
+
+    def set_description(self, text):
+        self.description.configure(state="normal")
+        self.description.delete("1.0", tk.END)
+        self.description.insert(tk.END, text)
+        self.description.configure(state="disabled")
+
+    def refresh_analysis(self, analysis):
+        evolution = analysis.evolution if analysis else None
+        if evolution is None or evolution is self.evolution:
+            return
+        self.evolution = evolution
+        self.set_description(analysis.evolution_text())
+        self.canvas.set_windows(evolution.windows)
+        self.slider.configure(to=max(len(evolution.windows) - 1, 0))
+        self.seek(0)
+
+    def seek(self, index):
+        """Show one window and move the slider to it"""
+        if self.evolution is None or not self.evolution.windows:
+            return
+        index = min(max(index, 0), len(self.evolution.windows) - 1)
+        if index != self.canvas.index or not self.canvas.find_withtag("window"):
+            self.canvas.show(index)
+        if int(float(self.slider.get())) != index:
+            self.slider.set(index)
+
+    def toggle_play(self):
+        if self.play_job is None:
+            if self.evolution is not None and self.canvas.index >= len(self.evolution.windows) - 1:
+                self.seek(0)
+            self.play_button.configure(text="Pause")
+            self.play_job = self.after(TIMELINE_FRAME_MS, self.next_frame)
+        else:
+            self.stop()
+
+    def stop(self):
+        if self.play_job is not None:
+            self.after_cancel(self.play_job)
+            self.play_job = None
+        self.play_button.configure(text="Play")
+
+    def next_frame(self):
+        """Advance one window, stopping at the end of the timeline"""
+        self.play_job = None
+        if self.evolution is None or self.canvas.index >= len(self.evolution.windows) - 1:
+            self.stop()
+            return
+        self.seek(self.canvas.index + 1)
+        if self.visible:
+            self.play_job = self.after(TIMELINE_FRAME_MS, self.next_frame)
+
+    def on_show(self):
+        self.visible = True
+
+    def on_hide(self):
+        # Playback only runs while the page is raised
+        self.visible = False
+        self.stop()
 
 if __name__ == "__main__":
     app = App()
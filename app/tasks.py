@@ -0,0 +1,202 @@
+"""Job functions for the analysis stages
+
+Each takes a JobContext first, so the same function runs in the worker
+pool (with progress and cancellation) or inline with jobs.INLINE. Stages
+open the column store themselves, so only paths cross the process
+boundary on the way in.
+"""
+from artifacts import Bundle
+from clusterindex import ClusterIndex
+from dataset import ColumnStore, ENGAGEMENT_COLUMNS, open_dataset
+import engagement
+import kmeans
+import layout
+import plots
+import prompts
+import temporal
+
+def prepare_dataset(ctx, csv_path, store_path):
+    """Convert the CSV into the column store if needed; returns the store path"""
+    ctx.progress(0.0, "Preparing dataset")
+    return open_dataset(csv_path, store_path).path
+
+def sync_dataset(ctx, csv_path, store_path):
+    """Append new CSV rows to the store; returns (first new row, rows added)"""
+    ctx.progress(0.0, "Reading new rows")
+    store = ColumnStore(store_path)
+    start = store.rows
+    return start, store.sync(csv_path)
+
+def user_stage(ctx, store_path, seed=0):
+    """Louvain user communities on the engagement graph"""
+    ctx.progress(0.1, "Building engagement graph")
+    table = ColumnStore(store_path).read(ENGAGEMENT_COLUMNS)
+    ctx.progress(0.3, "Running Louvain")
+    state = engagement.IncrementalUserCommunities(table, seed=seed, callback=ctx.check)
+    ctx.progress(0.8, "Laying out user graph")
+    return {"state": state, "graph": layout.graph_view(*state.network(), seed=seed)}
+
+def image_stage(ctx, store_path, seed=0):
+    """K-Means over style accuracy and engagement, with a 2-D projection to plot"""
+    ctx.progress(0.1, "Clustering images")
+    table = ColumnStore(store_path).read(kmeans.IMAGE_FEATURE_COLUMNS)
+    state = kmeans.ImageClusters(table, seed=seed, callback=ctx.check)
+    ctx.progress(0.8, "Projecting image features")
+    points, labels = state.projection()
+    return {"state": state, "points": points, "labels": labels}
+
+def prompt_stage(ctx, store_path, seed=0):
+    """Leiden prompt communities and prompt K-Means, with a 2-D projection to plot"""
+    from embeddings import EmbeddingStore, default_encoder
+    ctx.progress(0.05, "Embedding prompts")
+    texts = ColumnStore(store_path).read(("prompt",)).values("prompt")
+    state = prompts.PromptCommunities(texts, EmbeddingStore(default_encoder()), seed=seed,
+                                      callback=ctx.check)
+    ctx.progress(0.85, "Projecting prompt embeddings")
+    points, labels = state.projection()
+    ctx.progress(0.9, "Laying out prompt graph")
+    return {"state": state, "points": points, "labels": labels,
+            "graph": layout.graph_view(*state.network(), seed=seed)}
+
+def evolution_stage(ctx, store_path, seed=0):
+    """Community births, merges and splits through sliding time windows"""
+    ctx.progress(0.1, "Replaying posts through time windows")
+    table = ColumnStore(store_path).read(temporal.EVOLUTION_COLUMNS)
+    state = temporal.CommunityEvolution(table, callback=ctx.check)
+    return {"state": state, "timeline": state.series()}
+
+def update_stage(ctx, stage, state, store_path, start, compare=False, seed=0, bundle_path=None):
+    """Fold rows [start:] of the store into an incremental stage
+
+    With bundle_path, the updated artifacts replace the stage's old ones.
+    """
+    ctx.progress(0.1, "Updating with new rows")
+    store = ColumnStore(store_path)
+    rows = store.read(UPDATE_COLUMNS[stage], start)
+    if compare and stage == "images":
+        # Image clusters keep no table, so the full rerun they compare against reads the store
+        report = state.update(rows, compare, store.read(UPDATE_COLUMNS[stage]))
+    else:
+        report = state.update(rows, compare)
+    result = {"state": state, "report": report}
+    if hasattr(state, "projection"):
+        result["points"], result["labels"] = state.projection()
+    if hasattr(state, "network"):
+        ctx.progress(0.8, "Laying out graph")
+        result["graph"] = layout.graph_view(*state.network(), seed=seed)
+    return finish_stage(ctx, stage, result, store, seed, bundle_path)
+
+def index_stage(ctx, store_path, user_labels, image_labels, prompt_labels, bundle_path=None):
+    """Query index over the three community types
+
+    user_labels has a community per user code, the other two one per
+    post; posts beyond the shortest of them are left out. With
+    bundle_path, the index is saved as the bundle's "index" stage, keyed
+    on the three stages it was built from.
+    """
+    ctx.progress(0.1, "Indexing communities")
+    rows = min(len(image_labels), len(prompt_labels))
+    store = ColumnStore(store_path)
+    table = store.read(("user_id", "platform", "likes", "shares", "comments"), 0, rows)
+    users = table["user_id"]
+    index = ClusterIndex({"users": user_labels[users], "images": image_labels[:rows],
+                          "prompts": prompt_labels[:rows]},
+                         users, table["platform"], table, table.categories.get("user_id", ()),
+                         table.categories.get("platform", ()))
+    if bundle_path is not None:
+        ctx.progress(0.9, "Saving index")
+        bundle = Bundle(bundle_path)
+        bundle.write("index", bundle.stage_key("index", store), {"index.pkl": index}, store)
+    return index
+
+def load_index(ctx, bundle_path=None):
+    """The query index saved by index_stage"""
+    ctx.progress(0.5, "Loading saved index")
+    return Bundle(bundle_path).load("index", "index.pkl")
+
+def stage_artifacts(stage, state):
+    """Partition, centroids, per-cluster stats and page text of a stage's state"""
+    if stage == "users":
+        result = state.result
+        return {"partition.npy": result.labels, "stats.json": result.clusters,
+                "text.json": engagement.summary_text(result)}
+    if stage == "evolution":
+        return {"windows.json": state.windows, "stats.json": temporal.event_counts(state),
+                "text.json": temporal.summary_text(state)}
+    if stage == "images":
+        return {"partition.npy": state.labels, "centroids.npy": state.centroids,
+                "stats.json": state.summaries(), "text.json": kmeans.summary_text(state)}
+    return {"partition.npy": state.communities, "clusters.npy": state.clusters,
+            "stats.json": {"communities": state.describe(state.communities),
+                           "clusters": state.describe(state.clusters)},
+            "text.json": prompts.summary_text(state)}
+
+def finish_stage(ctx, stage, result, store, seed=0, bundle_path=None):
+    """Render the stage's figure and, with bundle_path, save all its artifacts
+
+    The figure goes back to the UI as a raw buffer in place of the points.
+    """
+    figure = None
+    if "points" in result:
+        ctx.progress(0.9, "Rendering figure")
+        figure = plots.scatter(result.pop("points"), result.pop("labels"),
+                               title=FIGURE_TITLES[stage])
+        result["figure"] = plots.to_buffer(figure)
+    elif "timeline" in result:
+        ctx.progress(0.9, "Rendering timeline")
+        figure = plots.timeline(result.pop("timeline"), title=FIGURE_TITLES[stage])
+        result["figure"] = plots.to_buffer(figure)
+    if bundle_path is not None:
+        ctx.progress(0.95, "Saving artifacts")
+        bundle = Bundle(bundle_path)
+        artifacts = stage_artifacts(stage, result["state"])
+        artifacts["state.pkl"] = result["state"]
+        if "graph" in result:
+            artifacts["graph.pkl"] = result["graph"]
+        if figure is not None:
+            artifacts["figure.png"] = figure
+        bundle.write(stage, bundle.stage_key(stage, store, seed), artifacts, store, seed)
+    return result
+
+def load_stage(ctx, stage, bundle_path=None):
+    """A stage's result rebuilt from its saved artifacts"""
+    ctx.progress(0.5, "Loading saved results")
+    bundle = Bundle(bundle_path)
+    files = bundle.files(stage)
+    result = {"state": bundle.load(stage, "state.pkl"), "cached": True}
+    if "graph.pkl" in files:
+        result["graph"] = bundle.load(stage, "graph.pkl")
+    if "figure.png" in files:
+        result["figure"] = plots.to_buffer(bundle.load(stage, "figure.png"))
+    return result
+
+def run_stage(ctx, stage, store_path, seed=0, bundle_path=None):
+    """Load a stage from the bundle if its inputs are unchanged, otherwise run it"""
+    store = ColumnStore(store_path)
+    bundle = Bundle(bundle_path)
+    ctx.progress(0.0, "Checking saved results")
+    if bundle.has(stage, bundle.stage_key(stage, store, seed)):
+        bundle.reuse(stage, store)
+        return load_stage(ctx, stage, bundle.path)
+    return finish_stage(ctx, stage, STAGES[stage](ctx, store_path, seed), store, seed,
+                        bundle.path)
+
+STAGES = {
+    "users": user_stage,
+    "images": image_stage,
+    "prompts": prompt_stage,
+    "evolution": evolution_stage,
+}
+
+# Columns each incremental stage reads when new rows arrive
+UPDATE_COLUMNS = {
+    "users": ENGAGEMENT_COLUMNS,
+    "images": kmeans.IMAGE_FEATURE_COLUMNS,
+}
+
+# Titles of the figures rendered for stages that produce points or a timeline
+FIGURE_TITLES = {
+    "images": "Style accuracy and engagement clusters (PCA projection)",
+    "prompts": "Prompt K-Means clusters (PCA projection)",
+    "evolution": "User-content communities through time",
+}
@@ -0,0 +1,456 @@
+"""Community evolution over sliding time windows
+
+Posts are replayed in creation-date order. Each step slides a window of
+window_days forward by step_days: posts leaving the window remove their
+engagement edges, posts entering add theirs, and only the nodes those
+edges touch are moved between communities (Louvain local moves, warm
+started from the previous window). Community ids persist from window to
+window, so births, deaths, merges and splits follow from where the
+moved members came from and went to. Degree and community-size
+histograms are kept up to date as nodes change, and a discrete power law
+is fitted to each of them per window.
+
+The graph and partition live in dicts keyed by node and community, so a
+step costs time in proportion to the posts entering and leaving the
+window rather than to the history behind it. The exceptions are bounded
+by the window, not the history: the connectivity check behind splits
+walks the communities that lost edges, and the snapshot lists the
+largest tracked communities.
+"""
+import heapq
+import time
+from collections import Counter, defaultdict, deque
+import numpy as np
+from dataset import MISSING_DATE
+from engagement import engagement_weights
+from plots import day
+
+DAY = 86_400
+WINDOW_DAYS = 30
+STEP_DAYS = 7
+# Smaller communities are left out of event tracking and community counts
+MIN_COMMUNITY = 3
+# Share of a community's members that must go to or come from another for a merge or split
+EVENT_SHARE = 0.3
+# Times a node may be moved per step, bounding cascades of local moves
+MAX_PASSES = 4
+# Largest communities recorded per window for drawing
+SNAPSHOT_COMMUNITIES = 200
+EVENT_TYPES = ("birth", "death", "merge", "split")
+# Columns the replay reads
+EVOLUTION_COLUMNS = ("creation_date", "user_id", "image_id", "likes", "shares", "comments")
+
+def fit_power_law(histogram, max_candidates=30, min_tail=10):
+    """Discrete power-law fit to a {value: count} histogram of positive ints
+
+    xmin is the candidate with the smallest Kolmogorov-Smirnov distance
+    and alpha its approximate discrete maximum-likelihood estimate
+    (Clauset, Shalizi and Newman 2009). Returns None with too little data.
+    """
+    values = np.array(sorted(v for v, c in histogram.items() if c > 0 and v > 0), dtype=np.float64)
+    if len(values) < 2:
+        return None
+    counts = np.array([histogram[int(v)] for v in values], dtype=np.float64)
+    best = None
+    for i, xmin in enumerate(values[:max_candidates]):
+        x, c = values[i:], counts[i:]
+        n = c.sum()
+        if n < min_tail or len(x) < 2:
+            break
+        alpha = 1 + n / (c * np.log(x / (xmin - 0.5))).sum()
+        empirical = np.cumsum(c) / n
+        model = 1 - ((x + 0.5) / (xmin - 0.5)) ** (1 - alpha)
+        ks = float(np.abs(empirical - model).max())
+        if best is None or ks < best["ks"]:
+            best = {"alpha": float(alpha), "xmin": int(xmin), "ks": ks, "n": int(n)}
+    return best
+
+class WindowGraph:
+    """Weighted user-content graph under edge insertions and deletions, with a partition
+
+    Users are nodes 0..n_users-1 and content follows them, as in
+    engagement.EngagementGraph. Everything is kept incrementally:
+    degrees, community degree sums and internal weights (so modularity
+    is O(1)), degree and size histograms, and for the current step the
+    community each changed node started in and each changed community's
+    starting size.
+    """
+    def __init__(self, resolution=1.0):
+        self.resolution = resolution
+        self.adjacency = {}  # node -> {neighbour: weight}
+        self.posts = {}  # (user, content) -> posts behind that edge
+        self.degree = {}  # node -> weighted degree
+        self.total = 0.0  # sum of weighted degrees, 2m
+        self.label = {}  # node -> community
+        self.members = {}  # community -> set of nodes
+        self.community_degree = {}  # community -> sum of member degrees
+        self.internal = {}  # community -> weight inside it, both directions
+        self.square_sum = 0.0  # sum of squared community degrees
+        self.next_id = 0
+        self.degree_hist = Counter()  # neighbours -> nodes
+        self.size_hist = Counter()  # community size -> communities
+        self.tracked = set()  # communities of at least MIN_COMMUNITY nodes
+        self.origin = {}  # node -> community at the start of the step, None if new
+        self.start_size = {}  # community -> size at the start of the step
+        self.lost_edges = set()  # communities that lost edges or members this step
+
+    def modularity(self):
+        if self.total <= 0:
+            return 0.0
+        return (sum(self.internal.values()) / self.total
+                - self.resolution * self.square_sum / self.total ** 2)
+
+    def add_degree(self, community, delta):
+        old = self.community_degree[community]
+        self.community_degree[community] = old + delta
+        self.square_sum += (old + delta) ** 2 - old ** 2
+
+    def count(self, histogram, old, new):
+        if old > 0:
+            histogram[old] -= 1
+            if not histogram[old]:
+                del histogram[old]
+        if new > 0:
+            histogram[new] += 1
+
+    def resize(self, community, delta):
+        """Record a change in a community's member count"""
+        members = self.members[community]
+        self.start_size.setdefault(community, len(members) - delta)
+        self.count(self.size_hist, len(members) - delta, len(members))
+        if len(members) >= MIN_COMMUNITY:
+            self.tracked.add(community)
+        else:
+            self.tracked.discard(community)
+
+    def new_community(self):
+        community = self.next_id
+        self.next_id += 1
+        self.members[community] = set()
+        self.community_degree[community] = 0.0
+        self.internal[community] = 0.0
+        self.start_size.setdefault(community, 0)
+        return community
+
+    def drop_if_empty(self, community):
+        if not self.members[community]:
+            self.square_sum -= self.community_degree.pop(community) ** 2
+            del self.members[community], self.internal[community]
+
+    def add_node(self, node):
+        self.origin.setdefault(node, None)
+        self.adjacency[node] = {}
+        self.degree[node] = 0.0
+        community = self.new_community()
+        self.label[node] = community
+        self.members[community].add(node)
+        self.resize(community, 1)
+
+    def remove_node(self, node):
+        community = self.label.pop(node)
+        self.origin.setdefault(node, community)
+        self.members[community].discard(node)
+        self.resize(community, -1)
+        self.add_degree(community, -self.degree.pop(node))
+        self.lost_edges.add(community)
+        del self.adjacency[node]
+        self.drop_if_empty(community)
+
+    def change_edge(self, user, content, weight, count):
+        """Add (count 1) or remove (count -1) the edge of one post"""
+        for node in (user, content):
+            if node not in self.adjacency:
+                self.add_node(node)
+        key = (user, content)
+        posts = self.posts.get(key, 0) + count
+        before = len(self.adjacency[user]), len(self.adjacency[content])
+        if posts <= 0:
+            self.posts.pop(key, None)
+            delta = -self.adjacency[user].pop(content, 0.0)
+            self.adjacency[content].pop(user, None)
+        else:
+            self.posts[key] = posts
+            delta = weight * count
+            self.adjacency[user][content] = self.adjacency[user].get(content, 0.0) + delta
+            self.adjacency[content][user] = self.adjacency[user][content]
+        self.count(self.degree_hist, before[0], len(self.adjacency[user]))
+        self.count(self.degree_hist, before[1], len(self.adjacency[content]))
+
+        for node in (user, content):
+            self.degree[node] += delta
+            self.add_degree(self.label[node], delta)
+        self.total += 2 * delta
+        if self.label[user] == self.label[content]:
+            self.internal[self.label[user]] += 2 * delta
+            if delta < 0:
+                self.lost_edges.add(self.label[user])
+
+    def link_weights(self, node):
+        """Weight from node to each neighbouring community"""
+        weights = defaultdict(float)
+        label = self.label
+        for neighbour, weight in self.adjacency[node].items():
+            weights[label[neighbour]] += weight
+        return weights
+
+    def move(self, node, target, weights=None):
+        weights = self.link_weights(node) if weights is None else weights
+        source = self.label[node]
+        self.origin.setdefault(node, source)
+        self.internal[source] -= 2 * weights.get(source, 0.0)
+        self.internal[target] += 2 * weights.get(target, 0.0)
+        degree = self.degree[node]
+        self.add_degree(source, -degree)
+        self.add_degree(target, degree)
+        self.members[source].discard(node)
+        self.members[target].add(node)
+        self.label[node] = target
+        self.resize(source, -1)
+        self.resize(target, 1)
+        self.lost_edges.add(source)
+        self.drop_if_empty(source)
+
+    def local_moves(self, nodes):
+        """Greedy modularity moves, starting from nodes and spreading to their neighbours"""
+        pending = deque(nodes)
+        queued = set(nodes)
+        passes = Counter()
+        moves = 0
+        while pending:
+            node = pending.popleft()
+            queued.discard(node)
+            degree = self.degree.get(node, 0.0)
+            passes[node] += 1
+            if degree <= 0 or passes[node] > MAX_PASSES or self.total <= 0:
+                continue
+            weights = self.link_weights(node)
+            current = self.label[node]
+            scale = self.resolution * degree / self.total
+            best = current
+            best_gain = (weights.get(current, 0.0)
+                         - scale * (self.community_degree[current] - degree))
+            for community, weight in weights.items():
+                if community != current:
+                    gain = weight - scale * self.community_degree[community]
+                    if gain > best_gain + 1e-12:
+                        best, best_gain = community, gain
+            if best != current:
+                self.move(node, best, weights)
+                moves += 1
+                for neighbour in self.adjacency[node]:
+                    if neighbour not in queued and self.label[neighbour] != best:
+                        pending.append(neighbour)
+                        queued.add(neighbour)
+        return moves
+
+    def split_disconnected(self):
+        """Give each extra connected component of a community that lost edges its own id"""
+        splits = 0
+        for community in self.lost_edges:
+            members = self.members.get(community)
+            if not members or len(members) < 2:
+                continue
+            components = []
+            unseen = set(members)
+            while unseen:
+                start = unseen.pop()
+                component = [start]
+                stack = [start]
+                while stack:
+                    for neighbour in self.adjacency[stack.pop()]:
+                        if neighbour in unseen:
+                            unseen.discard(neighbour)
+                            component.append(neighbour)
+                            stack.append(neighbour)
+                components.append(component)
+            if len(components) < 2:
+                continue
+            components.sort(key=len, reverse=True)
+            for component in components[1:]:
+                target = self.new_community()
+                for node in component:
+                    self.move(node, target)
+                splits += 1
+        return splits
+
+    def events(self, window):
+        """Births, deaths, merges and splits since the start of the step, then reset"""
+        flows = defaultdict(Counter)  # old community -> Counter of new communities
+        arrivals = defaultdict(Counter)  # new community -> Counter of old communities
+        for node, old in self.origin.items():
+            new = self.label.get(node)
+            if old != new:
+                flows[old][new] += 1
+                arrivals[new][old] += 1
+
+        events = []
+        for community, before in self.start_size.items():
+            after = len(self.members.get(community, ()))
+            if before < MIN_COMMUNITY <= after:
+                # Newly big enough to track: carved out of a tracked community, or a birth
+                sources = [(n, old) for old, n in arrivals[community].items()
+                           if old is not None and old != community
+                           and self.start_size.get(old, 0) >= MIN_COMMUNITY]
+                n, old = max(sources, default=(0, None))
+                if n >= EVENT_SHARE * after:
+                    events.append({"window": window, "type": "split", "community": community,
+                                   "other": old, "size": after})
+                else:
+                    events.append({"window": window, "type": "birth", "community": community,
+                                   "other": None, "size": after})
+            elif before >= MIN_COMMUNITY and after < MIN_COMMUNITY:
+                # Gone: absorbed by a surviving community, or dissolved
+                n, target = max(((n, new) for new, n in flows[community].items()
+                                 if new is not None and new != community
+                                 and len(self.members.get(new, ())) >= MIN_COMMUNITY),
+                                default=(0, None))
+                kind = "merge" if n >= EVENT_SHARE * before else "death"
+                events.append({"window": window, "type": kind, "community": community,
+                               "other": target if kind == "merge" else None, "size": before})
+        self.origin = {}
+        self.start_size = {}
+        self.lost_edges = set()
+        return events
+
+class CommunityEvolution:
+    """Replay of the engagement graph through sliding windows
+
+    windows holds one snapshot dict per step: its time span, post and
+    change counts, communities and modularity, the power-law fits, the
+    largest communities as (id, size) pairs and the step's events.
+    """
+    def __init__(self, table, window_days=WINDOW_DAYS, step_days=STEP_DAYS, resolution=1.0,
+                 callback=None):
+        self.window_days = window_days
+        self.step_days = step_days
+        self.callback = callback
+        dates = np.asarray(table["creation_date"])
+        dated = np.flatnonzero(dates != MISSING_DATE)
+        order = dated[np.argsort(dates[dated], kind="stable")]
+        users = np.asarray(table["user_id"])
+        self.dates = dates[order]
+        self.users = users[order].astype(np.int64)
+        n_users = int(users.max()) + 1 if len(users) else 0
+        self.content = n_users + np.asarray(table["image_id"])[order].astype(np.int64)
+        self.weights = engagement_weights(table)[order]
+        self.graph = WindowGraph(resolution)
+        self.windows = []
+        start = time.perf_counter()
+        self.run()
+        self.timings = {"replay": time.perf_counter() - start}
+
+    def __getstate__(self):
+        # The replayed graph and post arrays are rebuilt from the store if needed
+        state = self.__dict__.copy()
+        for name in ("graph", "dates", "users", "content", "weights", "callback"):
+            state[name] = None
+        return state
+
+    def apply(self, start, stop, count):
+        """Add (count 1) or remove (count -1) posts [start, stop); returns the nodes touched"""
+        touched = set()
+        for i in range(start, stop):
+            user, content = int(self.users[i]), int(self.content[i])
+            self.graph.change_edge(user, content, float(self.weights[i]), count)
+            touched.add(user)
+            touched.add(content)
+        return touched
+
+    def run(self):
+        if not len(self.dates):
+            return
+        graph = self.graph
+        width, step = self.window_days * DAY, self.step_days * DAY
+        window_start = int(self.dates[0]) // DAY * DAY
+        last = int(self.dates[-1])
+        entered = left = 0
+        while True:
+            if self.callback is not None:
+                self.callback()
+            started = time.perf_counter()
+            new_left = int(np.searchsorted(self.dates, window_start, side="left"))
+            new_entered = int(np.searchsorted(self.dates, window_start + width, side="left"))
+            touched = self.apply(left, new_left, -1) | self.apply(entered, new_entered, 1)
+            changes = (new_left - left) + (new_entered - entered)
+            left, entered = new_left, new_entered
+
+            for node in [n for n in touched if n in graph.adjacency and not graph.adjacency[n]]:
+                graph.remove_node(node)
+            moves = graph.local_moves([n for n in touched if n in graph.adjacency])
+            splits = graph.split_disconnected()
+            events = graph.events(len(self.windows))
+            top = heapq.nlargest(SNAPSHOT_COMMUNITIES, graph.tracked,
+                                 key=lambda c: len(graph.members[c]))
+            self.windows.append({
+                "start": window_start,
+                "end": window_start + width,
+                "posts": entered - left,
+                "changes": changes,
+                "moves": moves,
+                "splits_found": splits,
+                "nodes": len(graph.label),
+                "edges": len(graph.posts),
+                "communities": len(graph.tracked),
+                "modularity": graph.modularity(),
+                "degree_fit": fit_power_law(graph.degree_hist),
+                "size_fit": fit_power_law(graph.size_hist),
+                "top": [(int(c), len(graph.members[c])) for c in top],
+                "events": events,
+                "elapsed_s": time.perf_counter() - started,
+            })
+            if window_start + width > last:
+                break
+            window_start += step
+
+    def series(self):
+        """Per-window arrays for plotting the timeline"""
+        def fitted(key):
+            return np.array([w[key]["alpha"] if w[key] else np.nan for w in self.windows])
+        events = Counter((w, e["type"]) for w, window in enumerate(self.windows)
+                         for e in window["events"])
+        return {
+            "start": np.array([w["start"] for w in self.windows]),
+            "communities": np.array([w["communities"] for w in self.windows]),
+            "modularity": np.array([w["modularity"] for w in self.windows]),
+            "degree_alpha": fitted("degree_fit"),
+            "size_alpha": fitted("size_fit"),
+            **{kind: np.array([events[w, kind] for w in range(len(self.windows))])
+               for kind in EVENT_TYPES},
+        }
+
+def event_counts(evolution):
+    """Windows, events by type and the slowest window update"""
+    windows = evolution.windows
+    totals = Counter(e["type"] for w in windows for e in w["events"])
+    return {
+        "windows": len(windows),
+        "window_days": evolution.window_days,
+        "step_days": evolution.step_days,
+        "events": {kind: totals[kind] for kind in EVENT_TYPES},
+        "max_window_s": max((w["elapsed_s"] for w in windows), default=0.0),
+    }
+
+def summary_text(evolution):
+    """Describe the evolution timeline for the timeline page"""
+    windows = evolution.windows
+    if not windows:
+        return "No dated posts to follow over time."
+    counts = event_counts(evolution)
+    totals = counts["events"]
+    series = evolution.series()
+    lines = [f"Community evolution in {evolution.window_days}-day windows stepped by "
+             f"{evolution.step_days} days, {day(windows[0]['start'])} to "
+             f"{day(windows[-1]['end'])} ({len(windows)} windows).", ""]
+    lines.append(f"{totals['birth']} communities were born, {totals['death']} dissolved, "
+                 f"{totals['merge']} merged into others and {totals['split']} split off.")
+    for key, name in (("degree_alpha", "Node degrees"), ("size_alpha", "Community sizes")):
+        alphas = series[key][np.isfinite(series[key])]
+        if len(alphas):
+            lines.append(f"{name} follow a power law with exponent {np.median(alphas):.2f} "
+                         f"(median over windows, range {alphas.min():.2f}-{alphas.max():.2f}).")
+    busiest = max(range(len(windows)), key=lambda w: len(windows[w]["events"]))
+    if windows[busiest]["events"]:
+        lines.append(f"The most eventful window starts {day(windows[busiest]['start'])} with "
+                     f"{len(windows[busiest]['events'])} events.")
+    lines.append(f"Each window took at most {counts['max_window_s'] * 1000:.1f} ms to update.")
+    return "\n".join(lines)
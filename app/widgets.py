@@ -0,0 +1,823 @@
+import tkinter as tk
+from tkinter import ttk
+import heapq
+from collections import OrderedDict
+import numpy as np
+from PIL import Image, ImageTk
+from imagecache import image_cache
+from instrument import tracer
+from plots import EVENT_COLOURS, colour, day
+
+# Fallback frame delay for GIF frames that carry no duration (milliseconds)
+DEFAULT_FRAME_MS = 100
+# Browsers clamp very short GIF delays, do the same to avoid busy looping
+MIN_FRAME_MS = 20
+
+class GifAnimator:
+    """Play an animated GIF on a label, decoding frames just ahead of playback
+
+    Only a small LRU ring of ready PhotoImage objects is kept, so memory
+    stays flat regardless of the number of frames in the file.
+    """
+    def __init__(self, label, path, size=None, cache_frames=8):
+        self.label = label
+        self.size = size
+        self.cache_frames = max(2, cache_frames)
+        self.gif = Image.open(path)
+        self.n_frames = getattr(self.gif, "n_frames", 1)
+        self.ready = OrderedDict()  # frame index -> (PhotoImage, duration)
+        self.index = 0
+        self.current = None
+        self.job = None
+        self.prefetch_job = None
+
+    @property
+    def running(self):
+        return self.job is not None
+
+    def start(self):
+        """Start (or resume) playback"""
+        if self.job is None:
+            self.tick()
+
+    def stop(self):
+        """Stop the after loop, keeping the current frame on screen"""
+        for job in (self.job, self.prefetch_job):
+            if job is not None:
+                self.label.after_cancel(job)
+        self.job = None
+        self.prefetch_job = None
+
+    def decode(self, index):
+        """Return (PhotoImage, duration) for a frame, decoding it if needed"""
+        frame = self.ready.get(index)
+        if frame is not None:
+            self.ready.move_to_end(index)
+            return frame
+
+        with tracer.span("gif decode", "image"):
+            self.gif.seek(index)
+            duration = self.gif.info.get("duration") or DEFAULT_FRAME_MS
+            img = self.gif.convert("RGBA")
+            if self.size:
+                img = img.resize(self.size)
+            frame = (ImageTk.PhotoImage(img), max(MIN_FRAME_MS, int(duration)))
+
+        self.ready[index] = frame
+        while len(self.ready) > self.cache_frames:
+            self.ready.popitem(last=False)
+        return frame
+
+    def tick(self):
+        """Show the current frame and schedule the next one after its duration"""
+        photo, duration = self.decode(self.index)
+        # Hold a reference so eviction from the ring never blanks the label
+        self.current = photo
+        self.label.configure(image=photo)
+        self.index = (self.index + 1) % self.n_frames
+        self.job = self.label.after(duration, self.tick)
+        if self.prefetch_job is None:
+            self.prefetch_job = self.label.after_idle(self.decode_ahead)
+
+    def decode_ahead(self):
+        """Decode upcoming frames into the ring while the event loop is idle"""
+        self.prefetch_job = None
+        ahead = min(self.cache_frames - 1, self.n_frames - 1)
+        for step in range(ahead):
+            index = (self.index + step) % self.n_frames
+            if index not in self.ready:
+                self.decode(index)
+                # One frame per idle slot keeps each callback short
+                if self.job is not None:
+                    self.prefetch_job = self.label.after_idle(self.decode_ahead)
+                return
+
+# Edge length of a rendered tile in screen pixels
+TILE_SIZE = 256
+# Zoom factor applied per wheel notch or +/- key press
+ZOOM_STEP = 1.25
+MAX_ZOOM = 4.0
+
+class ZoomCanvas(tk.Canvas):
+    """Zoomable, pannable image viewer that renders only the visible tiles
+
+    A pyramid of half-size copies is built lazily so each tile is resampled
+    from the smallest level that still has enough detail, and rendered
+    tiles live in a bounded LRU so memory stays flat on large displays.
+    image is a PIL image or the name of one in images/; named images get
+    their pyramid levels from image_cache, so later launches read the
+    small copies from disk and only decode the full image when zoomed in.
+    Ctrl+mouse wheel or +/- zooms, dragging pans, double-click fits.
+    """
+    def __init__(self, parent, image, width, height, max_tiles=192, **kwargs):
+        super().__init__(parent, width=width, height=height, **kwargs)
+        self.use_image(image)
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()  # (zoom, col, row) -> PhotoImage
+        self.items = {}  # (zoom, col, row) -> canvas item id
+        self.zoom = 1.0
+        self.view_x = 0
+        self.view_y = 0
+        self.fit_mode = True
+        self.render_job = None
+        self.drag_start = None
+
+        self.bind("<Configure>", self.on_configure)
+        self.bind("<ButtonPress-1>", self.on_press)
+        self.bind("<B1-Motion>", self.on_drag)
+        self.bind("<Double-Button-1>", lambda e: self.fit())
+        self.bind("<Control-MouseWheel>", self.on_wheel)
+        self.bind("<Control-Button-4>", self.on_wheel)
+        self.bind("<Control-Button-5>", self.on_wheel)
+        self.bind("<Enter>", lambda e: self.focus_set())
+        self.bind("<plus>", lambda e: self.zoom_by(ZOOM_STEP))
+        self.bind("<equal>", lambda e: self.zoom_by(ZOOM_STEP))
+        self.bind("<minus>", lambda e: self.zoom_by(1 / ZOOM_STEP))
+
+    def use_image(self, image):
+        if isinstance(image, str):
+            self.source = image
+            self.image_size = image_cache.size(image)
+            self.pyramid = {}
+        else:
+            self.source = None
+            self.image_size = image.size
+            self.pyramid = {0: image}
+
+    def set_image(self, image):
+        """Replace the displayed image, dropping tiles rendered from the old one"""
+        self.use_image(image)
+        self.tiles.clear()
+        self.items.clear()
+        self.delete("tile")
+        self.fit()
+
+    def view_size(self):
+        return max(1, self.winfo_width()), max(1, self.winfo_height())
+
+    def fit_zoom(self):
+        width, height = self.view_size()
+        return min(width / self.image_size[0], height / self.image_size[1])
+
+    def fit(self):
+        """Scale the whole image into the visible area"""
+        self.fit_mode = True
+        self.set_zoom(self.fit_zoom())
+
+    def level_size(self, index):
+        width, height = self.image_size
+        for _ in range(index):
+            width, height = (width + 1) // 2, (height + 1) // 2
+        return width, height
+
+    def level(self, zoom):
+        """Return (pyramid image, its scale) best suited to render at zoom"""
+        index = 0
+        while 2 ** -(index + 1) >= zoom and min(self.level_size(index)) > TILE_SIZE:
+            index += 1
+        return self.pyramid_level(index), 2 ** -index
+
+    def pyramid_level(self, index):
+        """Pyramid level index, loaded through the image cache for named images"""
+        image = self.pyramid.get(index)
+        if image is None:
+            if self.source is not None:
+                image = image_cache.load(self.source, self.level_size(index) if index else None)
+            else:
+                image = self.pyramid_level(index - 1).reduce(2)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            self.pyramid[index] = image
+        return image
+
+    def set_zoom(self, zoom, anchor=None):
+        """Change the zoom, keeping the image point under anchor fixed"""
+        zoom = max(min(self.fit_zoom(), 1.0) / 2, min(MAX_ZOOM, zoom))
+        width, height = self.view_size()
+        ax, ay = anchor if anchor else (width / 2, height / 2)
+        ratio = zoom / self.zoom
+        self.view_x = (self.view_x + ax) * ratio - ax
+        self.view_y = (self.view_y + ay) * ratio - ay
+        self.zoom = zoom
+        self.clamp_view()
+        self.delete("tile")
+        self.items.clear()
+        self.schedule_render()
+
+    def zoom_by(self, factor, anchor=None):
+        self.fit_mode = False
+        self.set_zoom(self.zoom * factor, anchor)
+        return "break"
+
+    def clamp_view(self):
+        """Centre images smaller than the view, otherwise keep them in bounds"""
+        width, height = self.view_size()
+        scaled_w = self.image_size[0] * self.zoom
+        scaled_h = self.image_size[1] * self.zoom
+        if scaled_w <= width:
+            self.view_x = -(width - scaled_w) / 2
+        else:
+            self.view_x = max(0, min(self.view_x, scaled_w - width))
+        if scaled_h <= height:
+            self.view_y = -(height - scaled_h) / 2
+        else:
+            self.view_y = max(0, min(self.view_y, scaled_h - height))
+
+    def on_configure(self, event):
+        if self.fit_mode:
+            self.fit()
+        else:
+            self.clamp_view()
+            self.delete("tile")
+            self.items.clear()
+            self.schedule_render()
+
+    def on_wheel(self, event):
+        up = getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0
+        return self.zoom_by(ZOOM_STEP if up else 1 / ZOOM_STEP, (event.x, event.y))
+
+    def on_press(self, event):
+        self.drag_start = (event.x, event.y)
+
+    def on_drag(self, event):
+        if self.drag_start is None:
+            return
+        old_x, old_y = self.view_x, self.view_y
+        self.view_x += self.drag_start[0] - event.x
+        self.view_y += self.drag_start[1] - event.y
+        self.drag_start = (event.x, event.y)
+        self.clamp_view()
+        # Shift the tiles already on screen and only render newly exposed ones
+        self.move("tile", old_x - self.view_x, old_y - self.view_y)
+        self.schedule_render()
+
+    def schedule_render(self):
+        """Coalesce render requests into one per idle cycle"""
+        if self.render_job is None:
+            self.render_job = self.after_idle(self.render)
+
+    def render(self):
+        """Draw the tiles intersecting the view and drop the rest"""
+        self.render_job = None
+        width, height = self.view_size()
+        zoom = self.zoom
+        scaled_w = int(round(self.image_size[0] * zoom))
+        scaled_h = int(round(self.image_size[1] * zoom))
+
+        first_col = max(0, int(self.view_x // TILE_SIZE))
+        first_row = max(0, int(self.view_y // TILE_SIZE))
+        last_col = min((scaled_w - 1) // TILE_SIZE, int((self.view_x + width) // TILE_SIZE))
+        last_row = min((scaled_h - 1) // TILE_SIZE, int((self.view_y + height) // TILE_SIZE))
+
+        visible = set()
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                key = (zoom, col, row)
+                visible.add(key)
+                if key not in self.items:
+                    photo = self.tile(key, scaled_w, scaled_h)
+                    self.items[key] = self.create_image(
+                        col * TILE_SIZE - self.view_x, row * TILE_SIZE - self.view_y,
+                        image=photo, anchor="nw", tags="tile")
+
+        for key in [k for k in self.items if k not in visible]:
+            self.delete(self.items.pop(key))
+
+    def tile(self, key, scaled_w, scaled_h):
+        """Return the PhotoImage for a tile, resampling it if not cached"""
+        photo = self.tiles.get(key)
+        if photo is not None:
+            self.tiles.move_to_end(key)
+            return photo
+
+        zoom, col, row = key
+        source, scale = self.level(zoom)
+        ratio = zoom / scale
+        left, top = col * TILE_SIZE, row * TILE_SIZE
+        right = min(left + TILE_SIZE, scaled_w)
+        bottom = min(top + TILE_SIZE, scaled_h)
+        box = (left / ratio, top / ratio,
+               min(source.width, right / ratio), min(source.height, bottom / ratio))
+        img = source.resize((right - left, bottom - top), Image.BILINEAR, box=box)
+        photo = ImageTk.PhotoImage(img)
+
+        self.tiles[key] = photo
+        # Tiles still on screen are referenced by self.items, never evict those
+        excess = len(self.tiles) - self.max_tiles
+        if excess > 0:
+            stale = [k for k in self.tiles if k not in self.items and k != key]
+            for stale_key in stale[:excess]:
+                del self.tiles[stale_key]
+        return photo
+
+# Most nodes drawn individually; denser views fall back to community discs
+MAX_NODE_ITEMS = 3_000
+MAX_EDGE_ITEMS = 4_000
+MAX_COMMUNITY_ITEMS = 1_500
+# Closest zoom on a graph, in screen pixels per layout unit
+MAX_GRAPH_ZOOM = 40.0
+
+class GraphCanvas(tk.Canvas):
+    """Zoomable, pannable network view with level of detail
+
+    Draws a layout.GraphView: zoomed out, each community is one disc sized
+    by its members with the heaviest links between communities; zoomed in
+    far enough that few nodes are visible, the individual nodes and their
+    edges are drawn instead. Either way only what intersects the viewport
+    is created, so graphs with hundreds of thousands of nodes stay
+    interactive. Controls match ZoomCanvas; clicking a community without
+    dragging calls on_select(community).
+    """
+    def __init__(self, parent, view, width, height, on_select=None, **kwargs):
+        super().__init__(parent, width=width, height=height, **kwargs)
+        self.view = view
+        self.on_select = on_select
+        self.press_at = None
+        self.zoom = 1.0
+        self.view_x = 0
+        self.view_y = 0
+        self.fit_mode = True
+        self.render_job = None
+        self.drag_start = None
+
+        self.bind("<Configure>", self.on_configure)
+        self.bind("<ButtonPress-1>", self.on_press)
+        self.bind("<B1-Motion>", self.on_drag)
+        self.bind("<ButtonRelease-1>", self.on_release)
+        self.bind("<Double-Button-1>", lambda e: self.fit())
+        self.bind("<Control-MouseWheel>", self.on_wheel)
+        self.bind("<Control-Button-4>", self.on_wheel)
+        self.bind("<Control-Button-5>", self.on_wheel)
+        self.bind("<Enter>", lambda e: self.focus_set())
+        self.bind("<plus>", lambda e: self.zoom_by(ZOOM_STEP))
+        self.bind("<equal>", lambda e: self.zoom_by(ZOOM_STEP))
+        self.bind("<minus>", lambda e: self.zoom_by(1 / ZOOM_STEP))
+
+    def set_view(self, view):
+        """Show another graph, e.g. after the communities were updated"""
+        self.view = view
+        self.fit()
+
+    def view_size(self):
+        return max(1, self.winfo_width()), max(1, self.winfo_height())
+
+    def extent(self):
+        return np.maximum(self.view.high - self.view.low, 1e-9)
+
+    def fit_zoom(self):
+        width, height = self.view_size()
+        extent_x, extent_y = self.extent()
+        return min(width / extent_x, height / extent_y)
+
+    def fit(self):
+        """Scale the whole graph into the visible area"""
+        self.fit_mode = True
+        self.set_zoom(self.fit_zoom())
+
+    def set_zoom(self, zoom, anchor=None):
+        """Change the zoom, keeping the graph point under anchor fixed"""
+        zoom = max(self.fit_zoom() / 2, min(max(MAX_GRAPH_ZOOM, self.fit_zoom()), zoom))
+        width, height = self.view_size()
+        ax, ay = anchor if anchor else (width / 2, height / 2)
+        ratio = zoom / self.zoom
+        self.view_x = (self.view_x + ax) * ratio - ax
+        self.view_y = (self.view_y + ay) * ratio - ay
+        self.zoom = zoom
+        self.clamp_view()
+        self.schedule_render()
+
+    def zoom_by(self, factor, anchor=None):
+        self.fit_mode = False
+        self.set_zoom(self.zoom * factor, anchor)
+        return "break"
+
+    def clamp_view(self):
+        """Centre graphs smaller than the view, otherwise keep them in bounds"""
+        width, height = self.view_size()
+        scaled_w, scaled_h = self.extent() * self.zoom
+        if scaled_w <= width:
+            self.view_x = -(width - scaled_w) / 2
+        else:
+            self.view_x = max(0, min(self.view_x, scaled_w - width))
+        if scaled_h <= height:
+            self.view_y = -(height - scaled_h) / 2
+        else:
+            self.view_y = max(0, min(self.view_y, scaled_h - height))
+
+    def on_configure(self, event):
+        if self.fit_mode:
+            self.fit()
+        else:
+            self.clamp_view()
+            self.schedule_render()
+
+    def on_wheel(self, event):
+        up = getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0
+        return self.zoom_by(ZOOM_STEP if up else 1 / ZOOM_STEP, (event.x, event.y))
+
+    def on_press(self, event):
+        self.drag_start = (event.x, event.y)
+        self.press_at = (event.x, event.y)
+
+    def on_drag(self, event):
+        if self.drag_start is None:
+            return
+        old_x, old_y = self.view_x, self.view_y
+        self.view_x += self.drag_start[0] - event.x
+        self.view_y += self.drag_start[1] - event.y
+        self.drag_start = (event.x, event.y)
+        self.clamp_view()
+        # Shift what is drawn right away; the idle render fills in the edges
+        self.move("graph", old_x - self.view_x, old_y - self.view_y)
+        self.schedule_render()
+
+    def on_release(self, event):
+        """A press and release in place is a click on whatever community is there"""
+        if self.press_at is None or self.on_select is None:
+            return
+        if abs(event.x - self.press_at[0]) + abs(event.y - self.press_at[1]) <= 3:
+            x, y = self.to_world(event.x, event.y)
+            community = self.view.community_at(x, y)
+            if community is not None:
+                self.on_select(community)
+        self.press_at = None
+
+    def schedule_render(self):
+        """Coalesce render requests into one per idle cycle"""
+        if self.render_job is None:
+            self.render_job = self.after_idle(self.render)
+
+    def to_screen(self, points):
+        return (np.asarray(points) - self.view.low) * self.zoom - (self.view_x, self.view_y)
+
+    def to_world(self, x, y):
+        return ((x + self.view_x) / self.zoom + self.view.low[0],
+                (y + self.view_y) / self.zoom + self.view.low[1])
+
+    def render(self):
+        """Redraw the part of the graph inside the viewport"""
+        self.render_job = None
+        self.delete("graph")
+        width, height = self.view_size()
+        x0, y0 = self.view.low + np.array([self.view_x, self.view_y]) / self.zoom
+        x1, y1 = x0 + width / self.zoom, y0 + height / self.zoom
+        if self.view.count_in(x0, y0, x1, y1) > MAX_NODE_ITEMS:
+            self.draw_communities(x0, y0, x1, y1)
+        else:
+            self.draw_nodes(x0, y0, x1, y1)
+
+    def visible_communities(self, x0, y0, x1, y1):
+        """Communities whose disc intersects the rectangle, largest first"""
+        view = self.view
+        (cx, cy), r = view.centres.T, view.radii
+        hit = (view.sizes > 0) & (cx + r >= x0) & (cx - r <= x1) & (cy + r >= y0) & (cy - r <= y1)
+        found = np.flatnonzero(hit)
+        return found[np.argsort(-view.sizes[found], kind="stable")][:MAX_COMMUNITY_ITEMS]
+
+    def draw_communities(self, x0, y0, x1, y1):
+        view = self.view
+        found = self.visible_communities(x0, y0, x1, y1)
+        shown = np.zeros(len(view.radii), dtype=bool)
+        shown[found] = True
+
+        rows, cols, weights = view.community_edges
+        keep = np.flatnonzero(shown[rows] & shown[cols])[:MAX_EDGE_ITEMS]
+        if len(keep):
+            starts = self.to_screen(view.centres[rows[keep]])
+            ends = self.to_screen(view.centres[cols[keep]])
+            widths = 1 + 4 * weights[keep] / weights[keep].max()
+            for (ax, ay), (bx, by), w in zip(starts, ends, widths):
+                self.create_line(ax, ay, bx, by, width=w, fill="#c8c8c8", tags="graph")
+
+        centres = self.to_screen(view.centres[found])
+        radii = np.maximum(view.radii[found] * self.zoom, 2)
+        for c, (x, y), r in zip(found, centres, radii):
+            self.create_oval(x - r, y - r, x + r, y + r, fill=colour(c), outline="", tags="graph")
+            if r > 14:
+                self.create_text(x, y, text=f"C{c}", fill="white",
+                                 font=("Helvetica", 10, "bold"), tags="graph")
+
+    def draw_nodes(self, x0, y0, x1, y1):
+        view = self.view
+        nodes = view.nodes_in(x0, y0, x1, y1)
+        shown = np.zeros(len(view), dtype=bool)
+        shown[nodes] = True
+
+        # Faint community outlines keep the context while zoomed in
+        for c, (x, y), r in zip(*self.community_outlines(x0, y0, x1, y1)):
+            self.create_oval(x - r, y - r, x + r, y + r, outline=colour(c), dash=(3, 3),
+                             tags="graph")
+
+        rows, cols, _ = view.edges
+        keep = np.flatnonzero(shown[rows] & shown[cols])[:MAX_EDGE_ITEMS]
+        starts = self.to_screen(view.positions[rows[keep]])
+        ends = self.to_screen(view.positions[cols[keep]])
+        for (ax, ay), (bx, by) in zip(starts, ends):
+            self.create_line(ax, ay, bx, by, fill="#d9d9d9", tags="graph")
+
+        radius = max(2.0, min(6.0, 0.3 * self.zoom))
+        for node, (x, y) in zip(nodes, self.to_screen(view.positions[nodes])):
+            self.create_oval(x - radius, y - radius, x + radius, y + radius,
+                             fill=colour(view.labels[node]), outline="", tags="graph")
+
+    def community_outlines(self, x0, y0, x1, y1):
+        found = self.visible_communities(x0, y0, x1, y1)
+        return found, self.to_screen(self.view.centres[found]), self.view.radii[found] * self.zoom
+
+# Rows moved per mouse wheel notch in a VirtualList
+LIST_WHEEL_ROWS = 3
+
+class VirtualList(ttk.Frame):
+    """Scrollable list of text rows with labels for the visible rows only
+
+    rows can be any sequence (len() and indexing), so a lazy view over a
+    100k-row array costs nothing until a row scrolls into sight. The
+    labels are recycled as the view moves, memory stays constant for any
+    number of rows, and redraws are coalesced to one per idle cycle.
+    """
+    def __init__(self, parent, rows=(), height=300, row_height=22, on_select=None,
+                 font=("Helvetica", 10), background="#ffffff", stripe="#f2f2f2",
+                 highlight="#cde3f7", **kwargs):
+        super().__init__(parent, **kwargs)
+        self.rows = rows
+        self.row_height = row_height
+        self.on_select = on_select
+        self.font = font
+        self.colours = (background, stripe, highlight)
+        self.top = 0  # pixel offset of the view into the list
+        self.selected = None
+        self.labels = []  # recycled row labels, top to bottom
+        self.shown = []  # row index each label displays, None when hidden, -1 to redraw
+        self.render_job = None
+
+        # Labels are placed, which doesn't propagate, so the body keeps its height
+        self.body = tk.Frame(self, height=height, background=background)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.body.pack(side="left", fill="both", expand=True)
+        self.body.bind("<Configure>", lambda e: self.schedule_render())
+        self.bind_wheel(self.body)
+        self.schedule_render()
+
+    def bind_wheel(self, widget):
+        # Widget bindings run before bind_all ones; "break" keeps the page still
+        widget.bind("<MouseWheel>", self.on_wheel)
+        widget.bind("<Button-4>", self.on_wheel)
+        widget.bind("<Button-5>", self.on_wheel)
+
+    def set_rows(self, rows):
+        """Show a new sequence of rows from the top"""
+        self.rows = rows
+        self.top = 0
+        self.selected = None
+        self.shown = [-1] * len(self.labels)
+        self.schedule_render()
+
+    def max_top(self):
+        return max(0, len(self.rows) * self.row_height - self.body.winfo_height())
+
+    def scroll_to(self, top):
+        top = int(min(max(top, 0), self.max_top()))
+        if top != self.top:
+            self.top = top
+            self.schedule_render()
+
+    def yview(self, *args):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", n, "units" or "pages")"""
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * len(self.rows) * self.row_height)
+        elif args[0] == "scroll":
+            step = self.body.winfo_height() if args[2] == "pages" else self.row_height
+            self.scroll_to(self.top + int(args[1]) * step)
+
+    def on_wheel(self, event):
+        up = event.num == 4 or (event.num != 5 and event.delta > 0)
+        self.scroll_to(self.top + (-1 if up else 1) * LIST_WHEEL_ROWS * self.row_height)
+        return "break"
+
+    def select(self, index):
+        """Highlight row index and report it; hidden or not yet redrawn slots are ignored"""
+        if index is None or not 0 <= index < len(self.rows):
+            return
+        self.selected = index
+        self.shown = [-1] * len(self.labels)
+        self.schedule_render()
+        if self.on_select is not None:
+            self.on_select(index)
+
+    def add_label(self):
+        slot = len(self.labels)
+        label = tk.Label(self.body, anchor="w", padx=6, font=self.font)
+        label.bind("<Button-1>", lambda e: self.select(self.shown[slot]))
+        self.bind_wheel(label)
+        self.labels.append(label)
+        self.shown.append(None)
+
+    def schedule_render(self):
+        if self.render_job is None:
+            self.render_job = self.after_idle(self.render)
+
+    def render(self):
+        """Point the pooled labels at the rows in view"""
+        self.render_job = None
+        height = self.body.winfo_height()
+        self.top = min(self.top, self.max_top())
+        first, offset = divmod(self.top, self.row_height)
+        visible = max(0, min(height // self.row_height + 2, len(self.rows) - first))
+        while len(self.labels) < visible:
+            self.add_label()
+        background, stripe, highlight = self.colours
+        for slot, label in enumerate(self.labels):
+            index = first + slot
+            if slot >= visible:
+                if self.shown[slot] is not None:
+                    label.place_forget()
+                    self.shown[slot] = None
+                continue
+            if self.shown[slot] != index:
+                colour = highlight if index == self.selected else (stripe if index % 2 else background)
+                label.configure(text=self.rows[index], background=colour)
+                self.shown[slot] = index
+            label.place(x=0, y=slot * self.row_height - offset, relwidth=1.0,
+                        height=self.row_height)
+        total = max(len(self.rows) * self.row_height, 1)
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + height) / total))
+
+# Largest communities drawn per window on the evolution canvas
+MAX_BUBBLES = 120
+# Height of the timeline strip along the bottom of the evolution canvas (pixels)
+STRIP_HEIGHT = 80
+
+def stable_slots(windows, limit=MAX_BUBBLES):
+    """Slot of each (window, community) drawn, kept while the community stays drawn
+
+    A community that enters the drawn set takes the lowest free slot, so
+    slots stay below limit and a community keeps its place as it grows,
+    shrinks and absorbs others.
+    """
+    slots = []
+    held = {}  # community -> slot
+    free = list(range(limit))
+    for window in windows:
+        drawn = {c for c, _ in window["top"][:limit]}
+        for community in [c for c in held if c not in drawn]:
+            heapq.heappush(free, held.pop(community))
+        for community, _ in window["top"][:limit]:
+            if community not in held:
+                held[community] = heapq.heappop(free)
+        slots.append(dict(held))
+    return slots
+
+class EvolutionCanvas(tk.Canvas):
+    """One time window of a temporal.CommunityEvolution at a time
+
+    Communities are discs on a golden-angle spiral, sized by members and
+    placed by stable_slots, with the step's events ringed in their
+    colours. A strip along the bottom charts tracked communities over all
+    windows with a marker at the one shown; clicking it calls
+    on_seek(window).
+    """
+    def __init__(self, parent, width, height, on_seek=None, **kwargs):
+        super().__init__(parent, width=width, height=height, **kwargs)
+        self.on_seek = on_seek
+        self.windows = []
+        self.slots = []
+        self.largest = 1
+        self.index = 0
+        self.render_job = None
+        self.bind("<Configure>", lambda e: self.schedule_render())
+        self.bind("<ButtonPress-1>", self.on_press)
+
+    def set_windows(self, windows):
+        self.windows = windows
+        self.slots = stable_slots(windows)
+        self.largest = max((size for w in windows for _, size in w["top"][:1]), default=1)
+        self.index = min(self.index, max(len(windows) - 1, 0))
+        self.schedule_render()
+
+    def show(self, index):
+        """Draw window index; cheap enough to call once per animation frame"""
+        self.index = index
+        self.draw_window()
+        self.draw_cursor()
+
+    def view_size(self):
+        return max(self.winfo_width(), 1), max(self.winfo_height(), 1)
+
+    def strip_x(self, index):
+        width, _ = self.view_size()
+        return 10 + (index + 0.5) / max(len(self.windows), 1) * (width - 20)
+
+    def on_press(self, event):
+        width, height = self.view_size()
+        if self.windows and self.on_seek is not None and event.y > height - STRIP_HEIGHT:
+            index = int((event.x - 10) / max(width - 20, 1) * len(self.windows))
+            self.on_seek(min(max(index, 0), len(self.windows) - 1))
+
+    def schedule_render(self):
+        if self.render_job is None:
+            self.render_job = self.after_idle(self.render)
+
+    def render(self):
+        """Redraw the timeline strip and the current window, e.g. after a resize"""
+        self.render_job = None
+        self.delete("all")
+        if not self.windows:
+            return
+        self.draw_strip()
+        self.show(self.index)
+
+    def draw_strip(self):
+        width, height = self.view_size()
+        top, bottom = height - STRIP_HEIGHT + 10, height - 10
+        self.create_line(10, top - 5, width - 10, top - 5, fill="#d0d0d0")
+        counts = np.array([w["communities"] for w in self.windows], dtype=np.float64)
+        scale = (bottom - top) / max(counts.max(), 1)
+        if len(counts) > 1:
+            points = []
+            for i, count in enumerate(counts):
+                points += [self.strip_x(i), bottom - count * scale]
+            self.create_line(*points, fill=colour(0), width=2)
+        for i, window in enumerate(self.windows):
+            if window["events"]:
+                kinds = {e["type"] for e in window["events"]}
+                fill = next(EVENT_COLOURS[k] for k in ("split", "merge", "birth", "death")
+                            if k in kinds)
+                self.create_line(self.strip_x(i), bottom, self.strip_x(i), bottom + 6, fill=fill)
+        self.create_line(0, top, 0, bottom + 6, fill="#3e3e3e", width=2, tags="cursor")
+
+    def draw_cursor(self):
+        x = self.strip_x(self.index)
+        _, height = self.view_size()
+        self.coords("cursor", x, height - STRIP_HEIGHT + 10, x, height - 4)
+
+    def draw_window(self):
+        self.delete("window")
+        if not self.windows:
+            return
+        window = self.windows[self.index]
+        slots = self.slots[self.index]
+        width, height = self.view_size()
+        area = height - STRIP_HEIGHT - 40
+        cx, cy = width / 2, 40 + area / 2
+        spacing = min(width, area) / 2 / np.sqrt(MAX_BUBBLES)
+        golden = np.pi * (3 - np.sqrt(5))
+
+        rings = {}
+        for event in window["events"]:
+            community = event["other"] if event["type"] == "merge" else event["community"]
+            rings.setdefault(community, EVENT_COLOURS[event["type"]])
+        for rank, (community, size) in enumerate(window["top"][:MAX_BUBBLES]):
+            slot = slots[community]
+            x = cx + spacing * np.sqrt(slot + 0.5) * np.cos(slot * golden)
+            y = cy + spacing * np.sqrt(slot + 0.5) * np.sin(slot * golden)
+            r = max(2.0, spacing * 0.95 * np.sqrt(size / self.largest))
+            ring = rings.get(community)
+            self.create_oval(x - r, y - r, x + r, y + r, fill=colour(community),
+                             outline=ring or "", width=3 if ring else 1, tags="window")
+            if rank < 10:
+                self.create_text(x, y, text=f"C{community}", fill="#3e3e3e", tags="window")
+
+        fits = [f"{name} α {window[key]['alpha']:.2f}"
+                for key, name in (("degree_fit", "degree"), ("size_fit", "size")) if window[key]]
+        self.create_text(10, 10, anchor="nw", fill="#3e3e3e", font=("Georgia", 11), tags="window",
+                         text=f"{day(window['start'])} to {day(window['end'])}   "
+                              f"{window['posts']} posts   {window['communities']} communities   "
+                              f"modularity {window['modularity']:.3f}   " + "   ".join(fits))
+        if window["events"]:
+            counts = {}
+            for event in window["events"]:
+                counts[event["type"]] = counts.get(event["type"], 0) + 1
+            self.create_text(width - 10, 10, anchor="ne", fill="#3e3e3e", font=("Georgia", 11),
+                             tags="window",
+                             text="   ".join(f"{n} {kind}" for kind, n in counts.items()))
+
+# How often the instrumentation overlay refreshes (milliseconds)
+OVERLAY_REFRESH_MS = 500
+
+class StatsOverlay(tk.Label):
+    """Live instrumentation figures drawn over the top-right corner of a window"""
+    def __init__(self, parent, tracer):
+        super().__init__(parent, justify="left", anchor="nw", font=("Courier", 9),
+                         background="#202020", foreground="#e0e0e0", padx=8, pady=6)
+        self.tracer = tracer
+        self.job = None
+
+    @property
+    def visible(self):
+        return self.job is not None
+
+    def show(self):
+        self.place(relx=1.0, x=-10, y=10, anchor="ne")
+        self.lift()
+        self.refresh()
+
+    def hide(self):
+        if self.job is not None:
+            self.after_cancel(self.job)
+            self.job = None
+        self.place_forget()
+
+    def refresh(self):
+        self.configure(text=self.tracer.summary())
+        self.job = self.after(OVERLAY_REFRESH_MS, self.refresh)